@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+import csv
+import json
+import math
+import os
+import random
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import sumo_backend
+from qtable import QTable
+import treinamento_Qlearning as T
+
+# Busca de hiperparâmetros do treinamento com successive halving assíncrono (ASHA).
+# Cada configuração sorteada treina alguns episódios e é pontuada pela avaliação gulosa
+# (treinamento_Qlearning.evaluate_policy, sempre com as mesmas sementes). Os degraus têm
+# MIN, MIN·η, MIN·η², ... episódios até o máximo; uma configuração sobe de degrau quando está no
+# melhor 1/η das que já completaram o seu, e continua a partir da Q-table em que parou. Assim que um
+# processo fica livre ele recebe uma promoção, se houver, ou uma configuração nova: nenhum processo
+# espera o degrau inteiro terminar, e as configurações ruins param nos primeiros episódios.
+OUTPUT_DIR = "ajuste"
+ETA = 3
+MIN_EPISODES = 4
+
+# Espaço de busca: constante de treinamento_Qlearning -> (tipo, parâmetros)
+SEARCH_SPACE = {
+    "ALPHA": ("log", 0.01, 0.5),
+    "GAMMA": ("uniforme", 0.8, 0.99),
+    "EPSILON": ("uniforme", 0.3, 1.0),
+    "GREEN_DURATION": ("escolha", [10, 15, 20, 25, 30]),
+    "YELLOW_DURATION": ("escolha", [2, 3, 4]),
+}
+
+
+def sample_config(rng):
+    config = {}
+    for name, (kind, *params) in SEARCH_SPACE.items():
+        if kind == "log":
+            config[name] = math.exp(rng.uniform(math.log(params[0]), math.log(params[1])))
+        elif kind == "uniforme":
+            config[name] = rng.uniform(*params)
+        else:
+            config[name] = rng.choice(params[0])
+    return config
+
+
+def apply_config(config):
+    # As constantes são lidas pelo treinamento a cada uso; as durações também ficam no escalonador
+    for name, value in config.items():
+        setattr(T, name, value)
+    T.scheduler.green_duration = T.GREEN_DURATION
+    T.scheduler.yellow_duration = T.YELLOW_DURATION
+
+
+def _run_trial(args):
+    # Treina a configuração do episódio start ao stop (continuando da Q-table dada) e avalia a política gulosa
+    config_id, config, values, start, stop, max_episodes, seed, backend = args
+    apply_config(config)
+    random.seed(seed + 1000 * config_id + start)
+    Q = T.new_q_table() if values is None else QTable(T.TRAFFIC_LIGHT_IDS, values=values)
+    rewards = []
+    with sumo_backend.SumoSession(backend, default="sumo", label=f"ajuste{os.getpid()}") as session:
+        for ep in range(start, stop):
+            # decaimento de epsilon sobre o orçamento máximo: o mesmo em todos os degraus
+            epsilon_current = T.EPSILON * (1 - ep / max_episodes)
+            rewards.append(T.run_training_episode(Q, epsilon_current, session, seed=seed + ep)[0])
+        score = T.evaluate_policy(Q, session)
+    return Q.values, score, rewards
+
+
+class ASHA:
+
+    def __init__(self, min_episodes=MIN_EPISODES, max_episodes=T.EPOCHS, eta=ETA):
+        self.eta = eta
+        self.rungs = []
+        r = min_episodes
+        while r < max_episodes:
+            self.rungs.append(r)
+            r *= eta
+        self.rungs.append(max_episodes)
+        self.scores = [{} for _ in self.rungs]     # degrau -> {configuração: pontuação}
+        self.promoted = [set() for _ in self.rungs]
+
+    def report(self, config_id, rung, score):
+        self.scores[rung][config_id] = score
+
+    def promotion(self):
+        # Do degrau mais alto para o mais baixo: a primeira configuração do melhor 1/η ainda não promovida
+        for k in reversed(range(len(self.rungs) - 1)):
+            done = self.scores[k]
+            top = sorted(done, key=done.get, reverse=True)[:len(done) // self.eta]
+            for config_id in top:
+                if config_id not in self.promoted[k]:
+                    self.promoted[k].add(config_id)
+                    return config_id, k + 1
+        return None
+
+
+def tune(n_configs=27, workers=4, min_episodes=MIN_EPISODES, max_episodes=T.EPOCHS, eta=ETA, seed=0, backend=None,
+         output_dir=OUTPUT_DIR):
+    rng = random.Random(seed)
+    asha = ASHA(min_episodes, max_episodes, eta)
+    configs, values = {}, {}
+    running = {}  # futuro -> (configuração, degrau)
+    print(f"🔎 {n_configs} configurações, degraus de {asha.rungs} episódios, {workers} processos")
+
+    with ProcessPoolExecutor(workers) as pool:
+        def launch():
+            promotion = asha.promotion()
+            if promotion is not None:
+                config_id, rung = promotion
+            elif len(configs) < n_configs:
+                config_id, rung = len(configs), 0
+                configs[config_id] = sample_config(rng)
+            else:
+                return False
+            start = asha.rungs[rung - 1] if rung else 0
+            task = (config_id, configs[config_id], values.get(config_id), start, asha.rungs[rung], max_episodes, seed, backend)
+            running[pool.submit(_run_trial, task)] = (config_id, rung)
+            return True
+
+        while len(running) < workers and launch():
+            pass
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                config_id, rung = running.pop(future)
+                values[config_id], score, _ = future.result()
+                asha.report(config_id, rung, score)
+                print(f"   config {config_id:>3} degrau {rung} ({asha.rungs[rung]} episódios): avaliação {score:.2f}")
+            while len(running) < workers and launch():
+                pass
+
+    return write_results(asha, configs, values, output_dir)
+
+
+def write_results(asha, configs, values, output_dir):
+    # Placar: cada configuração pela pontuação no degrau mais alto que alcançou
+    board = []
+    for config_id, config in configs.items():
+        rung = max(k for k, scores in enumerate(asha.scores) if config_id in scores)
+        board.append({"config": config_id, "episodios": asha.rungs[rung], "avaliacao": asha.scores[rung][config_id],
+                      **config, **{f"degrau_{k}": scores.get(config_id, "") for k, scores in enumerate(asha.scores)}})
+    board.sort(key=lambda row: (row["episodios"], row["avaliacao"]), reverse=True)
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "placar.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(board[0]))
+        writer.writeheader()
+        writer.writerows(board)
+    best = board[0]
+    QTable(T.TRAFFIC_LIGHT_IDS, values=values[best["config"]]).save(os.path.join(output_dir, "q_table.npz"))
+    with open(os.path.join(output_dir, "melhor.json"), "w") as f:
+        json.dump({k: best[k] for k in ("config", "episodios", "avaliacao", *SEARCH_SPACE)}, f, indent=1)
+
+    trained = sum(row["episodios"] for row in board)
+    print(f"🏆 Melhor: config {best['config']} ({best['episodios']} episódios, avaliação {best['avaliacao']:.2f}): "
+          + ", ".join(f"{k}={best[k]:.4g}" for k in SEARCH_SPACE))
+    print(f"📁 Placar, melhor configuração e Q-table em '{output_dir}' "
+          f"({trained} episódios de treino, contra {len(board) * asha.rungs[-1]} sem parada antecipada)")
+    return board
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Busca de hiperparâmetros do Q-learning com ASHA (successive halving assíncrono)")
+    parser.add_argument("--configs", type=int, default=27, help="configurações sorteadas")
+    parser.add_argument("--workers", type=int, default=4, help="processos em paralelo, cada um com seu SUMO")
+    parser.add_argument("--min-episodes", type=int, default=MIN_EPISODES, help="episódios do primeiro degrau")
+    parser.add_argument("--max-episodes", type=int, default=T.EPOCHS, help="episódios do último degrau")
+    parser.add_argument("--eta", type=int, default=ETA, help="fator de redução entre degraus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--saida", default=OUTPUT_DIR)
+    sumo_backend.add_backend_argument(parser, default="sumo")
+    args = parser.parse_args()
+    tune(args.configs, args.workers, args.min_episodes, args.max_episodes, args.eta, args.seed, args.backend, args.saida)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+import multiprocessing as mp
+import time
+import numpy as np
+import sumo_backend
+from sumo_backend import traci
+from qtable import ACTIONS, STATE_RADICES
+import treinamento_Qlearning as T
+
+try:
+    import gymnasium as gym
+    from gymnasium import spaces
+except ImportError:  # sem gymnasium o ambiente funciona igual, só sem os objetos de espaço
+    gym = spaces = None
+
+# O problema de controle como ambiente no formato Gymnasium (reset/step), multiagente:
+#   observação: array [n_semáforos, 5] com o estado de get_state de cada semáforo
+#   ação:       array [n_semáforos] com o índice da direção (ACTIONS) de cada semáforo
+#   recompensa: compute_reward no instante da próxima decisão (global, a mesma do treinamento)
+# Cada step aplica as ações dos semáforos que devem decidir agora (info["due"]; as demais são ignoradas)
+# e avança pelo escalonador até o próximo lote de decisões. Estado, fase e recompensa são as funções
+# de treinamento_Qlearning, que guardam o snapshot e o escalonador em nível de módulo: por isso há
+# um ambiente por processo, e SubprocVectorEnv roda K ambientes em subprocessos, em passo sincronizado.
+
+_Base = gym.Env if gym is not None else object
+
+
+class TrafficLightEnv(_Base):
+    metadata = {"render_modes": []}
+
+    def __init__(self, backend=None, label="default", max_steps=T.MAX_STEPS, sumo_args=()):
+        self.tl_ids = list(T.TRAFFIC_LIGHT_IDS)
+        self.actions = ACTIONS
+        self.max_steps = max_steps
+        self.sumo_args = tuple(sumo_args)
+        if spaces is not None:
+            self.observation_space = spaces.MultiDiscrete(np.tile(STATE_RADICES, (len(self.tl_ids), 1)))
+            self.action_space = spaces.MultiDiscrete([len(ACTIONS)] * len(self.tl_ids))
+        self.session = sumo_backend.SumoSession(backend, default="sumo", label=label)
+        self.steps = 0
+        self._due = []
+        self._next_seed = None
+
+    def _observe(self):
+        return np.array([T.get_state(tl) for tl in self.tl_ids], dtype=np.int64)
+
+    def _info(self):
+        due = set(self._due)
+        return {"due": np.array([tl in due for tl in self.tl_ids], dtype=bool),
+                "time": T.scheduler.now, "steps": self.steps}
+
+    def reset(self, seed=None, options=None):
+        # options: {"start_state": entrada de checkpoints.CheckpointLibrary} para começar de um estado salvo.
+        # Sem seed, cada reset usa a semente seguinte à do episódio anterior (se alguma já foi dada).
+        if gym is not None:
+            super().reset(seed=seed)
+        if seed is not None:
+            self._next_seed = seed
+        episode_seed = self._next_seed
+        if self._next_seed is not None:
+            self._next_seed += 1
+        self.session.open(T.episode_args(episode_seed, (options or {}).get("start_state"), self.sumo_args))
+        T.snapshot.reset()
+        T.scheduler.reset()
+        self.steps = 0
+        self._due = T.scheduler.pop_due()
+        return self._observe(), self._info()
+
+    def step(self, actions):
+        for tl in self._due:
+            T.apply_phase(tl, self.actions[int(actions[T.snapshot.tl_index[tl]])])
+        while True:
+            self.steps += T.scheduler.advance()
+            terminated = traci.simulation.getMinExpectedNumber() == 0
+            truncated = self.steps >= self.max_steps
+            if terminated or truncated:
+                self._due = []
+                break
+            self._due = T.scheduler.pop_due()
+            if self._due:
+                break
+        obs = self._observe()
+        reward = T.compute_reward(obs[0])
+        return obs, reward, terminated, truncated and not terminated, self._info()
+
+    def close(self):
+        self.session.close()
+
+
+def _worker(conn, index, backend, max_steps, sumo_args):
+    env = TrafficLightEnv(backend, label=f"env{index}", max_steps=max_steps, sumo_args=sumo_args)
+    try:
+        while True:
+            command, data = conn.recv()
+            if command == "reset":
+                conn.send(env.reset(**data))
+            elif command == "step":
+                obs, reward, terminated, truncated, info = env.step(data)
+                if terminated or truncated:
+                    # recomeça sozinho, como os vetores do Gymnasium: a observação final vai no info
+                    final_obs = obs
+                    obs, info = env.reset()
+                    info["final_observation"] = final_obs
+                conn.send((obs, reward, terminated, truncated, info))
+            elif command == "close":
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        env.close()
+        conn.close()
+
+
+# K ambientes em subprocessos (cada um com seu SUMO headless), avançados em passo sincronizado:
+# step_async envia as ações a todos e step_wait espera as K respostas. As observações voltam
+# empilhadas em [K, n_semáforos, 5], para o aprendiz escolher as K×n_semáforos ações de uma vez.
+class SubprocVectorEnv:
+
+    def __init__(self, num_envs, backend=None, max_steps=T.MAX_STEPS, sumo_args=()):
+        ctx = mp.get_context("spawn")
+        self.num_envs = num_envs
+        self.tl_ids = list(T.TRAFFIC_LIGHT_IDS)
+        self.actions = ACTIONS
+        self._remotes, self._processes = [], []
+        for i in range(num_envs):
+            parent, child = ctx.Pipe()
+            process = ctx.Process(target=_worker, args=(child, i, backend, max_steps, tuple(sumo_args)), daemon=True)
+            process.start()
+            child.close()
+            self._remotes.append(parent)
+            self._processes.append(process)
+        self._waiting = False
+        self.closed = False
+
+    @staticmethod
+    def _stack_infos(infos):
+        stacked = {"due": np.stack([i["due"] for i in infos]),
+                   "time": np.array([i["time"] for i in infos]),
+                   "steps": np.array([i["steps"] for i in infos])}
+        if any("final_observation" in i for i in infos):
+            stacked["final_observation"] = [i.get("final_observation") for i in infos]
+        return stacked
+
+    def reset(self, seed=None):
+        # seed: semente do ambiente 0; o ambiente i usa seed + i
+        for i, remote in enumerate(self._remotes):
+            remote.send(("reset", {"seed": None if seed is None else seed + i}))
+        obs, infos = zip(*(remote.recv() for remote in self._remotes))
+        return np.stack(obs), self._stack_infos(infos)
+
+    def step_async(self, actions):
+        for remote, action in zip(self._remotes, actions):
+            remote.send(("step", np.asarray(action)))
+        self._waiting = True
+
+    def step_wait(self):
+        results = [remote.recv() for remote in self._remotes]
+        self._waiting = False
+        obs, rewards, terminated, truncated, infos = zip(*results)
+        return (np.stack(obs), np.array(rewards, dtype=np.float64), np.array(terminated), np.array(truncated),
+                self._stack_infos(infos))
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        if self.closed:
+            return
+        if self._waiting:
+            for remote in self._remotes:
+                remote.recv()
+        for remote in self._remotes:
+            remote.send(("close", None))
+        for process in self._processes:
+            process.join()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def greedy_actions(Q, obs):
+    # Ações gulosas de Q para um lote [..., n_semáforos, 5] de observações, numa única consulta à tabela
+    n_tl = obs.shape[-2]
+    states = obs.reshape(-1, obs.shape[-1])
+    tl_idx = np.tile(np.array([Q.tl_index[tl] for tl in T.TRAFFIC_LIGHT_IDS]), len(states) // n_tl)
+    return Q.greedy(tl_idx, Q.encode_many(states)).reshape(obs.shape[:-1])
+
+
+if __name__ == "__main__":
+    import argparse
+    from qtable import QTable
+    parser = argparse.ArgumentParser(description="Mede a vazão de decisões do ambiente vetorizado (política gulosa da Q-table)")
+    parser.add_argument("--envs", type=int, default=4, help="ambientes em subprocessos")
+    parser.add_argument("--steps", type=int, default=200, help="passos do vetor (cada um decide em todos os ambientes)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--q-table", default=None, help="q_table.npz (padrão: tabela zerada)")
+    sumo_backend.add_backend_argument(parser, default="sumo")
+    args = parser.parse_args()
+    Q = QTable.load(args.q_table) if args.q_table else QTable(T.TRAFFIC_LIGHT_IDS)
+    with SubprocVectorEnv(args.envs, args.backend) as envs:
+        obs, info = envs.reset(seed=args.seed)
+        decisions, episodes = 0, 0
+        t0 = time.perf_counter()
+        for _ in range(args.steps):
+            decisions += int(info["due"].sum())
+            obs, rewards, terminated, truncated, info = envs.step(greedy_actions(Q, obs))
+            episodes += int((terminated | truncated).sum())
+        seconds = time.perf_counter() - t0
+    print(f"🚦 {args.envs} ambientes, {args.steps} passos: {decisions} decisões em {seconds:.2f}s "
+          f"({decisions / seconds:.0f} decisões/s), {episodes} episódios concluídos")
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import quoteattr
+import pandas as pd
+from snapshot_traci import PRIORITY_LEVEL
+
+# Análise pós-execução das saídas do próprio SUMO (tripinfo, edgeData e laneData), sem TraCI.
+# Os arquivos são lidos com iterparse incremental: cada elemento é descartado logo depois de
+# lido, então a memória do parser não cresce com a duração da simulação.
+# Tabelas geradas: uma linha por veículo (viagens), por aresta e por faixa (por intervalo),
+# além do resumo por classe de veículo (emergency / authority / comum).
+
+ROUTE_FILE = "mapa_final_sumo.rou.xml"
+OUTPUT_DIR = "analise"
+
+# vClass dos tipos padrão do SUMO (os que não aparecem no arquivo de rotas)
+DEFAULT_VTYPE_CLASSES = {
+    "DEFAULT_VEHTYPE": "passenger",
+    "DEFAULT_TAXITYPE": "taxi",
+    "DEFAULT_BIKETYPE": "bicycle",
+    "DEFAULT_PEDTYPE": "pedestrian",
+    "DEFAULT_RAILTYPE": "rail_urban",
+    "DEFAULT_CONTAINERTYPE": "ignoring",
+}
+
+# Atributos de tripinfo -> colunas da tabela de viagens
+TRIP_FIELDS = [
+    ("depart", "partida"),
+    ("arrival", "chegada"),
+    ("duration", "duracao"),
+    ("routeLength", "distancia"),
+    ("waitingTime", "tempo_espera"),
+    ("waitingCount", "paradas"),
+    ("timeLoss", "perda_tempo"),
+    ("departDelay", "atraso_partida"),
+]
+
+# Atributos de edgeData/laneData -> colunas das tabelas por aresta e por faixa
+MEANDATA_FIELDS = [
+    ("sampledSeconds", "segundos_amostrados"),
+    ("traveltime", "tempo_percurso"),
+    ("waitingTime", "tempo_espera"),
+    ("timeLoss", "perda_tempo"),
+    ("speed", "velocidade"),
+    ("density", "densidade"),
+    ("occupancy", "ocupacao"),
+    ("entered", "entraram"),
+    ("left", "sairam"),
+]
+
+
+def priority_group(vclass):
+    return vclass if vclass in PRIORITY_LEVEL else "comum"
+
+
+def _iterparse(path, tags):
+    # Devolve os elementos das tags pedidas assim que abrem (os atributos já estão completos)
+    # e descarta cada elemento ao fechar; os filhos diretos da raiz são removidos dela,
+    # então a árvore em memória nunca passa de um elemento de primeiro nível
+    context = ET.iterparse(path, events=("start", "end"))
+    _, root = next(context)
+    depth = 1
+    for event, elem in context:
+        if event == "start":
+            depth += 1
+            if elem.tag in tags:
+                yield elem
+        else:
+            depth -= 1
+            elem.clear()
+            if depth == 1:
+                root.clear()
+
+
+def vtype_classes(route_files=(ROUTE_FILE,)):
+    # vType -> vClass a partir das definições <vType> dos arquivos de rotas (tripinfo só informa o vType)
+    classes = dict(DEFAULT_VTYPE_CLASSES)
+    for path in route_files:
+        for elem in _iterparse(path, {"vType"}):
+            classes[elem.get("id")] = elem.get("vClass", "passenger")
+    return classes
+
+
+def iter_trips(path, classes):
+    for elem in _iterparse(path, {"tripinfo"}):
+        vtype = elem.get("vType", "DEFAULT_VEHTYPE")
+        vclass = classes.get(vtype, "passenger")
+        trip = {"id": elem.get("id"), "vtype": vtype, "vclass": vclass, "classe": priority_group(vclass)}
+        for attr, column in TRIP_FIELDS:
+            trip[column] = float(elem.get(attr, "nan"))
+        yield trip
+
+
+def trip_table(path, classes):
+    return pd.DataFrame(iter_trips(path, classes), columns=["id", "vtype", "vclass", "classe"] + [c for _, c in TRIP_FIELDS])
+
+
+def trip_summary(path, classes):
+    # Resumo por classe acumulado durante a leitura, sem montar a tabela de viagens
+    totals = {}
+    for trip in iter_trips(path, classes):
+        for group in (trip["classe"], "todos"):
+            t = totals.setdefault(group, {"classe": group, "viagens": 0, "duracao": 0.0, "tempo_espera": 0.0, "perda_tempo": 0.0, "paradas": 0.0})
+            t["viagens"] += 1
+            for column in ("duracao", "tempo_espera", "perda_tempo", "paradas"):
+                t[column] += trip[column]
+    rows = []
+    for group in sorted(totals, key=lambda g: (g == "todos", g)):
+        t = totals[group]
+        rows.append({"classe": group, "viagens": t["viagens"],
+                     **{f"{column}_media": t[column] / t["viagens"] for column in ("duracao", "tempo_espera", "perda_tempo", "paradas")}})
+    return pd.DataFrame(rows)
+
+
+def meandata_table(path, level="edge"):
+    # Uma linha por (intervalo, aresta) ou (intervalo, faixa); no laneData a faixa vem dentro da aresta
+    rows = []
+    interval = edge = None
+    for elem in _iterparse(path, {"interval", "edge", "lane"}):
+        if elem.tag == "interval":
+            interval = (float(elem.get("begin")), float(elem.get("end")), meandata_group(elem.get("id")))
+        elif elem.tag == "edge":
+            edge = elem.get("id")
+        if elem.tag != level:
+            continue
+        row = {"classe": interval[2], "inicio": interval[0], "fim": interval[1], "aresta": edge}
+        if level == "lane":
+            row["faixa"] = elem.get("id")
+        for attr, column in MEANDATA_FIELDS:
+            row[column] = float(elem.get(attr, "nan"))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+# ---------- edgeData / laneData por classe ----------
+# O SUMO só separa as médias por aresta/faixa por tipo de veículo se a definição do meandata
+# tiver o atributo vTypes. write_meandata_additional gera um arquivo adicional (--additional-files)
+# com uma definição por classe prioritária; o id de cada definição volta no <interval id=...>
+# e vira a coluna "classe" das tabelas.
+
+MEANDATA_PREFIX = "classe_"
+
+
+def write_meandata_additional(path, classes, output_prefix="", period=None):
+    # Devolve os arquivos de saída gerados: {(nível, classe): caminho}
+    outputs = {}
+    lines = ["<additional>"]
+    groups = [("todos", None)] + [(group, sorted(t for t, c in classes.items() if c == group)) for group in PRIORITY_LEVEL]
+    for tag, level in (("edgeData", "edge"), ("laneData", "lane")):
+        for group, vtypes in groups:
+            if vtypes is not None and not vtypes:
+                continue  # nenhum tipo de veículo dessa classe na demanda
+            output = os.path.abspath(f"{output_prefix}{tag}_{group}.xml")
+            attrs = f'id={quoteattr(f"{MEANDATA_PREFIX}{group}_{level}")} file={quoteattr(output)}'
+            if vtypes:
+                attrs += f" vTypes={quoteattr(' '.join(vtypes))}"
+            if period:
+                attrs += f' period="{period}"'
+            lines.append(f"    <{tag} {attrs}/>")
+            outputs[(level, group)] = output
+    lines.append("</additional>")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return outputs
+
+
+def meandata_group(interval_id):
+    # Classe da definição que gerou o intervalo; as definições do .sumocfg valem para todos os veículos
+    if interval_id and interval_id.startswith(MEANDATA_PREFIX):
+        return interval_id[len(MEANDATA_PREFIX):].rsplit("_", 1)[0]
+    return "todos"
+
+
+# ---------- RELATÓRIO ----------
+
+def analyze(tripinfo=None, edgedata=(), lanedata=(), route_files=(ROUTE_FILE,), output_dir=OUTPUT_DIR):
+    # Gera viagens.csv, resumo_classes.csv, arestas.csv e faixas.csv com o que foi informado
+    os.makedirs(output_dir, exist_ok=True)
+    classes = vtype_classes(route_files)
+    tables = {}
+    if tripinfo:
+        tables["viagens"] = trip_table(tripinfo, classes)
+        tables["resumo_classes"] = trip_summary(tripinfo, classes)
+    for name, paths, level in (("arestas", edgedata, "edge"), ("faixas", lanedata, "lane")):
+        if paths:
+            tables[name] = pd.concat([meandata_table(p, level) for p in paths], ignore_index=True)
+    for name, df in tables.items():
+        df.to_csv(os.path.join(output_dir, f"{name}.csv"), index=False)
+    return tables
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tabelas de viagens, arestas e faixas a partir das saídas XML do SUMO")
+    parser.add_argument("--tripinfo", default=None, help="arquivo --tripinfo-output")
+    parser.add_argument("--edgedata", nargs="*", default=[], help="arquivos de edgeData")
+    parser.add_argument("--lanedata", nargs="*", default=[], help="arquivos de laneData")
+    parser.add_argument("--routes", nargs="+", default=[ROUTE_FILE], help="arquivos de rotas com as definições de vType")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--additional", default=None,
+                        help="em vez de analisar, gera este arquivo adicional com edgeData/laneData por classe")
+    args = parser.parse_args()
+    if args.additional:
+        outputs = write_meandata_additional(args.additional, vtype_classes(args.routes),
+                                            os.path.join(args.output_dir, ""))
+        print(f"📝 '{args.additional}' define {len(outputs)} saídas; use --additional-files {args.additional}")
+    else:
+        tables = analyze(args.tripinfo, args.edgedata, args.lanedata, args.routes, args.output_dir)
+        if "resumo_classes" in tables:
+            print(tables["resumo_classes"].to_string(index=False))
+        print(f"📁 Tabelas salvas em '{args.output_dir}': {', '.join(f'{n}.csv' for n in tables)}")
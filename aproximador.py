@@ -0,0 +1,197 @@
+import numpy as np
+from qtable import ACTIONS
+
+# Agente por aproximação de função, alternativa à Q-table para redes grandes.
+# Em vez de discretizar o estado em faixas, cada semáforo é descrito por atributos contínuos
+# (fila e espera por aproximação, fase atual, pressão em relação aos vizinhos, prioridade, velocidade)
+# e Q(x, a) é aproximado por um modelo linear ou por uma MLP de uma camada oculta, em NumPy, com
+# pesos compartilhados por todos os semáforos. A memória cresce com o número de atributos, não com
+# o número de estados. O treino usa minilotes sorteados de um replay buffer e uma cópia-alvo dos pesos.
+
+MAX_APPROACHES = 4  # aproximações por semáforo nos atributos (as que faltam ficam com zero)
+
+# Escalas de normalização dos atributos e da recompensa
+QUEUE_SCALE = 10.0    # veículos parados por aproximação
+WAIT_SCALE = 300.0    # segundos de espera somados por aproximação
+SPEED_SCALE = 15.0    # m/s
+REWARD_SCALE = 1000.0
+
+LEARNING_RATE = 1e-3
+GAMMA = 0.9
+BATCH_SIZE = 64
+REPLAY_CAPACITY = 50000
+TARGET_SYNC = 200     # atualizações entre cópias dos pesos para a rede-alvo
+HUBER = 1.0           # erro TD acima disso contribui com gradiente constante
+
+
+# Monta a matriz de atributos [n_semáforos, dim] de todos os semáforos a partir de um único snapshot.
+# As seleções de faixas por aproximação e por eixo são matrizes construídas uma vez a partir da
+# topologia, então extrair os atributos é só um punhado de produtos de matrizes.
+class FeatureExtractor:
+
+    def __init__(self, snapshot, topology):
+        self.snapshot = snapshot
+        self.tl_ids = snapshot.tl_ids
+        self.tl_index = snapshot.tl_index
+        n_tl, n_lanes = len(self.tl_ids), len(snapshot.lanes)
+        outside = n_lanes  # coluna das faixas fora do controle (sempre zero)
+        self.approaches = np.zeros((n_tl, MAX_APPROACHES, n_lanes), dtype=np.float64)
+        # pressão por eixo: fila na faixa de entrada menos fila na faixa de saída (que é a entrada do vizinho)
+        self.pressure = np.zeros((n_tl, 2, n_lanes + 1), dtype=np.float64)
+        for t, tl in enumerate(self.tl_ids):
+            links = topology.links(tl)
+            in_lanes = list(dict.fromkeys(link["faixa"] for link in links))[:MAX_APPROACHES]
+            for k, lane in enumerate(in_lanes):
+                self.approaches[t, k, snapshot.lane_index[lane]] = 1.0
+            for link in links:
+                axis = int(link["eixo"] == "vertical")
+                self.pressure[t, axis, snapshot.lane_index[link["faixa"]]] += 1.0
+                self.pressure[t, axis, snapshot.lane_index.get(link["saida"], outside)] -= 1.0
+            counts = np.maximum(1, [sum(link["eixo"] == axis for link in links) for axis in ("horizontal", "vertical")])
+            self.pressure[t] /= counts[:, None]
+        self.dim = 2 * MAX_APPROACHES + 2 + 2 + 2 + 2
+
+    def extract(self, current):
+        # current: {semáforo: direção verde atual ou None}
+        snap = self.snapshot.refresh()
+        n_tl, n_lanes = len(self.tl_ids), len(snap.lanes)
+        halting = snap.lane_halting.astype(np.float64)
+        waiting = np.bincount(snap.lane, weights=snap.waiting, minlength=n_lanes + 1)[:n_lanes]
+        X = np.empty((n_tl, self.dim), dtype=np.float64)
+        m = MAX_APPROACHES
+        X[:, :m] = self.approaches @ halting / QUEUE_SCALE
+        X[:, m:2 * m] = self.approaches @ waiting / WAIT_SCALE
+        X[:, 2 * m:2 * m + 2] = self.pressure @ np.append(halting, 0.0) / QUEUE_SCALE
+        priority = snap.priority_per_tl()
+        for t, tl in enumerate(self.tl_ids):
+            phase = current.get(tl)
+            X[t, 2 * m + 2] = phase == "horizontal"
+            X[t, 2 * m + 3] = phase == "vertical"
+            direction, level = priority[tl]
+            X[t, 2 * m + 4] = level / 2 if direction == "horizontal" else 0.0
+            X[t, 2 * m + 5] = level / 2 if direction == "vertical" else 0.0
+        X[:, 2 * m + 6] = snap.mean_moving_speed() / SPEED_SCALE
+        X[:, 2 * m + 7] = 1.0  # viés
+        return X
+
+
+# Transições guardadas em arrays pré-alocados (anel): memória fixa, sorteio de minilotes vetorizado
+class ReplayBuffer:
+
+    def __init__(self, dim, capacity=REPLAY_CAPACITY, seed=0):
+        self.features = np.zeros((capacity, dim), dtype=np.float32)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_features = np.zeros((capacity, dim), dtype=np.float32)
+        self.capacity = capacity
+        self.size = 0
+        self._next = 0
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, x, action, reward, x2):
+        i = self._next
+        self.features[i], self.actions[i], self.rewards[i], self.next_features[i] = x, action, reward, x2
+        self._next = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batch_size):
+        idx = self.rng.integers(0, self.size, size=batch_size)
+        return self.features[idx], self.actions[idx], self.rewards[idx], self.next_features[idx]
+
+
+# hidden=0: Q(x) = x W + b (linear); hidden>0: uma camada oculta ReLU. Otimizador Adam, perda de Huber.
+class ApproxAgent:
+
+    def __init__(self, dim, hidden=0, actions=ACTIONS, lr=LEARNING_RATE, gamma=GAMMA, seed=0, params=None):
+        self.dim = dim
+        self.hidden = hidden
+        self.actions = tuple(actions)
+        self.action_index = {a: i for i, a in enumerate(self.actions)}
+        self.lr = lr
+        self.gamma = gamma
+        rng = np.random.default_rng(seed)
+        n_actions = len(self.actions)
+        if params is None:
+            if hidden:
+                params = {"W1": rng.normal(0, np.sqrt(2 / dim), (dim, hidden)), "b1": np.zeros(hidden),
+                          "W2": rng.normal(0, np.sqrt(1 / hidden), (hidden, n_actions)), "b2": np.zeros(n_actions)}
+            else:
+                params = {"W2": np.zeros((dim, n_actions)), "b2": np.zeros(n_actions)}
+        self.params = params
+        self.target = {k: v.copy() for k, v in params.items()}
+        self._m = {k: np.zeros_like(v) for k, v in params.items()}
+        self._v = {k: np.zeros_like(v) for k, v in params.items()}
+        self.updates = 0
+
+    @property
+    def kind(self):
+        return "mlp" if self.hidden else "linear"
+
+    def _forward(self, params, X):
+        if self.hidden:
+            pre = X @ params["W1"] + params["b1"]
+            h = np.maximum(pre, 0.0)
+        else:
+            pre = h = X
+        return h @ params["W2"] + params["b2"], h, pre
+
+    def q_values(self, X):
+        return self._forward(self.params, np.atleast_2d(X))[0]
+
+    def greedy(self, X):
+        # Em empate prevalece a primeira ação, como na Q-table
+        return self.q_values(X).argmax(axis=1)
+
+    def best_action(self, x):
+        return self.actions[int(self.greedy(x)[0])]
+
+    def train_batch(self, X, actions, rewards, X2):
+        n = len(X)
+        target = rewards / REWARD_SCALE + self.gamma * self._forward(self.target, X2)[0].max(axis=1)
+        q, h, pre = self._forward(self.params, X)
+        rows = np.arange(n)
+        dq = np.zeros_like(q)
+        dq[rows, actions] = np.clip(q[rows, actions] - target, -HUBER, HUBER) / n
+        grads = {"W2": h.T @ dq, "b2": dq.sum(axis=0)}
+        if self.hidden:
+            dh = (dq @ self.params["W2"].T) * (pre > 0)
+            grads["W1"] = X.T @ dh
+            grads["b1"] = dh.sum(axis=0)
+        self._adam(grads)
+        self.updates += 1
+        if self.updates % TARGET_SYNC == 0:
+            self.target = {k: v.copy() for k, v in self.params.items()}
+
+    def _adam(self, grads, beta1=0.9, beta2=0.999, eps=1e-8):
+        t = self.updates + 1
+        for k, g in grads.items():
+            self._m[k] = beta1 * self._m[k] + (1 - beta1) * g
+            self._v[k] = beta2 * self._v[k] + (1 - beta2) * g * g
+            m_hat = self._m[k] / (1 - beta1 ** t)
+            v_hat = self._v[k] / (1 - beta2 ** t)
+            self.params[k] -= self.lr * m_hat / (np.sqrt(v_hat) + eps)
+
+    def n_parameters(self):
+        return sum(v.size for v in self.params.values())
+
+    # ---------- persistência ----------
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, dim=self.dim, hidden=self.hidden, actions=np.array(self.actions),
+                     **{f"param_{k}": v for k, v in self.params.items()})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            params = {k[len("param_"):]: data[k] for k in data.files if k.startswith("param_")}
+            return cls(int(data["dim"]), int(data["hidden"]), tuple(str(a) for a in data["actions"]), params=params)
+
+
+def new_agent(kind, dim, hidden=32, seed=0):
+    if kind not in ("linear", "mlp"):
+        raise ValueError(f"Agente desconhecido: {kind!r} (use linear ou mlp)")
+    return ApproxAgent(dim, hidden if kind == "mlp" else 0, seed=seed)
@@ -0,0 +1,122 @@
+import heapq
+from collections import Counter, defaultdict
+import numpy as np
+
+# Regras de atualização da Q-table além do Q-learning de um passo (QTable.update), para aproveitar
+# mais cada transição simulada e convergir em menos episódios:
+#   QLambda:            Q(λ) de Watkins; cada transição também credita, com peso (γλ)^k, as decisões
+#                       anteriores do mesmo semáforo; os rastros são cortados quando a ação escolhida
+#                       não é a gulosa. Com λ = 0 é exatamente o Q-learning de um passo.
+#   PrioritizedSweeping: além do passo TD, mantém um modelo (contagens de estado seguinte e recompensa
+#                       média por célula) e, a cada transição real, faz até n atualizações de planejamento
+#                       nas células com maior erro de Bellman, propagando para os predecessores.
+# Ambas são usadas por treinamento_Qlearning.learn() com --update lambda|sweeping.
+
+LAMBDA = 0.8
+MIN_TRACE = 1e-3          # rastros abaixo disso são descartados
+PLANNING_STEPS = 20       # atualizações de planejamento por transição real
+PRIORITY_THRESHOLD = 1.0  # erro de Bellman mínimo para entrar na fila
+
+
+class QLambda:
+
+    def __init__(self, alpha, gamma, lam=LAMBDA, min_trace=MIN_TRACE):
+        self.alpha = alpha
+        self.gamma = gamma
+        self.lam = lam
+        self.min_trace = min_trace
+        self.traces = {}  # índice do semáforo -> {(código do estado, ação): rastro}
+
+    def reset(self):
+        # Início de episódio: nenhuma decisão anterior a creditar
+        self.traces = {}
+
+    def update(self, Q, tl, state, action, reward, next_state):
+        t = Q.tl_index[tl]
+        code, a = Q.encode(state), Q.action_index[action]
+        delta = reward + self.gamma * Q.values[t, Q.encode(next_state)].max() - Q.values[t, code, a]
+        trace = self.traces.setdefault(t, {})
+        trace[(code, a)] = 1.0  # rastro substituído (não acumula em visitas repetidas)
+        cells = np.array(list(trace), dtype=np.int64)
+        values = np.fromiter(trace.values(), dtype=np.float64, count=len(trace))
+        Q.values[t, cells[:, 0], cells[:, 1]] += self.alpha * delta * values
+        values *= self.gamma * self.lam
+        keep = values >= self.min_trace
+        self.traces[t] = dict(zip(map(tuple, cells[keep].tolist()), values[keep]))
+
+    def on_action(self, Q, tl, state, action):
+        # Watkins: depois de uma ação exploratória o retorno deixa de ser o da política gulosa
+        if action != Q.best_action(tl, state):
+            self.traces.pop(Q.tl_index[tl], None)
+
+
+class PrioritizedSweeping:
+
+    def __init__(self, alpha, gamma, planning_steps=PLANNING_STEPS, threshold=PRIORITY_THRESHOLD):
+        self.alpha = alpha
+        self.gamma = gamma
+        self.planning_steps = planning_steps
+        self.threshold = threshold
+        # modelo aprendido, acumulado entre episódios
+        self.counts = defaultdict(Counter)          # (t, código, ação) -> {código seguinte: contagem}
+        self.reward_sum = defaultdict(float)        # (t, código, ação) -> soma das recompensas
+        self.predecessors = defaultdict(set)        # (t, código seguinte) -> {(código, ação)}
+        self._queue = []
+        self._priority = {}                         # prioridade atual de cada célula na fila
+        self.planning_updates = 0
+
+    def reset(self):
+        pass  # o modelo vale para todos os episódios
+
+    def _expected_target(self, Q, cell):
+        t = cell[0]
+        nexts = self.counts[cell]
+        n = sum(nexts.values())
+        codes = np.fromiter(nexts.keys(), dtype=np.int64, count=len(nexts))
+        weights = np.fromiter(nexts.values(), dtype=np.float64, count=len(nexts)) / n
+        return self.reward_sum[cell] / n + self.gamma * weights @ Q.values[t, codes].max(axis=-1)
+
+    def _push(self, Q, cell):
+        priority = abs(self._expected_target(Q, cell) - Q.values[cell])
+        if priority > self.threshold and priority > self._priority.get(cell, 0.0):
+            self._priority[cell] = priority
+            heapq.heappush(self._queue, (-priority, cell))
+
+    def update(self, Q, tl, state, action, reward, next_state):
+        Q.update(tl, state, action, reward, next_state, self.alpha, self.gamma)
+        t = Q.tl_index[tl]
+        cell, next_code = (t, Q.encode(state), Q.action_index[action]), Q.encode(next_state)
+        self.counts[cell][next_code] += 1
+        self.reward_sum[cell] += reward
+        self.predecessors[(t, next_code)].add(cell[1:])
+        self._push(Q, cell)
+        self.plan(Q)
+
+    def plan(self, Q):
+        for _ in range(self.planning_steps):
+            if not self._queue:
+                break
+            priority, cell = heapq.heappop(self._queue)
+            if self._priority.get(cell) != -priority:
+                continue  # entrada antiga, a célula já foi atualizada ou reenfileirada com prioridade maior
+            del self._priority[cell]
+            # atualização completa pelo modelo (valor esperado sobre os estados seguintes observados)
+            Q.values[cell] = self._expected_target(Q, cell)
+            self.planning_updates += 1
+            t, code, _ = cell
+            for pred_code, pred_action in self.predecessors[(t, code)]:
+                self._push(Q, (t, pred_code, pred_action))
+
+    def on_action(self, Q, tl, state, action):
+        pass
+
+
+def new_updater(kind, alpha, gamma, lam=LAMBDA, planning_steps=PLANNING_STEPS):
+    # kind: "td" (None: QTable.update direto), "lambda" ou "sweeping"
+    if kind == "td":
+        return None
+    if kind == "lambda":
+        return QLambda(alpha, gamma, lam)
+    if kind == "sweeping":
+        return PrioritizedSweeping(alpha, gamma, planning_steps)
+    raise ValueError(f"Atualização desconhecida: {kind!r} (use td, lambda ou sweeping)")
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import sumo_backend
+import traci_simulado
+
+# Benchmark dos laços de controle sobre o TraCI simulado (traci_simulado.py): não precisa do SUMO.
+# Para cada laço (treinamento, simulação Q-learning e tempo fixo) mede decisões por segundo,
+# chamadas TraCI por decisão e pico de memória do episódio; no treinamento também mede
+# o custo por chamada das funções quentes (get_state, choose_action, apply_phase, reward_components).
+
+sumo_backend.register_backend("simulado", "traci_simulado")
+
+HOT_FUNCTIONS = ["get_state", "choose_action", "apply_phase", "reward_components"]
+
+
+# Substitui temporariamente funções de um módulo por versões que acumulam tempo,
+# número de chamadas e chamadas TraCI feitas dentro delas
+@contextlib.contextmanager
+def timed_functions(module, names):
+    stats = {name: {"chamadas": 0, "segundos": 0.0, "traci": 0} for name in names}
+    originals = {name: getattr(module, name) for name in names}
+
+    def wrap(name, func):
+        def timed(*args, **kwargs):
+            calls_before = traci_simulado.total_calls()
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                s = stats[name]
+                s["segundos"] += time.perf_counter() - t0
+                s["chamadas"] += 1
+                s["traci"] += traci_simulado.total_calls() - calls_before
+        return timed
+
+    for name, func in originals.items():
+        setattr(module, name, wrap(name, func))
+    try:
+        yield stats
+    finally:
+        for name, func in originals.items():
+            setattr(module, name, func)
+
+
+@contextlib.contextmanager
+def measure(result, trace_memory):
+    # Tempo de parede, chamadas TraCI e (se trace_memory) pico de memória alocada pelo Python no bloco.
+    # O tracemalloc deixa o código bem mais lento, por isso tempo e memória vêm de passadas separadas.
+    traci_simulado.reset_calls()
+    if trace_memory:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        result["segundos"] = time.perf_counter() - t0
+        result["segundos_simulador"] = traci_simulado.step_seconds
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result["memoria_pico_mb"] = peak / 2**20
+        result["chamadas_traci"] = traci_simulado.total_calls()
+        result["chamadas_por_api"] = dict(traci_simulado.calls.most_common())
+
+
+def finish(result):
+    decisions = max(1, result["decisoes"])
+    result["decisoes_por_segundo"] = result["decisoes"] / result["segundos"] if result["segundos"] else 0.0
+    result["traci_por_decisao"] = result["chamadas_traci"] / decisions
+    # Custo do controle por decisão, sem o tempo gasto avançando o simulador falso
+    result["ms_controle_por_decisao"] = 1000 * (result["segundos"] - result["segundos_simulador"]) / decisions
+    return result
+
+
+def bench_treinamento(seed, quiet, trace_memory=False):
+    import numpy as np
+    import treinamento_Qlearning as tr
+
+    random.seed(seed)
+    Q = tr.new_q_table()
+    visits = np.zeros(Q.values.shape, dtype=np.int64)
+    result = {"laco": "treinamento"}
+    with timed_functions(tr, HOT_FUNCTIONS) as stats, measure(result, trace_memory), _silence(quiet):
+        _, steps = tr.run_episode(Q, tr.EPSILON, visits, seed=seed, backend="simulado")
+    result["passos"] = steps
+    result["decisoes"] = int(visits.sum())  # uma atualização da Q-table por decisão
+    result["funcoes"] = {name: {"ms_por_chamada": 1000 * s["segundos"] / max(1, s["chamadas"]),
+                                "traci_por_chamada": s["traci"] / max(1, s["chamadas"]),
+                                "chamadas": s["chamadas"]}
+                         for name, s in stats.items()}
+    return finish(result), Q
+
+
+def bench_qlearning(seed, q_table_path, output_dir, quiet, trace_memory=False):
+    import simulacao_Qlearning as sim
+    from qtable import QTable
+
+    decisions = [0]
+    best_action = QTable.best_action
+
+    def counted_best_action(self, tl, state):
+        decisions[0] += 1
+        return best_action(self, tl, state)
+
+    result = {"laco": "simulacao_qlearning"}
+    QTable.best_action = counted_best_action
+    try:
+        with measure(result, trace_memory), _silence(quiet):
+            df = sim.run_simulation(backend="simulado", sumo_args=["--seed", str(seed)],
+                                    output_dir=output_dir, q_table_path=q_table_path)
+    finally:
+        QTable.best_action = best_action
+    result["passos"] = int(df["tempo"].max())
+    result["decisoes"] = decisions[0]
+    return finish(result)
+
+
+def bench_tempo_fixo(seed, output_dir, quiet, trace_memory=False):
+    import tempo_fixo
+
+    result = {"laco": "tempo_fixo"}
+    with measure(result, trace_memory), _silence(quiet):
+        df = tempo_fixo.run_fixed_time_simulation("simulado", ["--seed", str(seed)], output_dir)
+    result["passos"] = int(df["tempo"].max())
+    # O plano roda como programa do SUMO: o laço só acorda para coletar cada amostra de métricas
+    result["decisoes"] = len(df)
+    return finish(result)
+
+
+def _silence(quiet):
+    return contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext()
+
+
+def run_benchmarks(vehicles, duration, seed, loops, quiet=True):
+    import treinamento_Qlearning as tr
+    traci_simulado.configure(tl_ids=tr.TRAFFIC_LIGHT_IDS, vehicles=vehicles, duration=duration, seed=seed)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        Q = None
+        if "treinamento" in loops:
+            result, Q = bench_treinamento(seed, quiet)
+            result["memoria_pico_mb"] = bench_treinamento(seed, quiet, trace_memory=True)[0]["memoria_pico_mb"]
+            results.append(result)
+        if "qlearning" in loops:
+            q_path = os.path.join(tmp, "q_table.npz")
+            (Q or tr.new_q_table()).save(q_path)
+            args = (seed, q_path, os.path.join(tmp, "qlearning"), quiet)
+            result = bench_qlearning(*args)
+            result["memoria_pico_mb"] = bench_qlearning(*args, trace_memory=True)["memoria_pico_mb"]
+            results.append(result)
+        if "tempo_fixo" in loops:
+            args = (seed, os.path.join(tmp, "tempo_fixo"), quiet)
+            result = bench_tempo_fixo(*args)
+            result["memoria_pico_mb"] = bench_tempo_fixo(*args, trace_memory=True)["memoria_pico_mb"]
+            results.append(result)
+    return {"veiculos": vehicles, "duracao": duration, "semente": seed, "resultados": results}
+
+
+def print_report(report):
+    print(f"🚗 Cenário simulado: {report['veiculos']} veículos em {report['duracao']}s (semente {report['semente']})")
+    print(f"{'laço':<22}{'passos':>8}{'decisões':>10}{'decisões/s':>12}{'ms controle/dec.':>18}{'TraCI/decisão':>15}{'memória (MB)':>14}")
+    for r in report["resultados"]:
+        print(f"{r['laco']:<22}{r['passos']:>8}{r['decisoes']:>10}{r['decisoes_por_segundo']:>12.1f}"
+              f"{r['ms_controle_por_decisao']:>18.3f}{r['traci_por_decisao']:>15.2f}{r['memoria_pico_mb']:>14.2f}")
+        for name, f in r.get("funcoes", {}).items():
+            print(f"    {name:<24}{f['ms_por_chamada']:>8.3f} ms/chamada {f['traci_por_chamada']:>8.2f} TraCI/chamada")
+
+
+def compare(report, baseline, tolerance):
+    # Regressão: decisões/s caiu mais que a tolerância ou TraCI/decisão aumentou
+    previous = {r["laco"]: r for r in baseline["resultados"]}
+    regressions = []
+    for r in report["resultados"]:
+        old = previous.get(r["laco"])
+        if old is None:
+            continue
+        if r["decisoes_por_segundo"] < old["decisoes_por_segundo"] * (1 - tolerance):
+            regressions.append(f"{r['laco']}: {old['decisoes_por_segundo']:.1f} -> {r['decisoes_por_segundo']:.1f} decisões/s")
+        if r["traci_por_decisao"] > old["traci_por_decisao"] * (1 + tolerance):
+            regressions.append(f"{r['laco']}: {old['traci_por_decisao']:.2f} -> {r['traci_por_decisao']:.2f} TraCI/decisão")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dos laços de controle com o TraCI simulado (sem SUMO)")
+    parser.add_argument("--vehicles", type=int, default=300, help="veículos na demanda sintética")
+    parser.add_argument("--duration", type=int, default=900, help="janela de partidas (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--loops", nargs="+", choices=["treinamento", "qlearning", "tempo_fixo"],
+                        default=["treinamento", "qlearning", "tempo_fixo"])
+    parser.add_argument("--output", default=None, help="grava o relatório em JSON")
+    parser.add_argument("--baseline", default=None, help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="piora relativa aceita em relação ao baseline")
+    parser.add_argument("--verbose", action="store_true", help="mostra a saída dos scripts")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.vehicles, args.duration, args.seed, args.loops, quiet=not args.verbose)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"📁 Relatório salvo em '{args.output}'")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"⚠️ Regressão: {line}")
+        if regressions:
+            sys.exit(1)
+        print("✅ Sem regressões em relação ao baseline")
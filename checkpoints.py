@@ -0,0 +1,99 @@
+import json
+import os
+import random
+import sumo_backend
+from sumo_backend import traci
+
+# Biblioteca de estados salvos do SUMO (simulation.saveState) para iniciar episódios
+# já no meio do tráfego, sem repetir o transitório de enchimento da rede a partir de t=0.
+# Os estados ficam em um diretório com um manifesto JSON (tempo e nº de veículos de cada um).
+LIBRARY_DIR = "checkpoints"
+MANIFEST = "manifesto.json"
+SUMO_CFG_FILE = "mapa_final_sumo.sumocfg"
+
+
+class CheckpointLibrary:
+
+    def __init__(self, directory=LIBRARY_DIR):
+        self.directory = directory
+        self.entries = []
+        path = os.path.join(directory, MANIFEST)
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def path(self, entry):
+        return os.path.abspath(os.path.join(self.directory, entry["arquivo"]))
+
+    def add(self, label=""):
+        # Salva o estado atual da simulação em execução
+        os.makedirs(self.directory, exist_ok=True)
+        time = traci.simulation.getTime()
+        entry = {
+            "arquivo": f"estado{label}_t{int(time)}.xml",
+            "tempo": time,
+            "veiculos": traci.vehicle.getIDCount(),
+        }
+        traci.simulation.saveState(self.path(entry))
+        self.entries = [e for e in self.entries if e["arquivo"] != entry["arquivo"]] + [entry]
+        self.save()
+        return entry
+
+    def save(self):
+        with open(os.path.join(self.directory, MANIFEST), "w") as f:
+            json.dump(self.entries, f, indent=1)
+
+    def sample(self, rng=random, weighted=True):
+        # Estados com mais veículos são sorteados com mais frequência: é onde o controle importa.
+        # A entrada devolvida leva o caminho absoluto do estado e pode ser passada a load_args().
+        if not self.entries:
+            return None
+        weights = [1 + e["veiculos"] for e in self.entries] if weighted else None
+        entry = rng.choices(self.entries, weights=weights)[0]
+        return dict(entry, caminho=self.path(entry))
+
+
+def load_args(entry):
+    # Opções do SUMO para começar no estado salvo, a usar no start ou no traci.load do episódio.
+    # Carregar pelo --load-state (e não por simulation.loadState na simulação em andamento)
+    # restaura também os geradores aleatórios e o programa dos semáforos: dois episódios que
+    # partem do mesmo estado com as mesmas ações evoluem exatamente igual.
+    return ["--load-state", entry["caminho"]]
+
+
+def build_library(times, directory=LIBRARY_DIR, backend=None, seed=None, sumo_args=(), label=""):
+    # Execução de referência com o programa de semáforos da própria rede, salvando o estado nos tempos pedidos
+    library = CheckpointLibrary(directory)
+    # --save-state.rng: o estado inclui os geradores aleatórios (ver load_args)
+    args = ["-c", SUMO_CFG_FILE, "--step-length", "1.0", "--save-state.rng", "true", *sumo_args]
+    if seed is not None:
+        args += ["--seed", str(seed)]
+        label = label or f"_s{seed}"
+    sumo_backend.start(args, backend, default="sumo")
+    try:
+        for time in sorted(times):
+            while traci.simulation.getTime() < time and traci.simulation.getMinExpectedNumber() > 0:
+                traci.simulationStep()
+            if traci.simulation.getMinExpectedNumber() == 0:
+                print(f"⚠️ Simulação terminou antes de t={time}")
+                break
+            entry = library.add(label)
+            print(f"💾 Estado salvo em t={entry['tempo']:.0f}s ({entry['veiculos']} veículos): {entry['arquivo']}")
+    finally:
+        traci.close()
+    return library
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Gera a biblioteca de estados salvos usada para iniciar episódios de treinamento")
+    parser.add_argument("times", nargs="+", type=float, help="tempos de simulação (s) em que o estado é salvo")
+    parser.add_argument("--directory", default=LIBRARY_DIR)
+    parser.add_argument("--seed", type=int, default=None)
+    sumo_backend.add_backend_argument(parser, default="sumo")
+    args = parser.parse_args()
+    library = build_library(args.times, args.directory, args.backend, args.seed)
+    print(f"✅ {len(library)} estados em '{args.directory}'")
@@ -1,155 +1,165 @@
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # só gravamos PNGs; os workers não precisam de janela
 import matplotlib.pyplot as plt
-import os
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas as pdfcanvas
 from reportlab.platypus import Image, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
 
 # Diretórios de resultados
-fixed_dir = "resultados_tempo_fixo"
-rl_dir = "resultados_qlearning"
-
-# Arquivos de resultado
-fixed_files = {
-    'carros_parados': os.path.join(fixed_dir, "resultado_tempo_fixo.csv"),
-    'total_paradas': os.path.join(fixed_dir, "paradas_tempo_fixo.csv"),
-    'tempo_espera': os.path.join(fixed_dir, "espera_tempo_fixo.csv"),
-    'velocidade_media': os.path.join(fixed_dir, "velocidade_tempo_fixo.csv"),
-    'densidade_media': os.path.join(fixed_dir, "densidade_tempo_fixo.csv"),
-    'tempo_espera_emergency': os.path.join(fixed_dir, "emergency_tempo_fixo.csv"),
-    'tempo_espera_authority': os.path.join(fixed_dir, "authority_tempo_fixo.csv"),
-    'densidade_media_prioritarios': os.path.join(fixed_dir, "densidade_prioritarios_tempo_fixo.csv"),
-    'carros_parados_prioritarios': os.path.join(fixed_dir, "carros_parados_prioritarios_tempo_fixo.csv"),
-    'total_paradas_prioritarios': os.path.join(fixed_dir, "paradas_prioritarios_tempo_fixo.csv"),
-    'tempo_espera_prioritarios': os.path.join(fixed_dir, "espera_prioritarios_tempo_fixo.csv"),
-    'velocidade_media_prioritarios': os.path.join(fixed_dir, "velocidade_prioritarios_tempo_fixo.csv")
+FIXED_DIR = "resultados_tempo_fixo"
+RL_DIR = "resultados_qlearning"
+OUTPUT_DIR = "relatorio"
+
+# Manifesto com o hash dos CSVs de cada métrica e as estatísticas já calculadas
+CACHE_FILE = ".cache_relatorio.json"
+# Incrementar quando mudar o desenho dos gráficos ou o cálculo das estatísticas, para invalidar o cache
+CACHE_VERSION = 1
+PLOT_DPI = 300
+
+# Arquivos de resultado: métrica -> prefixo do CSV (o sufixo é _tempo_fixo ou _qlearning)
+FILE_PREFIXES = {
+    'carros_parados': "resultado",
+    'total_paradas': "paradas",
+    'tempo_espera': "espera",
+    'velocidade_media': "velocidade",
+    'densidade_media': "densidade",
+    'tempo_espera_emergency': "emergency",
+    'tempo_espera_authority': "authority",
+    'densidade_media_prioritarios': "densidade_prioritarios",
+    'carros_parados_prioritarios': "carros_parados_prioritarios",
+    'total_paradas_prioritarios': "paradas_prioritarios",
+    'tempo_espera_prioritarios': "espera_prioritarios",
+    'velocidade_media_prioritarios': "velocidade_prioritarios"
 }
-rl_files = {
-    'carros_parados': os.path.join(rl_dir, "resultado_qlearning.csv"),
-    'total_paradas': os.path.join(rl_dir, "paradas_qlearning.csv"),
-    'tempo_espera': os.path.join(rl_dir, "espera_qlearning.csv"),
-    'velocidade_media': os.path.join(rl_dir, "velocidade_qlearning.csv"),
-    'densidade_media': os.path.join(rl_dir, "densidade_qlearning.csv"),
-    'tempo_espera_emergency': os.path.join(rl_dir, "emergency_qlearning.csv"),
-    'tempo_espera_authority': os.path.join(rl_dir, "authority_qlearning.csv"),
-    'densidade_media_prioritarios': os.path.join(rl_dir, "densidade_prioritarios_qlearning.csv"),
-    'carros_parados_prioritarios': os.path.join(rl_dir, "carros_parados_prioritarios_qlearning.csv"),
-    'total_paradas_prioritarios': os.path.join(rl_dir, "paradas_prioritarios_qlearning.csv"),
-    'tempo_espera_prioritarios': os.path.join(rl_dir, "espera_prioritarios_qlearning.csv"),
-    'velocidade_media_prioritarios': os.path.join(rl_dir, "velocidade_prioritarios_qlearning.csv")
+# Ordem dos gráficos e das seções do relatório
+METRICS = ['carros_parados', 'total_paradas', 'tempo_espera', 'velocidade_media', 'densidade_media', 'tempo_espera_emergency', 'tempo_espera_authority', 'carros_parados_prioritarios', 'total_paradas_prioritarios', 'tempo_espera_prioritarios', 'velocidade_media_prioritarios', 'densidade_media_prioritarios']
+
+# Métricas cuja série mais curta é completada até o fim da mais longa
+PADDED_METRICS = ['carros_parados', 'total_paradas', 'tempo_espera', 'velocidade_media', 'carros_parados_prioritarios', 'total_paradas_prioritarios', 'tempo_espera_prioritarios', 'velocidade_media_prioritarios', 'densidade_media_prioritarios']
+
+metric_labels = {
+    'carros_parados': 'Número de Carros Parados',
+    'total_paradas': 'Total de Paradas (Estimativa)',
+    'tempo_espera': 'Tempo Médio de Espera (s)',
+    'velocidade_media': 'Velocidade Média (m/s)',
+    'densidade_media': 'Densidade (veículos/km/faixa)',
+    'tempo_espera_emergency': 'Tempo de Espera Médio - Emergência (s)',
+    'tempo_espera_authority': 'Tempo de Espera Médio - Autoridade (s)',
+    'carros_parados_prioritarios': 'Número de Carros Parados - Prioritários',
+    'total_paradas_prioritarios': 'Total de Paradas - Prioritários (Estimativa)',
+    'tempo_espera_prioritarios': 'Tempo Médio de Espera - Prioritários (s)',
+    'velocidade_media_prioritarios': 'Velocidade Média - Prioritários (m/s)',
+    'densidade_media_prioritarios': 'Densidade - Prioritários (veículos/km/faixa)'
 }
 
-# Diretório de saída
-output_dir = "relatorio"
-os.makedirs(output_dir, exist_ok=True)
 
-# Leitura dos dados
-dfs_fixed = {}
-dfs_rl = {}
-for key, file in fixed_files.items():
-    try:
-        dfs_fixed[key] = pd.read_csv(file)
-    except FileNotFoundError:
-        print(f"Arquivo {file} não encontrado.")
-        dfs_fixed[key] = pd.DataFrame()
+def result_files(fixed_dir, rl_dir):
+    fixed_files = {m: os.path.join(fixed_dir, f"{p}_tempo_fixo.csv") for m, p in FILE_PREFIXES.items()}
+    rl_files = {m: os.path.join(rl_dir, f"{p}_qlearning.csv") for m, p in FILE_PREFIXES.items()}
+    return fixed_files, rl_files
 
-for key, file in rl_files.items():
-    try:
-        dfs_rl[key] = pd.read_csv(file)
-    except FileNotFoundError:
-        print(f"Arquivo {file} não encontrado.")
-        dfs_rl[key] = pd.DataFrame()
-
-# Padding dos dados para igualar os tempos
-for metric in ['carros_parados', 'total_paradas', 'tempo_espera', 'velocidade_media', 'carros_parados_prioritarios', 'total_paradas_prioritarios', 'tempo_espera_prioritarios', 'velocidade_media_prioritarios', 'densidade_media_prioritarios']:
-    if metric not in dfs_fixed or metric not in dfs_rl:
-        continue
-    df_fixed = dfs_fixed[metric]
-    df_rl = dfs_rl[metric]
-    if not df_fixed.empty and not df_rl.empty:
-        max_time = int(max(df_fixed['tempo'].max(), df_rl['tempo'].max()))
-        min_fixed = df_fixed[metric].min()
-        min_rl = df_rl[metric].min()
-        # Pad fixed if shorter
-        if df_fixed['tempo'].max() < max_time:
-            last_time = int(df_fixed['tempo'].max())
-            for t in range(last_time + 1, max_time + 1):
-                new_row = {'tempo': t, metric: min_fixed}
-                df_fixed = pd.concat([df_fixed, pd.DataFrame([new_row])], ignore_index=True)
-        # Pad rl if shorter
-        if df_rl['tempo'].max() < max_time:
-            last_time = int(df_rl['tempo'].max())
-            for t in range(last_time + 1, max_time + 1):
-                new_row = {'tempo': t, metric: min_rl}
-                df_rl = pd.concat([df_rl, pd.DataFrame([new_row])], ignore_index=True)
-        dfs_fixed[metric] = df_fixed
-        dfs_rl[metric] = df_rl
 
 def get_column(metric):
     column_map = {
         'tempo_espera_emergency': 'media_espera_emergency',
         'tempo_espera_authority': 'media_espera_authority',
-        'carros_parados': 'carros_parados',
-        'total_paradas': 'total_paradas',
-        'tempo_espera': 'tempo_espera',
-        'velocidade_media': 'velocidade_media',
-        'densidade_media': 'densidade_media',
-        'carros_parados_prioritarios': 'carros_parados_prioritarios',
-        'total_paradas_prioritarios': 'total_paradas_prioritarios',
-        'tempo_espera_prioritarios': 'tempo_espera_prioritarios',
-        'velocidade_media_prioritarios': 'velocidade_media_prioritarios',
-        'densidade_media_prioritarios': 'densidade_media_prioritarios'
     }
     return column_map.get(metric, metric)
 
+
+def read_csv(file):
+    try:
+        return pd.read_csv(file)
+    except FileNotFoundError:
+        return pd.DataFrame()
+
+
+def file_hash(file):
+    try:
+        with open(file, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+# Completa a série até max_time com o menor valor observado, uma linha por segundo,
+# em um único concat (antes era um pd.concat por linha, quadrático no tamanho da execução)
+def pad_until(df, metric, max_time):
+    last_time = int(df['tempo'].max())
+    if last_time >= max_time:
+        return df
+    tempo = np.arange(last_time + 1, max_time + 1)
+    padding = pd.DataFrame({'tempo': tempo, metric: np.full(len(tempo), df[metric].min())})
+    return pd.concat([df, padding], ignore_index=True)
+
+
+def pad_pair(df_fixed, df_rl, metric):
+    # Padding dos dados para igualar os tempos
+    if df_fixed.empty or df_rl.empty:
+        return df_fixed, df_rl
+    max_time = int(max(df_fixed['tempo'].max(), df_rl['tempo'].max()))
+    return pad_until(df_fixed, metric, max_time), pad_until(df_rl, metric, max_time)
+
+
 # Cálculo de métricas agregadas
 def compute_metrics(df, metric):
     if df.empty:
         return {'media': 0, 'desvio_padrao': 0, 'maximo': 0, 'minimo': 0}
     column = get_column(metric)
+    # .item() devolve tipos Python (int/float) para o manifesto JSON, mantendo a formatação no HTML
     return {
-        'media': df[column].mean(),
-        'desvio_padrao': df[column].std(),
-        'maximo': df[column].max(),
-        'minimo': df[column].min()
+        'media': df[column].mean().item(),
+        'desvio_padrao': df[column].std().item(),
+        'maximo': df[column].max().item(),
+        'minimo': df[column].min().item()
     }
 
-metrics_fixed = {key: compute_metrics(df, key) for key, df in dfs_fixed.items()}
-metrics_rl = {key: compute_metrics(df, key) for key, df in dfs_rl.items()}
 
-# Plot comparativo para cada métrica
-metric_labels = {
-    'carros_parados': 'Número de Carros Parados',
-    'total_paradas': 'Total de Paradas (Estimativa)',
-    'tempo_espera': 'Tempo Médio de Espera (s)',
-    'velocidade_media': 'Velocidade Média (m/s)',
-    'densidade_media': 'Densidade (veículos/km/faixa)',
-    'tempo_espera_emergency': 'Tempo de Espera Médio - Emergência (s)',
-    'tempo_espera_authority': 'Tempo de Espera Médio - Autoridade (s)',
-    'carros_parados_prioritarios': 'Número de Carros Parados - Prioritários',
-    'total_paradas_prioritarios': 'Total de Paradas - Prioritários (Estimativa)',
-    'tempo_espera_prioritarios': 'Tempo Médio de Espera - Prioritários (s)',
-    'velocidade_media_prioritarios': 'Velocidade Média - Prioritários (m/s)',
-    'densidade_media_prioritarios': 'Densidade - Prioritários (veículos/km/faixa)'
-}
-for metric in ['carros_parados', 'total_paradas', 'tempo_espera', 'velocidade_media', 'densidade_media', 'tempo_espera_emergency', 'tempo_espera_authority', 'carros_parados_prioritarios', 'total_paradas_prioritarios', 'tempo_espera_prioritarios', 'velocidade_media_prioritarios', 'densidade_media_prioritarios']:
-    if metric not in dfs_fixed or metric not in dfs_rl:
-        continue
+# Executado em um processo do pool: lê os dois CSVs da métrica, aplica o padding,
+# calcula as estatísticas e grava o gráfico comparativo
+def render_metric(metric, fixed_file, rl_file, plot_path):
+    df_fixed = read_csv(fixed_file)
+    df_rl = read_csv(rl_file)
+    if metric in PADDED_METRICS:
+        df_fixed, df_rl = pad_pair(df_fixed, df_rl, metric)
+
     plt.figure(figsize=(12, 6))
-    if not dfs_fixed[metric].empty:
-        plt.plot(dfs_fixed[metric]['tempo'], dfs_fixed[metric][get_column(metric)], label='Tempo Fixo (Controle Tradicional)', color='blue', linewidth=2)
-    if not dfs_rl[metric].empty:
-        plt.plot(dfs_rl[metric]['tempo'], dfs_rl[metric][get_column(metric)], label='Q-Learning (Aprendizado por Reforço)', color='red', linewidth=2)
+    if not df_fixed.empty:
+        plt.plot(df_fixed['tempo'], df_fixed[get_column(metric)], label='Tempo Fixo (Controle Tradicional)', color='blue', linewidth=2)
+    if not df_rl.empty:
+        plt.plot(df_rl['tempo'], df_rl[get_column(metric)], label='Q-Learning (Aprendizado por Reforço)', color='red', linewidth=2)
     plt.title(f'Comparação de {metric_labels[metric]} ao Longo do Tempo', fontsize=16, fontweight='bold')
     plt.xlabel('Tempo de Simulação (segundos)', fontsize=14)
     plt.ylabel(metric_labels[metric], fontsize=14)
     plt.legend(fontsize=12)
     plt.grid(True, alpha=0.3)
     plt.tight_layout()
-    plot_path = os.path.join(output_dir, f'comparacao_{metric}.png')
-    plt.savefig(plot_path, dpi=300)
+    plt.savefig(plot_path, dpi=PLOT_DPI)
     plt.close()
+    return compute_metrics(df_fixed, metric), compute_metrics(df_rl, metric)
+
+
+def load_cache(output_dir):
+    try:
+        with open(os.path.join(output_dir, CACHE_FILE)) as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return cache.get("metricas", {}) if cache.get("versao") == CACHE_VERSION else {}
+
+
+def save_cache(output_dir, entries):
+    with open(os.path.join(output_dir, CACHE_FILE), "w") as f:
+        json.dump({"versao": CACHE_VERSION, "metricas": entries}, f, indent=1)
+
 
 # Geração de relatório em HTML
 def gerar_html(metrics_fixed, metrics_rl, output_file):
@@ -160,7 +170,7 @@ def gerar_html(metrics_fixed, metrics_rl, output_file):
         <h1>Relatório de Comparação: Tempo Fixo vs Q-Learning</h1>
         <p><strong>Interpretação:</strong> Este relatório compara o controle de semáforos tradicional (tempo fixo) com o aprendizado por reforço (Q-Learning). Valores menores em "Carros Parados", "Total de Paradas" e "Tempo de Espera" indicam melhor desempenho. Valores maiores em "Velocidade Média" são melhores.</p>
     """
-    for metric in ['carros_parados', 'total_paradas', 'tempo_espera', 'velocidade_media', 'densidade_media', 'tempo_espera_emergency', 'tempo_espera_authority', 'carros_parados_prioritarios', 'total_paradas_prioritarios', 'tempo_espera_prioritarios', 'velocidade_media_prioritarios', 'densidade_media_prioritarios']:
+    for metric in METRICS:
         if metric not in metrics_fixed or metric not in metrics_rl:
             continue
         html += """
@@ -182,11 +192,63 @@ def gerar_html(metrics_fixed, metrics_rl, output_file):
       </body>
     </html>
     """
+    # Só reescreve o arquivo se o conteúdo mudou
+    try:
+        with open(output_file) as f:
+            if f.read() == html:
+                return False
+    except FileNotFoundError:
+        pass
     with open(output_file, 'w') as f:
         f.write(html)
+    return True
+
+
+def gerar_relatorio(fixed_dir=FIXED_DIR, rl_dir=RL_DIR, output_dir=OUTPUT_DIR, processes=None, force=False):
+    os.makedirs(output_dir, exist_ok=True)
+    fixed_files, rl_files = result_files(fixed_dir, rl_dir)
+    cache = {} if force else load_cache(output_dir)
+
+    # Hash do conteúdo dos dois CSVs de cada métrica: só as métricas alteradas são relidas e re-plotadas
+    entries = {}
+    pending = []
+    for metric in METRICS:
+        hashes = [file_hash(fixed_files[metric]), file_hash(rl_files[metric])]
+        for file, h in zip((fixed_files[metric], rl_files[metric]), hashes):
+            if h is None:
+                print(f"Arquivo {file} não encontrado.")
+        plot_path = os.path.join(output_dir, f'comparacao_{metric}.png')
+        cached = cache.get(metric)
+        if cached and cached["hashes"] == hashes and os.path.exists(plot_path):
+            entries[metric] = cached
+        else:
+            entries[metric] = {"hashes": hashes}
+            pending.append((metric, fixed_files[metric], rl_files[metric], plot_path))
+
+    print(f"📊 {len(pending)} de {len(METRICS)} gráficos a gerar ({len(METRICS) - len(pending)} em cache)")
+    if pending:
+        with ProcessPoolExecutor(processes) as pool:
+            futures = [pool.submit(render_metric, *job) for job in pending]
+            for (metric, *_), future in zip(pending, futures):
+                entries[metric]["fixo"], entries[metric]["qlearning"] = future.result()
+        save_cache(output_dir, entries)
+
+    metrics_fixed = {m: entries[m]["fixo"] for m in METRICS}
+    metrics_rl = {m: entries[m]["qlearning"] for m in METRICS}
+    html_path = os.path.join(output_dir, 'relatorio_comparativo.html')
+    print(f"Gerando HTML em: {html_path}")
+    gerar_html(metrics_fixed, metrics_rl, html_path)
+
+    print(f"Relatórios gerados em: {output_dir}")
+    return metrics_fixed, metrics_rl
 
-html_path = os.path.join(output_dir, 'relatorio_comparativo.html')
-print(f"Gerando HTML em: {html_path}")
-gerar_html(metrics_fixed, metrics_rl, html_path)
 
-print(f"Relatórios gerados em: {output_dir}")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara Tempo Fixo e Q-Learning e gera o relatório em HTML")
+    parser.add_argument("--fixed-dir", default=FIXED_DIR)
+    parser.add_argument("--rl-dir", default=RL_DIR)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--processes", type=int, default=None, help="processos usados para desenhar os gráficos")
+    parser.add_argument("--force", action="store_true", help="ignora o cache e refaz todos os gráficos")
+    args = parser.parse_args()
+    gerar_relatorio(args.fixed_dir, args.rl_dir, args.output_dir, args.processes, args.force)
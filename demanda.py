@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+import os
+import time
+import numpy as np
+
+# Gerador de demanda sintética para testar os controladores sob carga alta (de centenas a 100k+ veículos).
+# As chegadas seguem um processo de Poisson com taxa (veículos/h) modulada por um perfil ao longo do
+# período; cada veículo entra por uma aresta da borda da rede e percorre a grade escolhendo, a cada
+# cruzamento, seguir em frente, virar à esquerda ou à direita com as proporções dadas, até sair pela
+# borda. Uma fração dos veículos é de emergência ou de autoridade. O arquivo de rotas é gravado à medida
+# que as chegadas são sorteadas, bloco a bloco em ordem de partida: a memória não cresce com a demanda.
+# Mesma semente e mesmos parâmetros => mesmo arquivo.
+NET_FILE = "mapa_final_sumo.net.xml"
+CHUNK_SECONDS = 60       # as chegadas são sorteadas e gravadas em blocos deste tamanho
+MAX_ROUTE_EDGES = 40     # limite do percurso (evita laços longos em redes sem saída próxima)
+
+# Multiplicadores da taxa ao longo do período (trechos iguais)
+PROFILES = {
+    "constante": [1.0],
+    "pico_manha": [0.4, 1.0, 2.0, 1.6, 1.0, 0.7],
+    "dois_picos": [0.4, 1.6, 1.0, 0.8, 1.6, 0.5],
+}
+
+# Tipos de veículo gravados no arquivo (a classe é o que analise_saidas.vtype_classes e o snapshot usam)
+VTYPES = {
+    "carro": 'vClass="passenger"',
+    "emergencia": 'vClass="emergency" guiShape="emergency"',
+    "autoridade": 'vClass="authority" guiShape="police"',
+}
+
+DIRECTIONS = {"s": "frente", "l": "esquerda", "L": "esquerda", "r": "direita", "R": "direita"}  # "t" (retorno) fica de fora
+
+
+class RouteSampler:
+
+    def __init__(self, net_file=NET_FILE, turn_ratios=(0.6, 0.2, 0.2), vclass="passenger"):
+        # turn_ratios: (frente, esquerda, direita); normalizado entre as direções disponíveis em cada aresta
+        import sumolib
+        net = sumolib.net.readNet(net_file)
+        ratios = dict(zip(("frente", "esquerda", "direita"), turn_ratios))
+        edges = [e for e in net.getEdges() if e.allows(vclass) and e.getFunction() != "internal"]
+        # Borda: nós com menos vizinhos que o mais conectado da rede; entra-se pela borda e sai-se por ela
+        degree = {n.getID(): len({e.getToNode().getID() for e in n.getOutgoing()} |
+                                 {e.getFromNode().getID() for e in n.getIncoming()}) for n in net.getNodes()}
+        border = {n for n, d in degree.items() if d < max(degree.values())}
+        self.ids = [e.getID() for e in edges]
+        index = {e.getID(): i for i, e in enumerate(edges)}
+        self.exits = np.array([e.getToNode().getID() in border for e in edges])
+        self.origins = np.array([index[e.getID()] for e in edges
+                                 if e.getFromNode().getID() in border and e.getToNode().getID() not in border])
+        if not self.origins.size:  # rede sem borda distinguível: qualquer aresta serve de entrada
+            self.origins = np.arange(len(edges))
+        # Para cada aresta: arestas seguintes e probabilidades acumuladas segundo as proporções de conversão
+        self.next_edges, self.cumulative = [], []
+        for e in edges:
+            options = {}
+            for to_edge, connections in e.getOutgoing().items():
+                directions = {DIRECTIONS.get(c.getDirection()) for c in connections} - {None}
+                if to_edge.getID() in index and directions:
+                    options[index[to_edge.getID()]] = max(ratios[d] for d in directions)
+            weights = np.array(list(options.values()), dtype=np.float64)
+            self.next_edges.append(np.array(list(options), dtype=np.int64))
+            self.cumulative.append(np.cumsum(weights) / weights.sum() if weights.sum() > 0 else weights)
+
+    def sample(self, rng):
+        edge = int(self.origins[rng.integers(len(self.origins))])
+        route = [edge]
+        uniforms = rng.random(MAX_ROUTE_EDGES)
+        for u in uniforms[1:]:
+            if self.exits[edge] or not self.next_edges[edge].size:
+                break
+            edge = int(self.next_edges[edge][min(np.searchsorted(self.cumulative[edge], u, side="right"),
+                                                 self.next_edges[edge].size - 1)])
+            route.append(edge)
+        return " ".join(self.ids[i] for i in route)
+
+
+def profile_multipliers(profile):
+    # Nome de PROFILES ou lista de multiplicadores separados por vírgula
+    if profile in PROFILES:
+        return PROFILES[profile]
+    return [float(v) for v in profile.split(",")]
+
+
+def generate(output, rate=3600.0, begin=0, end=3600, profile="constante", turn_ratios=(0.6, 0.2, 0.2),
+             emergency=0.01, authority=0.01, seed=0, net_file=NET_FILE, vehicles=None):
+    # rate: veículos/h antes do perfil; vehicles (opcional) ajusta a taxa para esse total esperado
+    rng = np.random.default_rng(seed)
+    sampler = RouteSampler(net_file, turn_ratios)
+    multipliers = np.array(profile_multipliers(profile), dtype=np.float64)
+    duration = end - begin
+    if vehicles is not None:
+        rate = vehicles / (multipliers.mean() * duration / 3600)
+    counts = dict.fromkeys(VTYPES, 0)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output + ".tmp", "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n\n')
+        f.write(f"<!-- demanda.py: taxa={rate:.1f} veic/h perfil={profile} conversoes={','.join(map(str, turn_ratios))} "
+                f"emergencia={emergency} autoridade={authority} seed={seed} -->\n\n")
+        f.write('<routes xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                'xsi:noNamespaceSchemaLocation="http://sumo.dlr.de/xsd/routes_file.xsd">\n')
+        for vtype, attributes in VTYPES.items():
+            f.write(f'    <vType id="{vtype}" {attributes}/>\n')
+        n = 0
+        for start in range(begin, end, CHUNK_SECONDS):
+            dt = min(CHUNK_SECONDS, end - start)
+            # taxa constante dentro do bloco: o trecho do perfil em que o bloco começa
+            multiplier = multipliers[min(int((start - begin) / duration * len(multipliers)), len(multipliers) - 1)]
+            departs = np.sort(rng.uniform(start, start + dt, rng.poisson(rate * multiplier * dt / 3600)))
+            kinds = rng.random(departs.size)
+            lines = []
+            for depart, kind in zip(departs, kinds):
+                vtype = "emergencia" if kind < emergency else "autoridade" if kind < emergency + authority else "carro"
+                counts[vtype] += 1
+                lines.append(f'    <vehicle id="v{n}" type="{vtype}" depart="{depart:.2f}" departLane="best" '
+                             f'departSpeed="max"><route edges="{sampler.sample(rng)}"/></vehicle>\n')
+                n += 1
+            f.write("".join(lines))
+        f.write("</routes>\n")
+    os.replace(output + ".tmp", output)
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Gera demanda sintética reprodutível sobre a rede (arquivo .rou.xml)")
+    parser.add_argument("--saida", default="demanda.rou.xml")
+    parser.add_argument("--net", default=NET_FILE)
+    parser.add_argument("--taxa", type=float, default=3600.0, help="chegadas por hora (antes do perfil)")
+    parser.add_argument("--veiculos", type=int, default=None, help="total esperado de veículos (ajusta a taxa)")
+    parser.add_argument("--inicio", type=int, default=0)
+    parser.add_argument("--fim", type=int, default=3600)
+    parser.add_argument("--perfil", default="constante", help=f"{', '.join(PROFILES)} ou multiplicadores separados por vírgula")
+    parser.add_argument("--conversoes", default="0.6,0.2,0.2", help="proporções frente,esquerda,direita em cada cruzamento")
+    parser.add_argument("--emergencia", type=float, default=0.01, help="fração de veículos de emergência")
+    parser.add_argument("--autoridade", type=float, default=0.01, help="fração de veículos de autoridade")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    t0 = time.perf_counter()
+    counts = generate(args.saida, args.taxa, args.inicio, args.fim, args.perfil,
+                      tuple(float(v) for v in args.conversoes.split(",")), args.emergencia, args.autoridade,
+                      args.seed, args.net, args.veiculos)
+    print(f"🚗 {sum(counts.values())} veículos ({', '.join(f'{k}: {v}' for k, v in counts.items())}) "
+          f"em {time.perf_counter() - t0:.1f}s")
+    print(f"📁 Rotas salvas em '{args.saida}' ({os.path.getsize(args.saida) / 1e6:.1f} MB)")
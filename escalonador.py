@@ -0,0 +1,84 @@
+import heapq
+from sumo_backend import traci
+
+# Escalonador de decisões por eventos para vários semáforos.
+# Cada semáforo tem um temporizador em uma fila de prioridade (heap); em vez de avançar o SUMO
+# passo a passo em Python, a simulação salta direto para o próximo evento com um único
+# traci.simulationStep(tempo_alvo). Os semáforos que vencem no mesmo instante decidem em lote,
+# todos sobre o mesmo estado da simulação. Treinamento e simulação usam o mesmo escalonador,
+# então têm a mesma temporização de decisões.
+
+DECISION = 0  # o verde do semáforo terminou: ele deve escolher a próxima direção
+GREEN = 1     # o amarelo terminou: acende o verde já escolhido
+
+
+class DecisionScheduler:
+
+    def __init__(self, tl_ids, signals, green_duration, yellow_duration):
+        # signals: {semáforo: {"green_<eixo>": estado, "yellow_<eixo>": estado}} (ver topologia.py)
+        self.tl_ids = list(tl_ids)
+        self.signals = signals
+        self.green_duration = green_duration
+        self.yellow_duration = yellow_duration
+        self.now = 0.0
+        self.current = {}
+        self._events = []
+        self._order = 0
+
+    def reset(self, tl_ids=None, initial=None, now=None):
+        # Deve ser chamado no início de cada episódio (após start/load): todos os semáforos
+        # (ou só tl_ids) decidem no instante atual. initial = direção já acesa em cada semáforo,
+        # para que a primeira troca passe pelo amarelo.
+        self.now = traci.simulation.getTime() if now is None else now
+        self.current = {tl: (initial or {}).get(tl) for tl in self.tl_ids}
+        self._events = []
+        self._order = 0
+        for tl in tl_ids or self.tl_ids:
+            self._push(self.now, DECISION, tl)
+
+    def _push(self, time, kind, tl, direction=None):
+        # _order desempata eventos no mesmo instante mantendo a ordem de inserção
+        heapq.heappush(self._events, (time, self._order, kind, tl, direction))
+        self._order += 1
+
+    def set_phase(self, tl, direction):
+        # Aplica a decisão do semáforo no instante atual e agenda a próxima.
+        # Devolve o tempo da próxima decisão desse semáforo.
+        curr = self.current[tl]
+        self.current[tl] = direction
+        if curr and curr != direction:
+            traci.trafficlight.setRedYellowGreenState(tl, self.signals[tl][f"yellow_{curr}"])
+            self._push(self.now + self.yellow_duration, GREEN, tl, direction)
+            return self.now + self.yellow_duration + self.green_duration
+        traci.trafficlight.setRedYellowGreenState(tl, self.signals[tl][f"green_{direction}"])
+        self._push(self.now + self.green_duration, DECISION, tl)
+        return self.now + self.green_duration
+
+    def pop_due(self):
+        # Processa os eventos vencidos até agora: acende os verdes pendentes e devolve,
+        # na ordem em que foram agendados, os semáforos que precisam decidir
+        due = []
+        while self._events and self._events[0][0] <= self.now:
+            _, _, kind, tl, direction = heapq.heappop(self._events)
+            if kind == GREEN:
+                traci.trafficlight.setRedYellowGreenState(tl, self.signals[tl][f"green_{direction}"])
+                self._push(self.now + self.green_duration, DECISION, tl)
+            else:
+                due.append(tl)
+        return due
+
+    def next_time(self):
+        return self._events[0][0] if self._events else None
+
+    def advance(self, limit=None):
+        # Salta a simulação até o próximo evento com uma única chamada; devolve os passos avançados.
+        # limit: avança no máximo tantos segundos (o modo em tempo real anda um passo por vez)
+        target = self.next_time()
+        if target is None or target <= self.now:
+            return 0
+        if limit is not None:
+            target = min(target, self.now + limit)
+        traci.simulationStep(target)
+        steps = int(round(target - self.now))
+        self.now = target
+        return steps
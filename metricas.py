@@ -0,0 +1,193 @@
+import csv
+import os
+import numpy as np
+import pandas as pd
+from sumo_backend import traci
+
+try:
+    import pyarrow as pa
+except ImportError:  # sem pyarrow o sink grava CSV em blocos
+    pa = None
+
+# Uma linha "larga" por amostra com todas as métricas coletadas pelos runners.
+# Colunas inteiras são contagens; as demais são float.
+COLUMNS = [
+    ("tempo", "int"),
+    ("carros_parados", "int"),
+    ("total_paradas", "int"),
+    ("tempo_espera", "float"),
+    ("velocidade_media", "float"),
+    ("densidade_media", "float"),
+    ("num_emergency", "int"),
+    ("total_espera_emergency", "float"),
+    ("media_espera_emergency", "float"),
+    ("num_authority", "int"),
+    ("total_espera_authority", "float"),
+    ("media_espera_authority", "float"),
+    ("carros_parados_prioritarios", "int"),
+    ("total_paradas_prioritarios", "int"),
+    ("tempo_espera_prioritarios", "float"),
+    ("velocidade_media_prioritarios", "float"),
+]
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+
+# CSVs legados (um por métrica) lidos por comparar_resultados.py: prefixo do arquivo -> colunas
+LEGACY_FILES = [
+    ("resultado", ["carros_parados"]),
+    ("paradas", ["total_paradas"]),
+    ("espera", ["tempo_espera"]),
+    ("velocidade", ["velocidade_media"]),
+    ("densidade", ["densidade_media"]),
+    ("emergency", ["num_emergency", "total_espera_emergency", "media_espera_emergency"]),
+    ("authority", ["num_authority", "total_espera_authority", "media_espera_authority"]),
+    ("carros_parados_prioritarios", ["carros_parados_prioritarios"]),
+    ("paradas_prioritarios", ["total_paradas_prioritarios"]),
+    ("espera_prioritarios", ["tempo_espera_prioritarios"]),
+    ("velocidade_prioritarios", ["velocidade_media_prioritarios"]),
+]
+
+FLUSH_EVERY = 256  # linhas por bloco gravado em disco
+
+
+# Grava as amostras em disco conforme chegam, em blocos de FLUSH_EVERY linhas.
+# Com pyarrow usa o formato Arrow IPC em stream (.arrow): cada bloco é um record batch
+# completo, então um arquivo interrompido no meio continua legível até o último bloco.
+# Sem pyarrow grava CSV, com o cabeçalho uma única vez e flush a cada bloco.
+class MetricsSink:
+
+    def __init__(self, base_path, flush_every=FLUSH_EVERY, fmt=None):
+        self.format = fmt or ("arrow" if pa is not None else "csv")
+        self.path = f"{base_path}.{self.format}"
+        self.flush_every = flush_every
+        self._rows = []
+        if self.format == "arrow":
+            self._file = open(self.path, "wb")
+            fields = [(name, pa.int64() if kind == "int" else pa.float64()) for name, kind in COLUMNS]
+            self._schema = pa.schema(fields)
+            self._writer = pa.ipc.new_stream(self._file, self._schema)
+        else:
+            self._file = open(self.path, "w", newline="")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(COLUMN_NAMES)
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            if self.format == "arrow":
+                columns = {name: [row[name] for row in self._rows] for name in COLUMN_NAMES}
+                self._writer.write_batch(pa.record_batch(columns, schema=self._schema))
+            else:
+                self._writer.writerows([row[name] for name in COLUMN_NAMES] for row in self._rows)
+            self._rows = []
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        if self.format == "arrow":
+            self._writer.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Calcula todas as métricas de uma amostra a partir do TraciSnapshot, com reduções mascaradas
+# sobre os arrays por veículo. Os comprimentos das faixas controladas são lidos uma única vez
+# por rede; as contagens por faixa mantêm a multiplicidade de getControlledLanes (uma vez por link).
+class MetricsCollector:
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self._lanes = None
+
+    def _lane_lengths(self, snap):
+        if self._lanes != snap.lanes:
+            self._lanes = list(snap.lanes)
+            self._lengths = np.array([traci.lane.getLength(l) for l in self._lanes], dtype=np.float64)
+            self._weight = snap.controlled_weight[:-1]
+            self._density_weight = np.where(self._lengths > 0, self._weight, 0)
+        return self._lengths
+
+    def collect(self, tempo):
+        snap = self.snapshot.refresh()
+        lengths = self._lane_lengths(snap)
+
+        # Densidade média (veículos/km/faixa) sobre as faixas controladas com comprimento > 0
+        n_density = self._density_weight.sum()
+        if n_density:
+            densities = np.divide(snap.lane_vehicles, lengths, out=np.zeros_like(lengths), where=lengths > 0) * 1000
+            densidade_media = float((densities * self._density_weight).sum() / n_density)
+        else:
+            densidade_media = 0
+
+        emergency = snap.priority == 2
+        authority = snap.priority == 1
+        prioritarios = emergency | authority
+        num_emergency = int(emergency.sum())
+        num_authority = int(authority.sum())
+        num_prioritarios = num_emergency + num_authority
+        total_espera_emergency = float(snap.waiting[emergency].sum())
+        total_espera_authority = float(snap.waiting[authority].sum())
+        parados_prioritarios = int(np.count_nonzero(snap.stopped & prioritarios))
+        velocidades_prioritarios = snap.speed[prioritarios & (snap.speed > 0)]
+
+        return {
+            'tempo': tempo,
+            'carros_parados': int((self._weight * snap.lane_halting).sum()),
+            'total_paradas': int(np.count_nonzero(snap.stopped)),
+            'tempo_espera': float(snap.waiting.sum()),
+            'velocidade_media': snap.mean_moving_speed(),
+            'densidade_media': densidade_media,
+            'num_emergency': num_emergency,
+            'total_espera_emergency': total_espera_emergency,
+            'media_espera_emergency': total_espera_emergency / num_emergency if num_emergency else 0,
+            'num_authority': num_authority,
+            'total_espera_authority': total_espera_authority,
+            'media_espera_authority': total_espera_authority / num_authority if num_authority else 0,
+            'carros_parados_prioritarios': parados_prioritarios,
+            'total_paradas_prioritarios': parados_prioritarios,
+            'tempo_espera_prioritarios': float(snap.waiting[prioritarios].sum()) / num_prioritarios if num_prioritarios else 0,
+            'velocidade_media_prioritarios': float(velocidades_prioritarios.mean()) if velocidades_prioritarios.size else 0,
+        }
+
+
+def read_metrics(path):
+    if path.endswith(".arrow"):
+        batches = []
+        with pa.OSFile(path, "rb") as source:
+            reader = pa.ipc.open_stream(source)
+            # Lê bloco a bloco para aproveitar arquivos truncados por uma execução interrompida
+            while True:
+                try:
+                    batches.append(reader.read_next_batch())
+                except (StopIteration, pa.ArrowInvalid, OSError):
+                    break
+        return pa.Table.from_batches(batches, schema=reader.schema).to_pandas()
+    return pd.read_csv(path)
+
+
+def export_legacy_csvs(path, output_dir, suffix):
+    # Reconstrói os onze CSVs por métrica (p.ex. espera_qlearning.csv) a partir do arquivo largo
+    df = read_metrics(path)
+    for prefix, columns in LEGACY_FILES:
+        df[["tempo"] + columns].to_csv(os.path.join(output_dir, f"{prefix}_{suffix}.csv"), index=False)
+    return df
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Gera os CSVs legados por métrica a partir de um arquivo metricas_passo_*")
+    parser.add_argument("path", help="arquivo .arrow ou .csv gravado pelo MetricsSink")
+    parser.add_argument("suffix", help="sufixo dos CSVs, p.ex. qlearning ou tempo_fixo")
+    parser.add_argument("--output-dir", default=None)
+    args = parser.parse_args()
+    export_legacy_csvs(args.path, args.output_dir or os.path.dirname(args.path) or ".", args.suffix)
@@ -0,0 +1,207 @@
+import atexit
+import csv
+import json
+import os
+import time
+from collections import Counter
+import numpy as np
+import sumo_backend
+
+# Perfilador dos laços de controle, ligado pela opção --profile dos scripts.
+# Enquanto ativo:
+#   - cada chamada TraCI feita pelo proxy de sumo_backend é contada e cronometrada por função da API;
+#   - as funções de cada etapa (estado, ação, recompensa, métricas...) são substituídas por
+#     versões cronometradas, como em benchmark.timed_functions; a etapa "passo" é o próprio simulationStep;
+#   - a latência de cada decisão (do fim do último passo/decisão até a fase aplicada) vai para um histograma.
+# Ao fim de cada episódio os números são acumulados em <saida>.json (completo) e <saida>.csv (uma linha
+# por episódio); um resumo por tipo de episódio (p.ex. os de avaliação do treinamento ficam à parte dos de
+# treino) é impresso na saída do programa.
+
+# Limites superiores (µs) das faixas do histograma de latência por decisão; a última faixa é aberta
+LATENCY_BINS_US = [50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000]
+
+# Chamada TraCI que avança a simulação
+STEP_CALL = "simulationStep"
+
+_profiler = None
+
+
+class Profiler:
+
+    def __init__(self, path):
+        self.path = path
+        self.episodes = []
+        self._wrappers = {}
+        self._start_episode()
+
+    def _start_episode(self):
+        self.calls = Counter()
+        self.call_seconds = Counter()
+        self.stage_seconds = Counter()
+        self.stage_calls = Counter()
+        self.latencies = []
+        self._t0 = time.perf_counter()
+        self._decision_start = self._t0
+
+    # ---------- TraCI ----------
+
+    def traci_hook(self, name, attr):
+        # Chamado pelo proxy de sumo_backend a cada acesso traci.<name>
+        key = (name, id(attr))
+        wrapper = self._wrappers.get(key)
+        if wrapper is None:
+            if callable(attr) and not isinstance(attr, type):
+                wrapper = self._timed_call(name, attr)
+            elif name[:1].islower() and hasattr(attr, "__dict__"):
+                # domínio da API: objeto no traci por socket, classe com métodos estáticos no libsumo
+                wrapper = _Domain(self, name, attr)
+            else:
+                wrapper = attr  # exceções e demais classes passam direto
+            self._wrappers[key] = wrapper
+        return wrapper
+
+    def _timed_call(self, key, func):
+        step = key == STEP_CALL
+
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                t1 = time.perf_counter()
+                self.call_seconds[key] += t1 - t0
+                self.calls[key] += 1
+                if step:
+                    # o avanço da simulação é a etapa "passo" em todos os laços e encerra o intervalo entre decisões
+                    self.stage_seconds["passo"] += t1 - t0
+                    self.stage_calls["passo"] += 1
+                    self._decision_start = t1
+        return timed
+
+    # ---------- etapas ----------
+
+    def instrument(self, owner, attribute, stage, decision_end=False, decision_start=False):
+        # decision_end: a função fecha uma decisão (p.ex. apply_phase): registra a latência desde
+        # o fim do último passo ou da decisão anterior;
+        # decision_start: ao retornar, recomeça a contagem (p.ex. início do SUMO, que não é latência de decisão)
+        func = getattr(owner, attribute)
+
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                t1 = time.perf_counter()
+                self.stage_seconds[stage] += t1 - t0
+                self.stage_calls[stage] += 1
+                if decision_end:
+                    self.latencies.append(t1 - self._decision_start)
+                if decision_end or decision_start:
+                    self._decision_start = t1
+        setattr(owner, attribute, timed)
+
+    # ---------- episódios ----------
+
+    def end_episode(self, label, kind="episodio"):
+        seconds = time.perf_counter() - self._t0
+        lat_us = np.array(self.latencies) * 1e6
+        histogram = np.bincount(np.searchsorted(LATENCY_BINS_US, lat_us), minlength=len(LATENCY_BINS_US) + 1)
+        self.episodes.append({
+            "episodio": label,
+            "tipo": kind,
+            "segundos": seconds,
+            "etapas": {s: {"segundos": self.stage_seconds[s], "chamadas": self.stage_calls[s]} for s in self.stage_seconds},
+            "outros_segundos": seconds - sum(self.stage_seconds.values()),
+            "traci": {k: {"chamadas": self.calls[k], "segundos": self.call_seconds[k]} for k, _ in self.calls.most_common()},
+            "decisoes": len(self.latencies),
+            "latencia_p50_us": float(np.percentile(lat_us, 50)) if lat_us.size else 0.0,
+            "latencia_p99_us": float(np.percentile(lat_us, 99)) if lat_us.size else 0.0,
+            "histograma_latencia": {"limites_us": LATENCY_BINS_US, "contagens": histogram.tolist()},
+        })
+        self.save()
+        self._start_episode()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.json", "w") as f:
+            json.dump(self.episodes, f, indent=1)
+        stages = sorted({s for e in self.episodes for s in e["etapas"]})
+        with open(f"{self.path}.csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["episodio", "tipo", "segundos", *(f"{s}_segundos" for s in stages), "outros_segundos",
+                             "chamadas_traci", "segundos_traci", "decisoes", "latencia_p50_us", "latencia_p99_us"])
+            for e in self.episodes:
+                writer.writerow([e["episodio"], e["tipo"], e["segundos"],
+                                 *(e["etapas"].get(s, {}).get("segundos", 0.0) for s in stages), e["outros_segundos"],
+                                 sum(c["chamadas"] for c in e["traci"].values()),
+                                 sum(c["segundos"] for c in e["traci"].values()),
+                                 e["decisoes"], e["latencia_p50_us"], e["latencia_p99_us"]])
+
+    def print_summary(self):
+        kinds = list(dict.fromkeys(e["tipo"] for e in self.episodes))
+        for kind in kinds:
+            self._print_kind([e for e in self.episodes if e["tipo"] == kind], f" ({kind})" if len(kinds) > 1 else "")
+        if kinds:
+            print(f"📁 Perfil salvo em '{self.path}.json' e '{self.path}.csv'")
+
+    def _print_kind(self, episodes, title):
+        total = sum(e["segundos"] for e in episodes)
+        stages, calls = Counter(), Counter()
+        call_seconds = Counter()
+        for e in episodes:
+            for s, v in e["etapas"].items():
+                stages[s] += v["segundos"]
+            for k, v in e["traci"].items():
+                calls[k] += v["chamadas"]
+                call_seconds[k] += v["segundos"]
+        decisions = sum(e["decisoes"] for e in episodes)
+        print(f"\n⏱️ Perfil{title}: {len(episodes)} episódio(s), {total:.2f}s, {decisions} decisões")
+        for s, v in stages.most_common():
+            print(f"   {s:<14}{v:>9.3f}s {100 * v / total:>6.1f}%")
+        other = total - sum(stages.values())
+        print(f"   {'outros':<14}{other:>9.3f}s {100 * other / total:>6.1f}%")
+        print(f"   TraCI: {sum(calls.values())} chamadas, {sum(call_seconds.values()):.3f}s; mais custosas:")
+        for k, v in call_seconds.most_common(5):
+            print(f"      {k:<36}{calls[k]:>9} chamadas {1e6 * v / calls[k]:>9.1f} µs/chamada")
+
+
+# Domínio da API (traci.vehicle, traci.lane...): cronometra cada função acessada por ele
+class _Domain:
+
+    def __init__(self, profiler, name, domain):
+        self._profiler = profiler
+        self._name = name
+        self._domain = domain
+        self._funcs = {}
+
+    def __getattr__(self, attr):
+        func = self._funcs.get(attr)
+        if func is None:
+            value = getattr(self._domain, attr)
+            if not callable(value) or isinstance(value, type):
+                return value
+            func = self._funcs[attr] = self._profiler._timed_call(f"{self._name}.{attr}", value)
+        return func
+
+
+# ---------- interface usada pelos scripts (tudo vira no-op sem --profile) ----------
+
+def enable(path, stages=()):
+    # stages: (objeto, atributo, etapa[, opções de Profiler.instrument]) das funções a cronometrar
+    global _profiler
+    _profiler = Profiler(path)
+    sumo_backend.set_call_hook(_profiler.traci_hook)
+    for owner, attribute, stage, *options in stages:
+        _profiler.instrument(owner, attribute, stage, **(options[0] if options else {}))
+    atexit.register(_profiler.print_summary)
+    return _profiler
+
+
+def end_episode(label, kind="episodio"):
+    if _profiler is not None:
+        _profiler.end_episode(label, kind)
+
+
+def add_profile_argument(parser, default):
+    parser.add_argument("--profile", nargs="?", const=default, default=None, metavar="SAIDA",
+                        help=f"mede etapas, chamadas TraCI e latência por decisão (grava SAIDA.json/.csv; padrão: {default})")
@@ -0,0 +1,179 @@
+import os
+import pickle
+import struct
+import zipfile
+import numpy as np
+
+ACTIONS = ("horizontal", "vertical")
+# Cardinalidade de cada componente do estado devolvido por get_state:
+# (parados horizontal, parados vertical, velocidade, parados globais, prioridade global)
+STATE_RADICES = (6, 6, 6, 11, 2)
+
+
+# Q-table densa em um array [n_tl, n_estados, n_acoes]. O estado discreto é
+# convertido em um inteiro por numeração de base mista (último componente varia mais rápido).
+class QTable:
+
+    def __init__(self, tl_ids, radices=STATE_RADICES, actions=ACTIONS, values=None):
+        self.tl_ids = list(tl_ids)
+        self.tl_index = {tl: i for i, tl in enumerate(self.tl_ids)}
+        self.radices = tuple(int(r) for r in radices)
+        self.actions = tuple(actions)
+        self.action_index = {a: i for i, a in enumerate(self.actions)}
+        strides = [1]
+        for r in reversed(self.radices[1:]):
+            strides.insert(0, strides[0] * r)
+        self.strides = tuple(strides)
+        self._strides_array = np.array(strides, dtype=np.int64)
+        self.n_states = int(np.prod(self.radices))
+        shape = (len(self.tl_ids), self.n_states, len(self.actions))
+        if values is None:
+            values = np.zeros(shape, dtype=np.float64)
+        elif values.shape != shape:
+            raise ValueError(f"Formato da Q-table {values.shape} não corresponde a {shape}")
+        self.values = values
+
+    # ---------- codificação de estados ----------
+
+    def encode(self, state):
+        code = 0
+        for s, w in zip(state, self.strides):
+            code += s * w
+        return code
+
+    def encode_many(self, states):
+        return np.asarray(states, dtype=np.int64) @ self._strides_array
+
+    def decode(self, code):
+        state = []
+        for w, r in zip(self.strides, self.radices):
+            state.append((code // w) % r)
+        return tuple(state)
+
+    # ---------- consulta e atualização ----------
+
+    def q_values(self, tl, state):
+        return self.values[self.tl_index[tl], self.encode(state)]
+
+    def best_action(self, tl, state):
+        # Em empate prevalece a primeira ação, como max() sobre o dict antigo
+        return self.actions[int(self.q_values(tl, state).argmax())]
+
+    def greedy(self, tl_idx, codes):
+        return self.values[tl_idx, codes].argmax(axis=-1)
+
+    def update(self, tl, state, action, reward, next_state, alpha, gamma):
+        t = self.tl_index[tl]
+        row = self.values[t, self.encode(state)]
+        a = self.action_index[action]
+        target = reward + gamma * self.values[t, self.encode(next_state)].max()
+        row[a] += alpha * (target - row[a])
+
+    def update_many(self, tl_idx, codes, actions, rewards, next_codes, alpha, gamma):
+        # Atualização TD em lote; transições repetidas na mesma célula entram pela média dos seus erros
+        # (somá-los, todos calculados do mesmo valor antigo, passa do alvo e diverge com muitas repetições)
+        target = rewards + gamma * self.values[tl_idx, next_codes].max(axis=-1)
+        error = target - self.values[tl_idx, codes, actions]
+        cells, inverse, counts = np.unique(np.ravel_multi_index((tl_idx, codes, actions), self.values.shape),
+                                           return_inverse=True, return_counts=True)
+        self.values.reshape(-1)[cells] += alpha * np.bincount(inverse, weights=error) / counts
+
+    def copy(self):
+        return QTable(self.tl_ids, self.radices, self.actions, np.array(self.values))
+
+    def __len__(self):
+        # número de estados com algum valor não nulo (equivalente ao tamanho do dict antigo)
+        return int(np.count_nonzero(self.values.any(axis=-1)))
+
+    # ---------- persistência ----------
+
+    def save(self, path, compress=False):
+        # Sem compressão o membro "values" pode ser mapeado em memória por load(mmap_mode=...);
+        # compress=True gera um arquivo menor para tabelas esparsas, mas que precisa ser lido inteiro
+        # Grava em um temporário e renomeia: quem relê o arquivo (servidor_politica.py) nunca vê um zip pela metade
+        savez = np.savez_compressed if compress else np.savez
+        with open(path + ".tmp", "wb") as f:
+            savez(f, values=self.values, tl_ids=np.array(self.tl_ids),
+                  radices=np.array(self.radices), actions=np.array(self.actions))
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        with np.load(path, allow_pickle=False) as data:
+            tl_ids = [str(tl) for tl in data["tl_ids"]]
+            radices = tuple(int(r) for r in data["radices"])
+            actions = tuple(str(a) for a in data["actions"])
+            values = None if mmap_mode else data["values"]
+        if values is None:
+            values = _memmap_npz_member(path, "values", mmap_mode)
+        return cls(tl_ids, radices, actions, values)
+
+    @classmethod
+    def from_dict(cls, table, tl_ids, radices=STATE_RADICES, actions=ACTIONS):
+        # Importa o formato antigo {(tl, estado): {"horizontal": q, "vertical": q}}
+        q = cls(tl_ids, radices, actions)
+        for (tl, state), q_values in table.items():
+            if tl not in q.tl_index:
+                continue
+            row = q.values[q.tl_index[tl], q.encode(state)]
+            for action, value in q_values.items():
+                row[q.action_index[action]] = value
+        return q
+
+    @classmethod
+    def from_pickle(cls, path, tl_ids, radices=STATE_RADICES, actions=ACTIONS):
+        with open(path, "rb") as f:
+            return cls.from_dict(pickle.load(f), tl_ids, radices, actions)
+
+    def to_dict(self):
+        table = {}
+        for t, s in zip(*np.nonzero(self.values.any(axis=-1))):
+            key = (self.tl_ids[t], tuple(int(x) for x in self.decode(int(s))))
+            table[key] = {a: float(v) for a, v in zip(self.actions, self.values[t, s])}
+        return table
+
+    def to_pickle(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self.to_dict(), f)
+
+
+def load_q_table(tl_ids, npz_path="q_table.npz", pkl_path="q_table.pkl"):
+    # Prefere o formato .npz; se só existir o pickle antigo, importa-o
+    try:
+        return QTable.load(npz_path)
+    except FileNotFoundError:
+        return QTable.from_pickle(pkl_path, tl_ids)
+
+
+def _memmap_npz_member(path, name, mode):
+    # Um .npz sem compressão guarda cada array como um .npy contíguo dentro do zip:
+    # basta localizar o início dos dados e abrir um np.memmap nesse deslocamento.
+    with zipfile.ZipFile(path) as zf:
+        info = zf.getinfo(name + ".npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError(f"{path}: membro {name!r} comprimido não pode ser mapeado em memória")
+    with open(path, "rb") as f:
+        f.seek(info.header_offset)
+        local_header = f.read(30)
+        name_len, extra_len = struct.unpack("<HH", local_header[26:30])
+        f.seek(info.header_offset + 30 + name_len + extra_len)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    return np.memmap(path, dtype=dtype, mode=mode, offset=offset, shape=shape,
+                     order="F" if fortran_order else "C")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Converte q_table.pkl (formato antigo) para q_table.npz")
+    parser.add_argument("pkl", nargs="?", default="q_table.pkl")
+    parser.add_argument("npz", nargs="?", default="q_table.npz")
+    parser.add_argument("--tl", nargs="+", default=["B2", "C2", "D2"], help="IDs dos semáforos, na ordem da tabela")
+    args = parser.parse_args()
+    q = QTable.from_pickle(args.pkl, args.tl)
+    q.save(args.npz)
+    print(f"✅ {args.pkl} -> {args.npz} ({len(q)} estados com valor)")
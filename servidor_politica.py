@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+import asyncio
+import json
+import os
+import socket
+import time
+from collections import deque
+import numpy as np
+from qtable import QTable
+
+# Servidor de inferência da política treinada (ação gulosa da Q-table), fora dos scripts de simulação.
+# Protocolo: TCP em localhost, uma mensagem JSON por linha em cada sentido.
+#   {"id": 1, "semaforos": ["B2", "C2"], "estados": [[0, 1, 2, 0, 0], [1, 0, 3, 1, 0]]}
+#     -> {"id": 1, "acoes": ["vertical", "horizontal"], "versao": 1}
+#   {"id": 2, "comando": "estatisticas"} -> latências (µs) e decisões atendidas
+#   {"id": 3, "comando": "recarregar"}   -> recarrega a Q-table agora
+# Um pedido pode trazer estados de quantos cruzamentos quiser: a consulta do lote inteiro é
+# uma única indexação NumPy. A Q-table é relida quando o arquivo muda, em uma thread, e trocada
+# entre dois pedidos: nenhum pedido é perdido nem respondido com uma tabela pela metade.
+
+HOST = "127.0.0.1"
+PORT = 8765
+Q_TABLE_FILE = "q_table.npz"
+RELOAD_INTERVAL = 1.0  # segundos entre verificações do arquivo da Q-table
+HISTORY = 10000        # pedidos guardados para as estatísticas de latência
+
+
+def load_policy(path, tl_ids=None):
+    # .npz no formato atual; .pkl no formato antigo (precisa dos IDs dos semáforos na ordem da tabela)
+    if path.endswith(".pkl"):
+        if tl_ids is None:
+            from topologia import load_topology
+            tl_ids = load_topology().tl_ids
+        return QTable.from_pickle(path, tl_ids)
+    return QTable.load(path)
+
+
+class PolicyServer:
+
+    def __init__(self, q_table_path=Q_TABLE_FILE, tl_ids=None, reload_interval=RELOAD_INTERVAL, history=HISTORY):
+        self.path = q_table_path
+        self.tl_ids = tl_ids
+        self.reload_interval = reload_interval
+        self.version = 0
+        self.requests = 0
+        self.decisions = 0
+        self.latencies = deque(maxlen=history)  # segundos por pedido
+        self.decisions_per_request = deque(maxlen=history)
+        self._mtime = None
+        self._set_table(load_policy(self.path, self.tl_ids), os.path.getmtime(self.path))
+
+    def _set_table(self, q, mtime):
+        self.q = q
+        self._radices = np.array(q.radices, dtype=np.int64)
+        self._mtime = mtime
+        self.version += 1
+
+    # ---------- consulta ----------
+
+    def decide(self, tls, states):
+        q = self.q  # a tabela pode ser trocada entre pedidos, nunca no meio de um
+        if not len(tls):
+            return []
+        states = np.asarray(states, dtype=np.int64).reshape(len(tls), -1)
+        if states.shape[1] != len(self._radices) or (states < 0).any() or (states >= self._radices).any():
+            raise ValueError(f"estados devem ter {len(self._radices)} componentes dentro de {tuple(q.radices)}")
+        try:
+            tl_idx = np.fromiter((q.tl_index[tl] for tl in tls), dtype=np.int64, count=len(tls))
+        except KeyError as e:
+            raise ValueError(f"semáforo desconhecido: {e.args[0]}") from None
+        return [q.actions[a] for a in q.greedy(tl_idx, q.encode_many(states))]
+
+    def stats(self):
+        lat = np.array(self.latencies) * 1e6
+        per_decision = lat / np.maximum(1, np.array(self.decisions_per_request)) if lat.size else lat
+        return {
+            "versao": self.version,
+            "pedidos": self.requests,
+            "decisoes": self.decisions,
+            "p50_us": float(np.percentile(lat, 50)) if lat.size else 0.0,
+            "p99_us": float(np.percentile(lat, 99)) if lat.size else 0.0,
+            "us_por_decisao": float(per_decision.mean()) if lat.size else 0.0,
+        }
+
+    async def handle_message(self, message):
+        t0 = time.perf_counter()
+        reply = {}
+        try:
+            if not isinstance(message, dict):
+                raise ValueError("o pedido deve ser um objeto JSON")
+            reply["id"] = message.get("id")
+            command = message.get("comando")
+            if command == "estatisticas":
+                reply.update(self.stats())
+            elif command == "recarregar":
+                await self.reload()
+                reply["versao"] = self.version
+            elif command is None:
+                tls = message["semaforos"]
+                reply["acoes"] = self.decide(tls, message["estados"])
+                reply["versao"] = self.version
+                self.requests += 1
+                self.decisions += len(tls)
+                self.latencies.append(time.perf_counter() - t0)
+                self.decisions_per_request.append(len(tls))
+            else:
+                reply["erro"] = f"comando desconhecido: {command}"
+        except Exception as e:
+            # pedido inválido ou arquivo ilegível (zip truncado, gravação pela metade): responde com o erro
+            reply["erro"] = str(e)
+        return reply
+
+    # ---------- recarga ----------
+
+    async def reload(self):
+        # A leitura roda em uma thread para não parar os pedidos; a tabela só é trocada se for lida inteira
+        mtime = os.path.getmtime(self.path)
+        q = await asyncio.get_running_loop().run_in_executor(None, load_policy, self.path, self.tl_ids)
+        self._set_table(q, mtime)
+        print(f"🔄 Q-table recarregada (versão {self.version})")
+
+    async def watch(self):
+        # Relê a Q-table quando o arquivo muda
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                if os.path.getmtime(self.path) != self._mtime:
+                    await self.reload()
+            except Exception as e:
+                # arquivo ausente, truncado ou ainda sendo gravado: mantém a tabela atual e tenta de novo
+                print(f"⚠️ Não foi possível recarregar '{self.path}': {type(e).__name__}: {e}")
+
+    # ---------- rede ----------
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    reply = await self.handle_message(json.loads(line))
+                except json.JSONDecodeError as e:
+                    reply = {"erro": f"JSON inválido: {e}"}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f"🚦 Política servida em {host}:{port} ({len(self.q.tl_ids)} semáforos, versão {self.version})")
+        watcher = asyncio.create_task(self.watch())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+
+# Cliente síncrono para os scripts de simulação e testes: uma conexão persistente, um pedido por vez
+class PolicyClient:
+
+    def __init__(self, host=HOST, port=PORT):
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.sock.makefile("rb")
+        self._next_id = 0
+
+    def request(self, message):
+        self._next_id += 1
+        message = dict(message, id=self._next_id)
+        self.sock.sendall(json.dumps(message).encode() + b"\n")
+        reply = json.loads(self.file.readline())
+        if "erro" in reply:
+            raise RuntimeError(reply["erro"])
+        return reply
+
+    def decide(self, tls, states):
+        return self.request({"semaforos": list(tls), "estados": [list(map(int, s)) for s in states]})["acoes"]
+
+    def stats(self):
+        return self.request({"comando": "estatisticas"})
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Servidor local de inferência da política Q-learning")
+    parser.add_argument("--q-table", default=Q_TABLE_FILE, help="q_table.npz (ou q_table.pkl no formato antigo)")
+    parser.add_argument("--tl", nargs="+", default=None, help="IDs dos semáforos na ordem da tabela (só para .pkl; padrão: os da rede)")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--reload-interval", type=float, default=RELOAD_INTERVAL)
+    args = parser.parse_args()
+    server = PolicyServer(args.q_table, args.tl, args.reload_interval)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"\n📊 {server.stats()}")
@@ -1,323 +1,218 @@
-import traci
-import pickle
 import os
-import pandas as pd
+import sumo_backend
+from sumo_backend import traci
+from snapshot_traci import TraciSnapshot
+from qtable import QTable, load_q_table
+from escalonador import DecisionScheduler
+from topologia import load_topology
+from metricas import MetricsCollector, MetricsSink, export_legacy_csvs
+from aproximador import ApproxAgent, FeatureExtractor
+from tempo_fixo import SAMPLE_INTERVAL, plan_direction
+from tempo_real import DECISION_DEADLINE, DeadlineMonitor, RealTimePacer, report
+import perfil
 
 # CONFIGURAÇÕES
 SUMO_CFG_FILE = "mapa_final_sumo.sumocfg"
-TRAFFIC_LIGHT_IDS = ["B2", "C2", "D2"]
+TOPOLOGY = load_topology()
+TRAFFIC_LIGHT_IDS = TOPOLOGY.tl_ids
+# Mesmas durações do treinamento; a simulação aceita outras (--green/--yellow ou --ajuste ajuste/melhor.json)
 GREEN_DURATION = 15
 YELLOW_DURATION = 2
-YELLOW_DURATION = 3
 
 
-SIGNALS = {
-    "green_vertical": "rrrrGGGGrrrrGGGG",
-    "yellow_vertical": "rrrryyyyrrrryyyy",
-    "green_horizontal": "GGGGrrrrGGGGrrrr",
-    "yellow_horizontal": "yyyyrrrryyyyrrrr",
+# Strings de fase por semáforo, derivadas do eixo de cada link na rede
+SIGNALS = TOPOLOGY.signals()
 
-}
+# Snapshot por passo compartilhado por estado, detecção de prioridade e métricas
+snapshot = TraciSnapshot(TOPOLOGY)
+collector = MetricsCollector(snapshot)
+# Atributos contínuos usados quando a política é um agente por aproximação (agente_linear/mlp.npz)
+features = FeatureExtractor(snapshot, TOPOLOGY)
+# Mesma temporização de decisões do treinamento: cada semáforo decide quando o seu verde termina
+scheduler = DecisionScheduler(TRAFFIC_LIGHT_IDS, SIGNALS, GREEN_DURATION, YELLOW_DURATION)
 
 def detect_priority_per_tl():
-    data = {}
-    for tl in TRAFFIC_LIGHT_IDS:
-        priority_score = {"horizontal": 0, "vertical": 0}
-
-        for lane in traci.trafficlight.getControlledLanes(tl):
-            for vid in traci.lane.getLastStepVehicleIDs(lane):
-                try:
-                    cls = traci.vehicle.getVehicleClass(vid)
-                    if cls in ("emergency", "authority"):
-                        pr = 2 if cls == "emergency" else 1
-                        ang = traci.vehicle.getAngle(vid)
-                        dirc = "vertical" if (45 < ang < 135 or 225 < ang < 315) else "horizontal"
-                        priority_score[dirc] = max(priority_score[dirc], pr)
-                except traci.TraCIException:
-                    continue
-
-        if priority_score["horizontal"] > priority_score["vertical"]:
-            data[tl] = ("horizontal", priority_score["horizontal"])
-        elif priority_score["vertical"] > priority_score["horizontal"]:
-            data[tl] = ("vertical", priority_score["vertical"])
-        else:
-            data[tl] = (None, 0)
-
-    return data
+    return snapshot.refresh().priority_per_tl()
 
 def priority_remain():
-    for vid in traci.vehicle.getIDList():
-        try:
-            if traci.vehicle.getVehicleClass(vid) in ["emergency", "authority"]:
-                return True
-        except traci.TraCIException:
-            continue
-    return False
+    return snapshot.refresh().any_priority()
 
 def get_state(tl_id):
-    vertical_lanes = [l for l in traci.trafficlight.getControlledLanes(tl_id) if 'N' in l or 'S' in l]
-    horizontal_lanes = [l for l in traci.trafficlight.getControlledLanes(tl_id) if 'E' in l or 'W' in l]
-
-    vertical = sum(
-        1 for l in vertical_lanes for v in traci.lane.getLastStepVehicleIDs(l) if traci.vehicle.getSpeed(v) < 0.1
-    )
-    horizontal = sum(
-        1 for l in horizontal_lanes for v in traci.lane.getLastStepVehicleIDs(l) if traci.vehicle.getSpeed(v) < 0.1
-    )
+    snap = snapshot.refresh()
+    horizontal, vertical = snap.stopped_by_axis(tl_id)
 
     # Velocidade média discretizada
-    speeds = [traci.vehicle.getSpeed(v) for v in traci.vehicle.getIDList() if traci.vehicle.getSpeed(v) > 0]
-    avg_speed = sum(speeds) / len(speeds) if speeds else 0
+    avg_speed = snap.mean_moving_speed()
     speed_discrete = min(int(avg_speed // 2), 5)
 
     # Informações globais
-    total_parados_global = sum(
-        sum(1 for l in traci.trafficlight.getControlledLanes(tl_other)
-            for v in traci.lane.getLastStepVehicleIDs(l) if traci.vehicle.getSpeed(v) < 0.1)
-        for tl_other in TRAFFIC_LIGHT_IDS
-    )
+    total_parados_global = snap.stopped_controlled()
     total_parados_global_discrete = min(total_parados_global // 10, 10)
 
-    global_priority = int(any(
-        any(traci.vehicle.getVehicleClass(v) in ("emergency", "authority")
-            for l in traci.trafficlight.getControlledLanes(tl_other)
-            for v in traci.lane.getLastStepVehicleIDs(l))
-        for tl_other in TRAFFIC_LIGHT_IDS
-    ))
+    global_priority = int(snap.priority_on_controlled())
 
     return (min(horizontal // 5, 5), min(vertical // 5, 5), speed_discrete, total_parados_global_discrete, global_priority)
 
-def apply_phase(tl, dir_next, curr_dir):
-    # Esta função agora apenas define as fases, não avança a simulação
-    # O avanço da simulação será feito no loop principal de run_simulation
-    if curr_dir and curr_dir != dir_next:
-        traci.trafficlight.setRedYellowGreenState(tl, SIGNALS[f"yellow_{curr_dir}"])
-        # A duração do amarelo é tratada no loop principal
-    traci.trafficlight.setRedYellowGreenState(tl, SIGNALS[f"green_{dir_next}"])
-    # A duração do verde é tratada no loop principal
-    return dir_next
+def apply_phase(tl, dir_next):
+    # Define a fase (amarelo antes de uma troca); o escalonador avança a simulação até a próxima decisão
+    return scheduler.set_phase(tl, dir_next)
 
-def run_simulation(max_steps=5000):
+def policy_decisions(due, q_table, agent):
+    # (semáforo, direção) de cada semáforo do lote, gerados um a um na ordem do lote
+    if agent is not None:
+        X = features.extract(scheduler.current)
+        for tl, action in zip(due, agent.greedy(X[[features.tl_index[tl] for tl in due]])):
+            yield tl, agent.actions[action]
+    else:
+        for tl in due:
+            state = get_state(tl)
+            yield tl, q_table.best_action(tl, state)
+
+def decide_with_deadline(due, q_table, agent, monitor):
+    # Modo em tempo real: decisão que não sai dentro do prazo do lote é descartada e o semáforo
+    # segue o plano de tempo fixo; depois que o prazo vence, os demais nem consultam a política.
+    # O prazo corre desde o fim do passo (monitor.start_batch em run_simulation), antes da leitura do estado
+    decisions = policy_decisions(due, q_table, agent)
+    for tl in due:
+        action = None
+        if not monitor.expired():
+            _, action = next(decisions)
+            if monitor.expired():
+                action = None
+        if action is None:
+            apply_phase(tl, plan_direction(scheduler.now))
+        else:
+            apply_phase(tl, action)
+        monitor.record(tl, action is None)
+
+def run_simulation(max_steps=5000, backend=None, sumo_args=(), output_dir="\\com_densidade\\resultados_qlearning", q_table_path=None, agent_path=None,
+                   realtime=None, deadline=DECISION_DEADLINE, sample_interval=SAMPLE_INTERVAL,
+                   green_duration=GREEN_DURATION, yellow_duration=YELLOW_DURATION):
+    if green_duration < 1 or yellow_duration < 0:
+        # com verde nulo a próxima decisão cai no mesmo instante e a simulação não sai do lugar
+        raise ValueError(f"durações inválidas: verde {green_duration}s (mínimo 1), amarelo {yellow_duration}s (mínimo 0)")
     print("Iniciando simulação com controle Q-learning por semáforo.")
 
     # Cria o diretório para salvar os resultados, se não existir
-    output_dir = "\\com_densidade\\resultados_qlearning"
     os.makedirs(output_dir, exist_ok=True)
 
-    q_table = {}
-    try:
-        with open("q_table.pkl", "rb") as f:
-            q_table = pickle.load(f)
-        print("✅ Q-table carregada")
-    except FileNotFoundError:
-        print("⚠️ Q-table não encontrada. Usando estratégia padrão.")
-        q_table = {}
-
-    sumo_gui_binary = os.path.join(os.environ.get("SUMO_HOME", ""), "bin", "sumo-gui") if "SUMO_HOME" in os.environ else "sumo-gui"
-    traci.start([sumo_gui_binary, "-c", SUMO_CFG_FILE, "--step-length", "1.0"])
-
-    current_phase = {tl: "vertical" for tl in TRAFFIC_LIGHT_IDS}
-    total_sim_steps = 0
-
-    # Contadores para tempo vermelho por direção
-    red_time = {tl: {"horizontal": 0, "vertical": 0} for tl in TRAFFIC_LIGHT_IDS}
-
-    # Listas para coletar dados
-    carros_parados_por_tempo = []
-    total_paradas_por_tempo = []
-    tempo_espera_por_tempo = []
-    velocidade_media_por_tempo = []
-    densidade_por_tempo = []
-    tempo_espera_emergency_por_tempo = []
-    tempo_espera_authority_por_tempo = []
-    # Métricas gerais para prioritários
-    carros_parados_prioritarios_por_tempo = []
-    total_paradas_prioritarios_por_tempo = []
-    tempo_espera_prioritarios_por_tempo = []
-    velocidade_media_prioritarios_por_tempo = []
-
-    # Coleta dados iniciais no tempo 0
-    vehicle_ids = traci.vehicle.getIDList()
-    total_parados = sum(
-        traci.lane.getLastStepHaltingNumber(lane)
-        for tl in TRAFFIC_LIGHT_IDS
-        for lane in traci.trafficlight.getControlledLanes(tl)
-    )
-    total_paradas = sum(1 for vid in vehicle_ids if traci.vehicle.getSpeed(vid) < 0.1)
-    total_tempo_espera = sum(traci.vehicle.getWaitingTime(vid) for vid in vehicle_ids)
-    velocidades = [traci.vehicle.getSpeed(vid) for vid in vehicle_ids if traci.vehicle.getSpeed(vid) > 0]
-    velocidade_media = sum(velocidades) / len(velocidades) if velocidades else 0
-
-    # Calcular densidade média (veículos/km/faixa)
-    densidades = []
-    for tl in TRAFFIC_LIGHT_IDS:
-        for lane in traci.trafficlight.getControlledLanes(tl):
-            num_veiculos = traci.lane.getLastStepVehicleNumber(lane)
-            comprimento = traci.lane.getLength(lane)
-            if comprimento > 0:
-                densidade_lane = (num_veiculos / comprimento) * 1000  # veículos/km
-                densidades.append(densidade_lane)
-    densidade_media = sum(densidades) / len(densidades) if densidades else 0
-
-    # Dados prioritários
-    emergency_ids = [vid for vid in vehicle_ids if traci.vehicle.getVehicleClass(vid) == "emergency"]
-    authority_ids = [vid for vid in vehicle_ids if traci.vehicle.getVehicleClass(vid) == "authority"]
-    num_emergency = len(emergency_ids)
-    total_espera_emergency = sum(traci.vehicle.getWaitingTime(vid) for vid in emergency_ids)
-    media_espera_emergency = total_espera_emergency / num_emergency if num_emergency else 0
-    num_authority = len(authority_ids)
-    total_espera_authority = sum(traci.vehicle.getWaitingTime(vid) for vid in authority_ids)
-    media_espera_authority = total_espera_authority / num_authority if num_authority else 0
-
-    # Métricas gerais para prioritários
-    priority_ids = emergency_ids + authority_ids
-    if priority_ids:
-        carros_parados_prioritarios = sum(1 for vid in priority_ids if traci.vehicle.getSpeed(vid) < 0.1)
-        total_paradas_prioritarios = sum(1 for vid in priority_ids if traci.vehicle.getSpeed(vid) < 0.1)
-        tempo_espera_prioritarios = sum(traci.vehicle.getWaitingTime(vid) for vid in priority_ids) / len(priority_ids)
-        velocidades_prioritarios = [traci.vehicle.getSpeed(vid) for vid in priority_ids if traci.vehicle.getSpeed(vid) > 0]
-        velocidade_media_prioritarios = sum(velocidades_prioritarios) / len(velocidades_prioritarios) if velocidades_prioritarios else 0
+    # agent_path: pesos de um agente por aproximação (treinamento com --agent linear/mlp) no lugar da Q-table
+    # realtime: segundos simulados por segundo de relógio (1.0 = tempo real), com prazo de deadline s por lote
+    # sample_interval: intervalo (s) das amostras de métricas, na mesma grade de tempo de tempo_fixo.py
+    # green_duration/yellow_duration: as da política em uso (as do treinamento, ou as escolhidas por ajuste.py)
+    agent = None
+    q_table = None
+    if agent_path:
+        agent = ApproxAgent.load(agent_path)
+        print(f"✅ Agente {agent.kind} carregado")
     else:
-        carros_parados_prioritarios = 0
-        total_paradas_prioritarios = 0
-        tempo_espera_prioritarios = 0
-        velocidade_media_prioritarios = 0
-
-    carros_parados_por_tempo.append({'tempo': 0, 'carros_parados': total_parados})
-    total_paradas_por_tempo.append({'tempo': 0, 'total_paradas': total_paradas})
-    tempo_espera_por_tempo.append({'tempo': 0, 'tempo_espera': total_tempo_espera})
-    velocidade_media_por_tempo.append({'tempo': 0, 'velocidade_media': velocidade_media})
-    densidade_por_tempo.append({'tempo': 0, 'densidade_media': densidade_media})
-    tempo_espera_emergency_por_tempo.append({'tempo': 0, 'num_emergency': num_emergency, 'total_espera_emergency': total_espera_emergency, 'media_espera_emergency': media_espera_emergency})
-    tempo_espera_authority_por_tempo.append({'tempo': 0, 'num_authority': num_authority, 'total_espera_authority': total_espera_authority, 'media_espera_authority': media_espera_authority})
-    carros_parados_prioritarios_por_tempo.append({'tempo': 0, 'carros_parados_prioritarios': carros_parados_prioritarios})
-    total_paradas_prioritarios_por_tempo.append({'tempo': 0, 'total_paradas_prioritarios': total_paradas_prioritarios})
-    tempo_espera_prioritarios_por_tempo.append({'tempo': 0, 'tempo_espera_prioritarios': tempo_espera_prioritarios})
-    velocidade_media_prioritarios_por_tempo.append({'tempo': 0, 'velocidade_media_prioritarios': velocidade_media_prioritarios})
-
-    while traci.simulation.getMinExpectedNumber() > 0 and total_sim_steps < max_steps:
-        # Aplica fases para todos os semáforos com base na Q-table
-        for tl in TRAFFIC_LIGHT_IDS:
-            state = get_state(tl)
-            q_values = q_table.get((tl, state), {"horizontal": 0, "vertical": 0})
-            next_dir = max(q_values, key=q_values.get)
-
-            if current_phase[tl] != next_dir:
-                # Aplica a fase YELLOW
-                traci.trafficlight.setRedYellowGreenState(tl, SIGNALS[f"yellow_{current_phase[tl]}"])
-                for _ in range(YELLOW_DURATION):
-                    traci.simulationStep()
-                    total_sim_steps += 1
-                    # Atualizar tempo vermelho
-                    for dir in ["horizontal", "vertical"]:
-                        if dir != current_phase[tl]:
-                            red_time[tl][dir] += 1
-
-            current_phase[tl] = next_dir
-            # Aplica a fase GREEN
-            traci.trafficlight.setRedYellowGreenState(tl, SIGNALS[f"green_{next_dir}"])
-
-            # Resetar tempo vermelho para a direção verde
-            red_time[tl][next_dir] = 0
-
-        # Avança a simulação para a duração do verde
-        for _ in range(GREEN_DURATION):
-            traci.simulationStep()
-            total_sim_steps += 1
-            # Atualizar tempo vermelho para direções não verdes
-            for tl in TRAFFIC_LIGHT_IDS:
-                for dir in ["horizontal", "vertical"]:
-                    if dir != current_phase[tl]:
-                        red_time[tl][dir] += 1
-
-        # Coleta dados após cada ciclo
-        vehicle_ids = traci.vehicle.getIDList()
-        total_parados = sum(
-            traci.lane.getLastStepHaltingNumber(lane)
-            for tl in TRAFFIC_LIGHT_IDS
-            for lane in traci.trafficlight.getControlledLanes(tl)
-        )
-        total_paradas = sum(1 for vid in vehicle_ids if traci.vehicle.getSpeed(vid) < 0.1)  # Estimativa
-        total_tempo_espera = sum(traci.vehicle.getWaitingTime(vid) for vid in vehicle_ids)
-        velocidades = [traci.vehicle.getSpeed(vid) for vid in vehicle_ids if traci.vehicle.getSpeed(vid) > 0]
-        velocidade_media = sum(velocidades) / len(velocidades) if velocidades else 0
-
-        # Calcular densidade média (veículos/km/faixa)
-        densidades = []
-        for tl in TRAFFIC_LIGHT_IDS:
-            for lane in traci.trafficlight.getControlledLanes(tl):
-                num_veiculos = traci.lane.getLastStepVehicleNumber(lane)
-                comprimento = traci.lane.getLength(lane)
-                if comprimento > 0:
-                    densidade_lane = (num_veiculos / comprimento) * 1000  # veículos/km
-                    densidades.append(densidade_lane)
-        densidade_media = sum(densidades) / len(densidades) if densidades else 0
-
-        # Dados prioritários
-        emergency_ids = [vid for vid in vehicle_ids if traci.vehicle.getVehicleClass(vid) == "emergency"]
-        authority_ids = [vid for vid in vehicle_ids if traci.vehicle.getVehicleClass(vid) == "authority"]
-        num_emergency = len(emergency_ids)
-        total_espera_emergency = sum(traci.vehicle.getWaitingTime(vid) for vid in emergency_ids)
-        media_espera_emergency = total_espera_emergency / num_emergency if num_emergency else 0
-        num_authority = len(authority_ids)
-        total_espera_authority = sum(traci.vehicle.getWaitingTime(vid) for vid in authority_ids)
-        media_espera_authority = total_espera_authority / num_authority if num_authority else 0
+        try:
+            q_table = QTable.load(q_table_path) if q_table_path else load_q_table(TRAFFIC_LIGHT_IDS)
+            print("✅ Q-table carregada")
+        except FileNotFoundError:
+            print("⚠️ Q-table não encontrada. Usando estratégia padrão.")
+            q_table = QTable(TRAFFIC_LIGHT_IDS)
 
-        carros_parados_por_tempo.append({'tempo': total_sim_steps, 'carros_parados': total_parados})
-        total_paradas_por_tempo.append({'tempo': total_sim_steps, 'total_paradas': total_paradas})
-        tempo_espera_por_tempo.append({'tempo': total_sim_steps, 'tempo_espera': total_tempo_espera})
-        velocidade_media_por_tempo.append({'tempo': total_sim_steps, 'velocidade_media': velocidade_media})
-        densidade_por_tempo.append({'tempo': total_sim_steps, 'densidade_media': densidade_media})
-        tempo_espera_emergency_por_tempo.append({'tempo': total_sim_steps, 'num_emergency': num_emergency, 'total_espera_emergency': total_espera_emergency, 'media_espera_emergency': media_espera_emergency})
-        tempo_espera_authority_por_tempo.append({'tempo': total_sim_steps, 'num_authority': num_authority, 'total_espera_authority': total_espera_authority, 'media_espera_authority': media_espera_authority})
+    # sumo_args permite trocar rotas, escala de demanda, semente e arquivos de saída (usado pela varredura)
+    sumo_backend.start(["-c", SUMO_CFG_FILE, "--step-length", "1.0", *sumo_args], backend, default="sumo-gui")
+    snapshot.reset()
 
-        # Métricas gerais para prioritários
-        prioritarios_ids = emergency_ids + authority_ids
-        if prioritarios_ids:
-            carros_parados_prioritarios = sum(1 for vid in prioritarios_ids if traci.vehicle.getSpeed(vid) < 0.1)
-            total_paradas_prioritarios = sum(1 for vid in prioritarios_ids if traci.vehicle.getSpeed(vid) < 0.1)
-            tempo_espera_prioritarios = sum(traci.vehicle.getWaitingTime(vid) for vid in prioritarios_ids) / len(prioritarios_ids)
-            velocidades_prioritarios = [traci.vehicle.getSpeed(vid) for vid in prioritarios_ids if traci.vehicle.getSpeed(vid) > 0]
-            velocidade_media_prioritarios = sum(velocidades_prioritarios) / len(velocidades_prioritarios) if velocidades_prioritarios else 0
-        else:
-            carros_parados_prioritarios = 0
-            total_paradas_prioritarios = 0
-            tempo_espera_prioritarios = 0
-            velocidade_media_prioritarios = 0
+    total_sim_steps = 0
+    scheduler.green_duration = green_duration
+    scheduler.yellow_duration = yellow_duration
+    # Os semáforos começam em verde vertical: a primeira troca para horizontal passa pelo amarelo
+    scheduler.reset(initial={tl: "vertical" for tl in TRAFFIC_LIGHT_IDS})
+
+    # As amostras são gravadas em disco conforme a simulação avança (uma linha larga por amostra). Elas seguem
+    # a grade de sample_interval segundos, como no tempo fixo, e não os lotes de decisões (em instantes
+    # irregulares): as médias da execução comparadas por comparar_resultados.py pesam o tempo igualmente
+    sink = MetricsSink(os.path.join(output_dir, "metricas_passo_qlearning"))
+    next_sample = 0
+    if realtime:
+        pacer, monitor = RealTimePacer(realtime), DeadlineMonitor(deadline)
+        pacer.start(scheduler.now)
+        monitor.start_batch()
 
-        carros_parados_prioritarios_por_tempo.append({'tempo': total_sim_steps, 'carros_parados_prioritarios': carros_parados_prioritarios})
-        total_paradas_prioritarios_por_tempo.append({'tempo': total_sim_steps, 'total_paradas_prioritarios': total_paradas_prioritarios})
-        tempo_espera_prioritarios_por_tempo.append({'tempo': total_sim_steps, 'tempo_espera_prioritarios': tempo_espera_prioritarios})
-        velocidade_media_prioritarios_por_tempo.append({'tempo': total_sim_steps, 'velocidade_media_prioritarios': velocidade_media_prioritarios})
+    try:
+        while traci.simulation.getMinExpectedNumber() > 0 and total_sim_steps < max_steps:
+            if total_sim_steps >= next_sample:
+                sink.write(collector.collect(total_sim_steps))
+                next_sample += sample_interval
+            due = scheduler.pop_due()
+            # Aplica fases para os semáforos que vencem agora com base na Q-table
+            if realtime:
+                if due:
+                    decide_with_deadline(due, q_table, agent, monitor)
+                # um passo por vez, cada um no instante de relógio correspondente
+                pacer.wait_until(scheduler.now + 1)
+                total_sim_steps += scheduler.advance(limit=min(1, next_sample - total_sim_steps))
+                # o prazo do próximo lote conta a partir daqui: a coleta de métricas e o refresh do snapshot
+                # feitos antes das decisões entram nele
+                monitor.start_batch()
+                continue
+            if due:
+                for tl, action in policy_decisions(due, q_table, agent):
+                    apply_phase(tl, action)
+
+            # até a próxima decisão ou a próxima amostra, o que vier primeiro
+            total_sim_steps += scheduler.advance(limit=next_sample - total_sim_steps)
+    finally:
+        # Mesmo se a simulação for interrompida, o que já foi coletado fica no disco
+        sink.close()
 
     traci.close()
+    perfil.end_episode("qlearning")
     print(f"✅ Simulação finalizada com {total_sim_steps} passos.")
+    if realtime:
+        report(monitor, pacer, output_dir)
 
-    # Salva os dados
-    df_parados = pd.DataFrame(carros_parados_por_tempo)
-    df_paradas = pd.DataFrame(total_paradas_por_tempo)
-    df_espera = pd.DataFrame(tempo_espera_por_tempo)
-    df_velocidade = pd.DataFrame(velocidade_media_por_tempo)
-    df_emergency = pd.DataFrame(tempo_espera_emergency_por_tempo)
-    df_authority = pd.DataFrame(tempo_espera_authority_por_tempo)
-    df_parados_prioritarios = pd.DataFrame(carros_parados_prioritarios_por_tempo)
-    df_paradas_prioritarios = pd.DataFrame(total_paradas_prioritarios_por_tempo)
-    df_espera_prioritarios = pd.DataFrame(tempo_espera_prioritarios_por_tempo)
-    df_velocidade_prioritarios = pd.DataFrame(velocidade_media_prioritarios_por_tempo)
-    df_densidade = pd.DataFrame(densidade_por_tempo)
-    
-    df_parados.to_csv(os.path.join(output_dir, "resultado_qlearning.csv"), index=False)
-    df_paradas.to_csv(os.path.join(output_dir, "paradas_qlearning.csv"), index=False)
-    df_espera.to_csv(os.path.join(output_dir, "espera_qlearning.csv"), index=False)
-    df_velocidade.to_csv(os.path.join(output_dir, "velocidade_qlearning.csv"), index=False)
-    df_densidade.to_csv(os.path.join(output_dir, "densidade_qlearning.csv"), index=False)
-    df_emergency.to_csv(os.path.join(output_dir, "emergency_qlearning.csv"), index=False)
-    df_authority.to_csv(os.path.join(output_dir, "authority_qlearning.csv"), index=False)
-    df_parados_prioritarios.to_csv(os.path.join(output_dir, "carros_parados_prioritarios_qlearning.csv"), index=False)
-    df_paradas_prioritarios.to_csv(os.path.join(output_dir, "paradas_prioritarios_qlearning.csv"), index=False)
-    df_espera_prioritarios.to_csv(os.path.join(output_dir, "espera_prioritarios_qlearning.csv"), index=False)
-    df_velocidade_prioritarios.to_csv(os.path.join(output_dir, "velocidade_prioritarios_qlearning.csv"), index=False)
+    # Gera os CSVs por métrica lidos por comparar_resultados.py
+    df = export_legacy_csvs(sink.path, output_dir, "qlearning")
     print(f"📁 Resultados salvos em '{output_dir}'.")
+    return df
 
 if __name__ == "__main__":
-    run_simulation()
\ No newline at end of file
+    import argparse
+    import json
+    import sys
+    parser = argparse.ArgumentParser(description="Simulação com a Q-table treinada")
+    parser.add_argument("--max-steps", type=int, default=5000)
+    parser.add_argument("--realtime", nargs="?", type=float, const=1.0, default=None, metavar="VELOCIDADE",
+                        help="avança no ritmo do relógio (1 = tempo real, 10 = dez vezes mais rápido) com prazo por decisão")
+    parser.add_argument("--deadline", type=float, default=DECISION_DEADLINE * 1e3,
+                        help="prazo (ms) de cada lote de decisões no modo --realtime; fora dele vale o plano de tempo fixo")
+    parser.add_argument("--sample-interval", type=int, default=SAMPLE_INTERVAL, help="intervalo de coleta das métricas (s)")
+    parser.add_argument("--routes", default=None, help="arquivo de rotas no lugar do da configuração (p.ex. gerado por demanda.py)")
+    parser.add_argument("--q-table", default=None, metavar="ARQUIVO", help="Q-table a usar (padrão: q_table.npz)")
+    parser.add_argument("--ajuste", default=None, metavar="MELHOR_JSON",
+                        help="usa as durações de verde e amarelo da melhor configuração de ajuste.py (ajuste/melhor.json)")
+    parser.add_argument("--green", type=int, default=None, help=f"duração do verde (s; padrão {GREEN_DURATION})")
+    parser.add_argument("--yellow", type=int, default=None, help=f"duração do amarelo (s; padrão {YELLOW_DURATION})")
+    parser.add_argument("--agent", default=None, metavar="ARQUIVO",
+                        help="usa um agente por aproximação (agente_linear.npz/agente_mlp.npz) em vez da Q-table")
+    sumo_backend.add_backend_argument(parser, default="sumo-gui")
+    perfil.add_profile_argument(parser, default="perfil/simulacao_qlearning")
+    args = parser.parse_args()
+    if args.sample_interval < 1:
+        parser.error("--sample-interval deve ser de pelo menos 1 s")
+    if args.profile:
+        module = sys.modules[__name__]
+        perfil.enable(args.profile, [(sumo_backend, "start", "inicio", {"decision_start": True}),
+                                     (module, "get_state", "estado"), (QTable, "best_action", "acao"),
+                                     (features, "extract", "atributos"), (ApproxAgent, "greedy", "acao"),
+                                     (module, "apply_phase", "fase", {"decision_end": True}),
+                                     (collector, "collect", "metricas")])
+    sumo_args = ["--route-files", args.routes] if args.routes else []
+    green, yellow = GREEN_DURATION, YELLOW_DURATION
+    if args.ajuste:
+        with open(args.ajuste) as f:
+            best = json.load(f)
+        green, yellow = best["GREEN_DURATION"], best["YELLOW_DURATION"]
+    green = args.green if args.green is not None else green
+    yellow = args.yellow if args.yellow is not None else yellow
+    if green < 1 or yellow < 0:
+        parser.error(f"o verde deve ser de pelo menos 1 s e o amarelo não pode ser negativo (verde {green}, amarelo {yellow})")
+    print(f"🚦 Verde {green}s, amarelo {yellow}s")
+    run_simulation(args.max_steps, args.backend, sumo_args, q_table_path=args.q_table, agent_path=args.agent,
+                   realtime=args.realtime, deadline=args.deadline / 1e3, sample_interval=args.sample_interval,
+                   green_duration=green, yellow_duration=yellow)
\ No newline at end of file
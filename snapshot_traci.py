@@ -0,0 +1,197 @@
+import numpy as np
+import traci.constants as tc
+from sumo_backend import traci
+
+# Variáveis assinadas (subscriptions) por veículo e por faixa controlada.
+# Os resultados das assinaturas chegam junto com a resposta de simulationStep,
+# então ler o snapshot não custa nenhuma ida e volta extra ao socket.
+VEHICLE_VARS = [tc.VAR_SPEED, tc.VAR_WAITING_TIME, tc.VAR_VEHICLECLASS, tc.VAR_ANGLE, tc.VAR_LANE_ID]
+LANE_VARS = [tc.LAST_STEP_VEHICLE_NUMBER, tc.LAST_STEP_VEHICLE_HALTING_NUMBER]
+
+# Nível de prioridade por vClass (0 = veículo comum)
+PRIORITY_LEVEL = {"emergency": 2, "authority": 1}
+
+STOPPED_SPEED = 0.1  # abaixo disso o veículo é considerado parado
+
+
+def is_vertical_angle(angle):
+    return ((angle > 45) & (angle < 135)) | ((angle > 225) & (angle < 315))
+
+
+# Índice dos veículos prioritários (emergência/autoridade) mantido por eventos de partida e chegada.
+# Cada veículo é classificado uma única vez, quando aparece; as consultas de prioridade
+# percorrem só esse índice, então o custo acompanha o número de prioritários e não o tráfego total.
+class PriorityTracker:
+
+    def __init__(self, levels=PRIORITY_LEVEL):
+        self.levels = levels
+        self.reset()
+
+    def reset(self):
+        self.level = {}  # id do veículo -> nível de prioridade
+
+    def update(self, departed, arrived, vclass_of):
+        for vid in arrived:
+            self.level.pop(vid, None)
+        for vid in departed:
+            level = self.levels.get(vclass_of(vid), 0)
+            if level:
+                self.level[vid] = level
+
+    def __len__(self):
+        return len(self.level)
+
+    def __iter__(self):
+        return iter(self.level.items())
+
+
+# Estado da simulação lido uma vez por passo e exposto como arrays NumPy.
+# Cada veículo é assinado uma única vez quando aparece; a partir daí velocidade,
+# espera, classe, ângulo e faixa chegam de graça a cada passo. Por decisão o custo
+# é uma chamada (getIDList) mais uma assinatura para cada veículo novo.
+class TraciSnapshot:
+
+    def __init__(self, topology, tl_ids=None):
+        # topology: topologia.NetTopology da rede (faixas controladas e eixo de cada link)
+        self.topology = topology
+        self.tl_ids = list(tl_ids or topology.tl_ids)
+        self.tl_index = {tl: i for i, tl in enumerate(self.tl_ids)}
+        self.priority_tracker = PriorityTracker()
+        self._ready = False
+        self._build_weights()
+
+    def _build_weights(self):
+        # Faixas e eixos vêm do índice da rede, então não há consulta nem classificação por nome a cada reset
+        controlled = {tl: self.topology.controlled_lanes(tl) for tl in self.tl_ids}
+        self.lanes = sorted({l for lanes in controlled.values() for l in lanes})
+        self.lane_index = {l: i for i, l in enumerate(self.lanes)}
+
+        # peso[tl, faixa] = quantas vezes a faixa aparece em getControlledLanes(tl) (uma vez por link),
+        # igual à contagem feita pelos laços originais. A última coluna representa "fora das faixas controladas".
+        shape = (len(self.tl_ids), len(self.lanes) + 1)
+        self.lane_weight = np.zeros(shape, dtype=np.int32)
+        self.vertical_weight = np.zeros(shape, dtype=np.int32)
+        self.horizontal_weight = np.zeros(shape, dtype=np.int32)
+        for t, tl in enumerate(self.tl_ids):
+            for l, axis in zip(controlled[tl], self.topology.link_axes(tl)):
+                i = self.lane_index[l]
+                self.lane_weight[t, i] += 1
+                if axis == "vertical":
+                    self.vertical_weight[t, i] += 1
+                else:
+                    self.horizontal_weight[t, i] += 1
+        self.controlled_weight = self.lane_weight.sum(axis=0)
+
+    def reset(self):
+        # Deve ser chamado após cada traci.start/traci.load: as assinaturas não sobrevivem ao reload
+        traci.simulation.subscribe([tc.VAR_TIME])
+        for l in self.lanes:
+            traci.lane.subscribe(l, LANE_VARS)
+
+        self._subscribed = set()
+        self._time = None
+        self._results = {}
+        self.priority_tracker.reset()
+        self._ready = True
+        self._load([], {})
+        self.lane_vehicles = np.zeros(len(self.lanes), dtype=np.int32)
+        self.lane_halting = np.zeros(len(self.lanes), dtype=np.int32)
+
+    def refresh(self):
+        if not self._ready:
+            self.reset()
+        time = traci.simulation.getSubscriptionResults().get(tc.VAR_TIME)
+        if time is not None and time == self._time:
+            return self
+
+        ids = traci.vehicle.getIDList()
+        current = set(ids)
+        departed = current - self._subscribed
+        arrived = self._subscribed - current
+        for vid in departed:
+            traci.vehicle.subscribe(vid, VEHICLE_VARS)
+        self._subscribed = current
+
+        results = traci.vehicle.getAllSubscriptionResults()
+        # Partidas e chegadas desde a última leitura (o snapshot só é lido nos pontos de decisão,
+        # então as listas por passo de getDepartedIDList/getArrivedIDList seriam perdidas entre eles)
+        self.priority_tracker.update(departed, arrived, lambda vid: results[vid][tc.VAR_VEHICLECLASS])
+        self._results = results
+        self._load(ids, results)
+        lane_results = traci.lane.getAllSubscriptionResults()
+        self.lane_vehicles = np.array([lane_results[l][tc.LAST_STEP_VEHICLE_NUMBER] for l in self.lanes], dtype=np.int32)
+        self.lane_halting = np.array([lane_results[l][tc.LAST_STEP_VEHICLE_HALTING_NUMBER] for l in self.lanes], dtype=np.int32)
+        self._time = time
+        return self
+
+    def _load(self, ids, results):
+        rows = [results[v] for v in ids]
+        n = len(rows)
+        outside = len(self.lanes)
+        self.ids = list(ids)
+        self.speed = np.fromiter((r[tc.VAR_SPEED] for r in rows), dtype=np.float64, count=n)
+        self.waiting = np.fromiter((r[tc.VAR_WAITING_TIME] for r in rows), dtype=np.float64, count=n)
+        self.vclass = [r[tc.VAR_VEHICLECLASS] for r in rows]
+        self.priority = np.fromiter((PRIORITY_LEVEL.get(c, 0) for c in self.vclass), dtype=np.int8, count=n)
+        self.angle = np.fromiter((r[tc.VAR_ANGLE] for r in rows), dtype=np.float64, count=n)
+        self.lane = np.fromiter((self.lane_index.get(r[tc.VAR_LANE_ID], outside) for r in rows), dtype=np.int32, count=n)
+        self.stopped = self.speed < STOPPED_SPEED
+
+    # ---------- consultas usadas por get_state, prioridade e recompensa ----------
+
+    def stopped_by_axis(self, tl):
+        t = self.tl_index[tl]
+        horz = int(self.horizontal_weight[t][self.lane][self.stopped].sum())
+        vert = int(self.vertical_weight[t][self.lane][self.stopped].sum())
+        return horz, vert
+
+    def stopped_controlled(self):
+        return int(self.controlled_weight[self.lane][self.stopped].sum())
+
+    def mean_moving_speed(self):
+        moving = self.speed[self.speed > 0]
+        return float(moving.mean()) if moving.size else 0
+
+    # As consultas de prioridade percorrem só o PriorityTracker; faixa, ângulo e espera
+    # de cada prioritário vêm dos resultados de assinatura já lidos no refresh
+
+    def priority_on_controlled(self):
+        for vid, _ in self.priority_tracker:
+            i = self.lane_index.get(self._results[vid][tc.VAR_LANE_ID])
+            if i is not None and self.controlled_weight[i] > 0:
+                return True
+        return False
+
+    def priority_per_tl(self):
+        # score[t] = [maior nível na horizontal, maior nível na vertical]
+        score = np.zeros((len(self.tl_ids), 2), dtype=np.int8)
+        for vid, level in self.priority_tracker:
+            r = self._results[vid]
+            i = self.lane_index.get(r[tc.VAR_LANE_ID])
+            if i is None:
+                continue
+            axis = int(is_vertical_angle(r[tc.VAR_ANGLE]))
+            on_tl = self.lane_weight[:, i] > 0
+            score[on_tl, axis] = np.maximum(score[on_tl, axis], level)
+        data = {}
+        for t, tl in enumerate(self.tl_ids):
+            score_h, score_v = int(score[t, 0]), int(score[t, 1])
+            if score_h > score_v:
+                data[tl] = ("horizontal", score_h)
+            elif score_v > score_h:
+                data[tl] = ("vertical", score_v)
+            else:
+                data[tl] = (None, 0)
+        return data
+
+    def any_priority(self):
+        return len(self.priority_tracker) > 0
+
+    def mean_waiting(self):
+        return float(self.waiting.sum()) / max(1, len(self.ids))
+
+    def priority_waiting(self):
+        return float(sum(self._results[vid][tc.VAR_WAITING_TIME] for vid, _ in self.priority_tracker))
+
+    def long_wait_count(self, limit):
+        return int(np.count_nonzero(self.waiting > limit))
@@ -0,0 +1,137 @@
+import os
+import importlib
+
+# Backends suportados:
+#   libsumo  -> SUMO carregado no próprio processo (sem socket, sem interface gráfica)
+#   sumo     -> TraCI via socket com o binário headless
+#   sumo-gui -> TraCI via socket com a interface gráfica
+# A escolha vem do argumento --backend, da variável de ambiente SUMO_BACKEND
+# ou do padrão de cada script, nessa ordem.
+BACKENDS = ("libsumo", "sumo", "sumo-gui")
+ENV_VAR = "SUMO_BACKEND"
+
+# Backend -> módulo Python que implementa a API TraCI.
+# register_backend acrescenta outros (p.ex. o TraCI simulado dos benchmarks).
+_MODULES = {"libsumo": "libsumo", "sumo": "traci", "sumo-gui": "traci"}
+
+_module = None
+_name = None
+# Gancho do perfilador (perfil.py): recebe (nome, atributo) e devolve o atributo a usar
+_call_hook = None
+
+
+# Encaminha traci.<atributo> para o módulo do backend ativo (traci ou libsumo),
+# para que o restante do código continue escrevendo traci.vehicle.getSpeed(...) etc.
+class _TraciProxy:
+
+    def __getattr__(self, name):
+        if _module is None:
+            select_backend()
+        if _call_hook is not None:
+            return _call_hook(name, getattr(_module, name))
+        return getattr(_module, name)
+
+
+traci = _TraciProxy()
+
+
+def select_backend(name=None, default="sumo"):
+    global _module, _name
+    name = name or os.environ.get(ENV_VAR) or default
+    if name not in _MODULES:
+        raise ValueError(f"Backend SUMO desconhecido: {name!r} (use um de {', '.join(_MODULES)})")
+    _module = importlib.import_module(_MODULES[name])
+    _name = name
+    return name
+
+
+def set_call_hook(hook):
+    global _call_hook
+    _call_hook = hook
+
+
+def register_backend(name, module_name):
+    _MODULES[name] = module_name
+
+
+def backend_name():
+    return _name
+
+
+def is_libsumo():
+    return _name == "libsumo"
+
+
+def sumo_binary(gui=False):
+    binary = "sumo-gui" if gui else "sumo"
+    if "SUMO_HOME" in os.environ:
+        return os.path.join(os.environ["SUMO_HOME"], "bin", binary)
+    return binary
+
+
+def start(args, backend=None, default="sumo", label="default"):
+    # args são as opções do SUMO sem o binário, p.ex. ["-c", SUMO_CFG_FILE, "--step-length", "1.0"]
+    name = select_backend(backend, default)
+    cmd = [sumo_binary(gui=(name == "sumo-gui"))] + list(args)
+    if name == "libsumo":
+        # libsumo roda uma única simulação por processo, não há label/porta
+        _module.start(cmd)
+    else:
+        _module.start(cmd, label=label)
+    return name
+
+
+# Mantém um único processo SUMO entre episódios: o primeiro open() inicia o SUMO e os
+# seguintes recarregam a simulação com traci.load (sem novo processo, sem reler a rede
+# e sem nova conexão). As opções de cada episódio (rotas, semente...) vão no reload.
+# Se o SUMO tiver caído, o reload falha com FatalTraCIError e o processo é reiniciado.
+# No backend por socket, o SUMO mantém entre traci.load as opções que o novo load não repete
+# (p.ex. um --load-state de um episódio anterior); quando o novo load deixa de passar
+# alguma opção do anterior, o processo é reiniciado. O libsumo recomeça as opções a cada load.
+class SumoSession:
+
+    def __init__(self, backend=None, default="sumo", label="default"):
+        self.backend = backend
+        self.default = default
+        self.label = label
+        self.running = False
+        self.starts = 0
+        self.reloads = 0
+        self._options = set()
+
+    def open(self, args):
+        options = {a for a in args if a.startswith("-")}
+        if self.running and not is_libsumo() and not self._options <= options:
+            self.close()
+        if self.running:
+            try:
+                _module.load(list(args))
+                self.reloads += 1
+                self._options = options
+                return
+            except _module.FatalTraCIError:
+                print("⚠️ SUMO caiu; reiniciando o processo")
+                self.close()
+        start(args, self.backend, self.default, self.label)
+        self.running = True
+        self.starts += 1
+        self._options = options
+
+    def close(self):
+        if self.running:
+            self.running = False
+            try:
+                _module.close()
+            except _module.FatalTraCIError:
+                pass  # conexão já perdida
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def add_backend_argument(parser, default):
+    parser.add_argument("--backend", choices=BACKENDS, default=None,
+                        help=f"backend do SUMO (padrão: ${ENV_VAR} ou {default})")
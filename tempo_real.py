@@ -0,0 +1,85 @@
+import json
+import os
+import time
+from collections import Counter
+import numpy as np
+
+# Modo em tempo real da simulação Q-learning (simulacao_Qlearning.py --realtime), para testes com
+# equipamento no laço: a simulação avança um passo por vez no ritmo do relógio e cada lote de decisões
+# tem um prazo, contado do fim do passo que o tornou devido. Quem não decide dentro do prazo (estado ou
+# consulta lentos) recebe a direção do plano de tempo fixo (tempo_fixo.plan_direction) naquele instante.
+DECISION_DEADLINE = 0.1  # s
+LATE_TOLERANCE = 0.01    # atraso (s) de relógio a partir do qual um passo conta como atrasado
+
+
+class RealTimePacer:
+
+    def __init__(self, speed=1.0):
+        # speed: segundos simulados por segundo de relógio (1.0 = tempo real)
+        self.speed = speed
+        self.late_steps = 0
+        self.max_lag = 0.0
+
+    def start(self, sim_time):
+        self._wall0 = time.perf_counter()
+        self._sim0 = sim_time
+
+    def wait_until(self, sim_time):
+        # Dorme até o instante de relógio correspondente a sim_time; se ele já passou, registra o atraso
+        lag = time.perf_counter() - (self._wall0 + (sim_time - self._sim0) / self.speed)
+        if lag < 0:
+            time.sleep(-lag)
+            return 0.0
+        if lag > LATE_TOLERANCE:
+            self.late_steps += 1
+        self.max_lag = max(self.max_lag, lag)
+        return lag
+
+
+class DeadlineMonitor:
+
+    def __init__(self, deadline=DECISION_DEADLINE):
+        self.deadline = deadline
+        self.latencies = []           # s, do fim do passo (start_batch) até a fase aplicada, por decisão
+        self.missed = Counter()       # semáforo -> decisões fora do prazo
+        self._t0 = time.perf_counter()
+
+    def start_batch(self):
+        self._t0 = time.perf_counter()
+
+    def expired(self):
+        return time.perf_counter() - self._t0 > self.deadline
+
+    def record(self, tl, missed):
+        self.latencies.append(time.perf_counter() - self._t0)
+        if missed:
+            self.missed[tl] += 1
+
+    def summary(self):
+        lat_ms = np.array(self.latencies) * 1e3
+        percentile = (lambda q: float(np.percentile(lat_ms, q))) if lat_ms.size else (lambda q: 0.0)
+        return {
+            "prazo_ms": self.deadline * 1e3,
+            "decisoes": len(self.latencies),
+            "fora_do_prazo": sum(self.missed.values()),
+            "fora_do_prazo_por_semaforo": dict(self.missed),
+            "latencia_p50_ms": percentile(50),
+            "latencia_p95_ms": percentile(95),
+            "latencia_p99_ms": percentile(99),
+            "latencia_max_ms": float(lat_ms.max()) if lat_ms.size else 0.0,
+        }
+
+
+def report(monitor, pacer, output_dir):
+    summary = dict(monitor.summary(), velocidade=pacer.speed, passos_atrasados=pacer.late_steps,
+                   atraso_max_s=pacer.max_lag)
+    path = os.path.join(output_dir, "tempo_real.json")
+    with open(path, "w") as f:
+        json.dump(summary, f, indent=1)
+    share = 100 * summary["fora_do_prazo"] / max(1, summary["decisoes"])
+    print(f"⏱️ Tempo real ({pacer.speed:g}x): {summary['decisoes']} decisões, {summary['fora_do_prazo']} fora do prazo "
+          f"de {summary['prazo_ms']:g} ms ({share:.1f}%, plano de tempo fixo aplicado)")
+    print(f"   latência p50/p95/p99: {summary['latencia_p50_ms']:.2f}/{summary['latencia_p95_ms']:.2f}/"
+          f"{summary['latencia_p99_ms']:.2f} ms; passos atrasados: {pacer.late_steps} (máx. {pacer.max_lag:.3f}s)")
+    print(f"📁 Resumo do tempo real salvo em '{path}'")
+    return summary
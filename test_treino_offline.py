@@ -0,0 +1,37 @@
+import numpy as np
+from qtable import QTable
+from treino_offline import batch_td
+
+# Regressão: um minilote com a mesma célula repetida muitas vezes (mais de 2/alpha) somava os erros
+# calculados do mesmo valor antigo e divergia (-50, 150, -650, 2550, ...).
+
+
+def repeated_cell(n):
+    zeros = np.zeros(n, dtype=np.int64)
+    return zeros, zeros, zeros, np.full(n, -100.0), np.ones(n, dtype=np.int64)
+
+
+def test_update_many_repeated_cell_stays_bounded():
+    Q = QTable(["B2"])
+    for _ in range(50):
+        Q.update_many(*repeated_cell(100), alpha=0.5, gamma=0.9)
+        assert -100.0 <= Q.values[0, 0, 0] <= 0.0
+    assert np.isclose(Q.values[0, 0, 0], -100.0)
+
+
+def test_update_many_without_repeats_matches_sequential_updates():
+    batch, sequential = QTable(["B2", "C2"]), QTable(["B2", "C2"])
+    tl, codes, actions = np.array([0, 1, 0]), np.array([3, 5, 7]), np.array([0, 1, 1])
+    rewards, next_codes = np.array([1.0, 2.0, 3.0]), np.array([9, 9, 9])
+    batch.update_many(tl, codes, actions, rewards, next_codes, 0.1, 0.9)
+    for i in range(3):
+        sequential.update(sequential.tl_ids[tl[i]], sequential.decode(codes[i]), sequential.actions[actions[i]],
+                          rewards[i], sequential.decode(next_codes[i]), 0.1, 0.9)
+    assert np.array_equal(batch.values, sequential.values)
+
+
+def test_batch_td_repeated_cell_stays_bounded():
+    Q = QTable(["B2"])
+    batch_td(Q, *repeated_cell(1000), alpha=0.5, gamma=0.9, epochs=20, batch_size=4096)
+    assert np.isfinite(Q.values).all()
+    assert np.isclose(Q.values[0, 0, 0], -100.0)
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import math
+import os
+
+# Índice da topologia dos semáforos construído uma única vez a partir do arquivo .net.xml (sumolib).
+# Para cada semáforo guarda, por índice de link, a faixa de entrada, a faixa de saída e o eixo
+# da aproximação (calculado pelo ângulo da faixa, não pelo nome), e deriva daí as strings de fase.
+# O resultado fica em cache em disco, ao lado da rede, invalidado pelo hash do arquivo da rede.
+NET_FILE = "mapa_final_sumo.net.xml"
+CACHE_SUFFIX = ".topologia.json"
+# Incrementar quando mudar o conteúdo do índice, para invalidar os caches existentes
+CACHE_VERSION = 1
+
+AXES = ("horizontal", "vertical")
+
+
+def heading(shape):
+    # Ângulo de navegação do último trecho da faixa (0 = norte, sentido horário), como o VAR_ANGLE do SUMO
+    (x0, y0), (x1, y1) = shape[-2][:2], shape[-1][:2]
+    return math.degrees(math.atan2(x1 - x0, y1 - y0)) % 360
+
+
+def axis_of(angle):
+    # Mesma convenção de snapshot_traci.is_vertical_angle: quem trafega a 90° ou 270° é "vertical"
+    return "vertical" if 45 < angle < 135 or 225 < angle < 315 else "horizontal"
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_index(net_file):
+    import sumolib
+    net = sumolib.net.readNet(net_file)
+    index = {}
+    for tl in sorted(net.getTrafficLights(), key=lambda t: t.getID()):
+        links = []
+        for in_lane, out_lane, link in sorted(tl.getConnections(), key=lambda c: c[2]):
+            angle = heading(in_lane.getShape())
+            links.append({"indice": link, "faixa": in_lane.getID(), "saida": out_lane.getID(),
+                          "angulo": round(angle, 2), "eixo": axis_of(angle)})
+        index[tl.getID()] = links
+    return index
+
+
+class NetTopology:
+
+    def __init__(self, index):
+        self.index = index
+        self.tl_ids = list(index)
+        self._signals = {tl: self._derive_signals(tl) for tl in self.tl_ids}
+
+    def links(self, tl):
+        return self.index[tl]
+
+    def controlled_lanes(self, tl):
+        # Mesma lista (e multiplicidade) de traci.trafficlight.getControlledLanes: uma faixa por link
+        return [link["faixa"] for link in self.index[tl]]
+
+    def link_axes(self, tl):
+        return [link["eixo"] for link in self.index[tl]]
+
+    def _derive_signals(self, tl):
+        # Verde/amarelo para os links de um eixo, vermelho para os demais
+        axes = self.link_axes(tl)
+        signals = {}
+        for axis in AXES:
+            signals[f"green_{axis}"] = "".join("G" if a == axis else "r" for a in axes)
+            signals[f"yellow_{axis}"] = "".join("y" if a == axis else "r" for a in axes)
+        return signals
+
+    def signals(self, tl_ids=None):
+        # {semáforo: {"green_vertical": ..., "yellow_vertical": ..., ...}}
+        return {tl: self._signals[tl] for tl in (tl_ids or self.tl_ids)}
+
+
+def load_topology(net_file=NET_FILE):
+    digest = file_hash(net_file)
+    cache_path = net_file + CACHE_SUFFIX
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+        if cache.get("versao") == CACHE_VERSION and cache.get("hash") == digest:
+            return NetTopology(cache["semaforos"])
+    except (OSError, ValueError):
+        pass
+    index = build_index(net_file)
+    # Grava em um temporário por processo e renomeia: os workers que importam os módulos ao mesmo tempo
+    # nunca leem um cache pela metade, e dois que reconstroem juntos não se atrapalham
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump({"versao": CACHE_VERSION, "hash": digest, "semaforos": index}, f, indent=1)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # diretório somente leitura: o índice vale só para este processo
+    return NetTopology(index)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Mostra o índice de semáforos, faixas e eixos extraído da rede")
+    parser.add_argument("--net", default=NET_FILE)
+    args = parser.parse_args()
+    topology = load_topology(args.net)
+    for tl in topology.tl_ids:
+        print(f"🚦 {tl}")
+        for link in topology.links(tl):
+            print(f"   {link['indice']:>3} {link['faixa']:<12} -> {link['saida']:<12} {link['angulo']:>7.1f}° {link['eixo']}")
+        for name, state in topology.signals([tl])[tl].items():
+            print(f"   {name:<18} {state}")
@@ -0,0 +1,489 @@
+import pickle
+import random
+import time
+from collections import Counter, deque
+import traci.constants as tc
+
+# TraCI falso, em processo, para benchmarks sem o SUMO instalado.
+# Implementa o subconjunto da API usado pelos scripts (simulação, veículos, faixas, semáforos
+# e assinaturas) sobre uma grade sintética determinística. Registrado em sumo_backend como
+# backend "simulado"; cada chamada da API é contada em `calls`.
+
+LANE_LENGTH = 100.0
+MAX_SPEED = 13.89
+ACCEL = 2.6
+MIN_GAP = 7.5
+LINKS_PER_LANE = 4  # como na rede real: cada faixa aparece 4 vezes em getControlledLanes
+
+# Lado de onde vem a aproximação -> (deslocamento na grade do nó de origem, ângulo de quem chega)
+# Ordem dos links igual à da rede real: norte, leste, sul, oeste
+APPROACHES = [((0, 1), 180.0), ((1, 0), 270.0), ((0, -1), 0.0), ((-1, 0), 90.0)]
+
+calls = Counter()
+# Tempo gasto dentro de simulationStep, para separar o custo do "simulador" do custo do controle
+step_seconds = 0.0
+
+
+class TraCIException(Exception):
+    pass
+
+
+class FatalTraCIError(Exception):
+    pass
+
+
+def _counted(domain):
+    def decorate(func):
+        key = f"{domain}.{func.__name__}" if domain else func.__name__
+        def wrapper(*args, **kwargs):
+            calls[key] += 1
+            return func(*args, **kwargs)
+        wrapper.__name__ = func.__name__
+        return wrapper
+    return decorate
+
+
+def _node(x, y):
+    return f"{chr(ord('A') + x)}{y}"
+
+
+def _coords(node):
+    return ord(node[0]) - ord('A'), int(node[1:])
+
+
+# ---------- cenário ----------
+
+# Parâmetros do cenário usado pelo próximo start(); alterados por configure()
+_config = {"tl_ids": ["B2", "C2", "D2"], "vehicles": 1000, "duration": 1800, "priority_share": 0.04, "seed": 0}
+
+
+def configure(tl_ids=None, vehicles=None, duration=None, priority_share=None, seed=None):
+    for key, value in (("tl_ids", tl_ids), ("vehicles", vehicles), ("duration", duration),
+                       ("priority_share", priority_share), ("seed", seed)):
+        if value is not None:
+            _config[key] = list(value) if key == "tl_ids" else value
+
+
+class _Scenario:
+
+    def __init__(self, tl_ids, vehicles, duration, priority_share, seed):
+        rng = random.Random(seed)
+        self.tl_ids = list(tl_ids)
+        tl_set = set(self.tl_ids)
+
+        # Faixas controladas: uma por aproximação, na ordem dos links
+        self.controlled = {}
+        self.lane_info = {}  # faixa -> (semáforo ou None, grupo de links, ângulo)
+        for tl in self.tl_ids:
+            x, y = _coords(tl)
+            lanes = []
+            for group, ((dx, dy), angle) in enumerate(APPROACHES):
+                lane = f"{_node(x + dx, y + dy)}{tl}_0"
+                self.lane_info[lane] = (tl, group, angle)
+                lanes += [lane] * LINKS_PER_LANE
+            self.controlled[tl] = lanes
+        self.tl_state = {tl: "r" * (LINKS_PER_LANE * len(APPROACHES)) for tl in self.tl_ids}
+        # Programas estáticos instalados com setProgramLogic: semáforo -> [fases, índice, tempo restante]
+        self.tl_program = {}
+
+        # Rotas: entra por uma aproximação, segue em frente (ou vira) até sair da grade de semáforos
+        self.demand = []
+        for i in range(vehicles):
+            tl = rng.choice(self.tl_ids)
+            group = rng.randrange(len(APPROACHES))
+            route = []
+            for _ in range(8):
+                (dx, dy), angle = APPROACHES[group]
+                x, y = _coords(tl)
+                route.append(f"{_node(x + dx, y + dy)}{tl}_0")
+                if rng.random() < 0.3:
+                    group = (group + rng.choice((1, 3))) % 4
+                (dx, dy), _ = APPROACHES[group]
+                nxt = _node(x - dx, y - dy)  # segue no sentido oposto ao lado de onde veio
+                if nxt not in tl_set:
+                    route.append(f"{tl}{nxt}_0")
+                    self.lane_info.setdefault(route[-1], (None, None, APPROACHES[group][1]))
+                    break
+                tl = nxt
+            r = rng.random()
+            vclass = "emergency" if r < priority_share / 2 else "authority" if r < priority_share else "passenger"
+            self.demand.append((int(i * duration / max(1, vehicles)), f"veh{i}", vclass, route))
+        self.demand.reverse()  # pop() devolve a próxima partida
+
+        self.time = 0.0
+        self.vehicles = {}  # id -> [classe, rota, índice na rota, posição, velocidade, espera]
+        self.pending = {}  # faixa de partida -> fila de veículos aguardando inserção
+        self.departed = []
+        self.arrived = []
+
+    def step(self):
+        self.time += 1.0
+        self.departed, self.arrived = [], []
+        while self.demand and self.demand[-1][0] <= self.time:
+            depart, vid, vclass, route = self.demand.pop()
+            self.pending.setdefault(route[0], deque()).append((vid, vclass, route))
+
+        # Inserção: só se o início da faixa estiver livre
+        occupied = {}
+        last_pos = {}
+        for vid, v in self.vehicles.items():
+            l = v[1][v[2]]
+            occupied.setdefault(l, []).append(vid)
+            last_pos[l] = min(last_pos.get(l, LANE_LENGTH), v[3])
+        # Fila de partida por faixa: no máximo um veículo entra por faixa a cada passo
+        for lane, queue in self.pending.items():
+            if queue and last_pos.get(lane, LANE_LENGTH) >= MIN_GAP:
+                vid, vclass, route = queue.popleft()
+                self.vehicles[vid] = [vclass, route, 0, 0.0, MAX_SPEED / 2, 0.0]
+                occupied.setdefault(lane, []).append(vid)
+                self.departed.append(vid)
+
+        # Movimento: segue o líder na faixa e para na linha de retenção se o sinal não estiver verde
+        for lane, ids in occupied.items():
+            tl, group, _ = self.lane_info[lane]
+            open_signal = tl is None or self.tl_state[tl][group * LINKS_PER_LANE] in "Gg"
+            ids.sort(key=lambda vid: -self.vehicles[vid][3])
+            leader_pos = None
+            for vid in ids:
+                v = self.vehicles[vid]
+                limit = LANE_LENGTH + MAX_SPEED if open_signal else LANE_LENGTH - 1.0
+                if leader_pos is not None:
+                    limit = min(limit, leader_pos - MIN_GAP)
+                speed = max(0.0, min(v[4] + ACCEL, MAX_SPEED, limit - v[3]))
+                v[4] = speed
+                v[3] += speed
+                v[5] = v[5] + 1.0 if speed < 0.1 else 0.0
+                leader_pos = v[3]
+        for tl, program in self.tl_program.items():
+            program[2] -= 1.0
+            if program[2] <= 0:
+                program[1] = (program[1] + 1) % len(program[0])
+                program[2] = program[0][program[1]].duration
+                self.tl_state[tl] = program[0][program[1]].state
+        for vid in list(self.vehicles):
+            v = self.vehicles[vid]
+            if v[3] >= LANE_LENGTH:
+                if v[2] + 1 >= len(v[1]):
+                    del self.vehicles[vid]
+                    self.arrived.append(vid)
+                else:
+                    v[2] += 1
+                    v[3] -= LANE_LENGTH
+
+    def vehicle_var(self, vid, var):
+        v = self.vehicles[vid]
+        if var == tc.VAR_SPEED:
+            return v[4]
+        if var == tc.VAR_WAITING_TIME:
+            return v[5]
+        if var == tc.VAR_VEHICLECLASS:
+            return v[0]
+        if var == tc.VAR_LANE_ID:
+            return v[1][v[2]]
+        if var == tc.VAR_ANGLE:
+            return self.lane_info[v[1][v[2]]][2]
+        if var == tc.VAR_LANEPOSITION:
+            return v[3]
+        if var == tc.VAR_TYPE:
+            return v[0]
+        raise TraCIException(f"Variável de veículo 0x{var:02x} não suportada pelo TraCI simulado")
+
+    def lane_var(self, lane, var):
+        ids = [vid for vid, v in self.vehicles.items() if v[1][v[2]] == lane]
+        if var == tc.LAST_STEP_VEHICLE_NUMBER:
+            return len(ids)
+        if var == tc.LAST_STEP_VEHICLE_HALTING_NUMBER:
+            return sum(1 for vid in ids if self.vehicles[vid][4] < 0.1)
+        if var == tc.LAST_STEP_VEHICLE_ID_LIST:
+            return ids
+        raise TraCIException(f"Variável de faixa 0x{var:02x} não suportada pelo TraCI simulado")
+
+
+_scenario = None
+_subscriptions = {"simulation": [], "vehicle": {}, "lane": {}}
+
+
+def _sim():
+    if _scenario is None:
+        raise FatalTraCIError("TraCI simulado não iniciado")
+    return _scenario
+
+
+# ---------- API ----------
+
+@_counted("")
+def start(cmd, label="default", **kwargs):
+    _start(cmd)
+
+
+@_counted("")
+def load(args):
+    # Recarrega o cenário no mesmo "processo" (parâmetros de configure, semente de args)
+    _sim()
+    _start(list(args))
+
+
+def _start(cmd):
+    global _scenario
+    seed = _config["seed"]
+    if "--seed" in cmd:
+        seed = int(cmd[cmd.index("--seed") + 1])
+    if "--load-state" in cmd:
+        with open(cmd[cmd.index("--load-state") + 1], "rb") as f:
+            _scenario = pickle.load(f)
+    else:
+        _scenario = _Scenario(_config["tl_ids"], _config["vehicles"], _config["duration"], _config["priority_share"], seed)
+    _subscriptions["simulation"] = []
+    _subscriptions["vehicle"].clear()
+    _subscriptions["lane"].clear()
+
+
+@_counted("")
+def simulationStep(step=0.0):
+    global step_seconds
+    sim = _sim()
+    t0 = time.perf_counter()
+    sim.step()
+    while step and sim.time < step:
+        sim.step()
+    step_seconds += time.perf_counter() - t0
+
+
+@_counted("")
+def close(wait=True):
+    global _scenario
+    _scenario = None
+
+
+class simulation:
+
+    @staticmethod
+    @_counted("simulation")
+    def getMinExpectedNumber():
+        sim = _sim()
+        return len(sim.vehicles) + sum(len(q) for q in sim.pending.values()) + len(sim.demand)
+
+    @staticmethod
+    @_counted("simulation")
+    def getTime():
+        return _sim().time
+
+    @staticmethod
+    @_counted("simulation")
+    def getDepartedIDList():
+        return tuple(_sim().departed)
+
+    @staticmethod
+    @_counted("simulation")
+    def getArrivedIDList():
+        return tuple(_sim().arrived)
+
+    @staticmethod
+    @_counted("simulation")
+    def saveState(fileName):
+        with open(fileName, "wb") as f:
+            pickle.dump(_sim(), f)
+
+    @staticmethod
+    @_counted("simulation")
+    def loadState(fileName):
+        global _scenario
+        _sim()
+        with open(fileName, "rb") as f:
+            _scenario = pickle.load(f)
+        # Como no SUMO, os veículos são recriados e perdem as assinaturas
+        _subscriptions["vehicle"].clear()
+
+    @staticmethod
+    @_counted("simulation")
+    def subscribe(varIDs=(tc.VAR_TIME,), begin=None, end=None):
+        _subscriptions["simulation"] = list(varIDs)
+
+    @staticmethod
+    @_counted("simulation")
+    def getSubscriptionResults():
+        sim = _sim()
+        values = {tc.VAR_TIME: sim.time}
+        return {var: values[var] for var in _subscriptions["simulation"] if var in values}
+
+
+class vehicle:
+
+    @staticmethod
+    @_counted("vehicle")
+    def getIDList():
+        return tuple(_sim().vehicles)
+
+    @staticmethod
+    @_counted("vehicle")
+    def getIDCount():
+        return len(_sim().vehicles)
+
+    @staticmethod
+    @_counted("vehicle")
+    def getSpeed(vehID):
+        return _sim().vehicle_var(vehID, tc.VAR_SPEED)
+
+    @staticmethod
+    @_counted("vehicle")
+    def getWaitingTime(vehID):
+        return _sim().vehicle_var(vehID, tc.VAR_WAITING_TIME)
+
+    @staticmethod
+    @_counted("vehicle")
+    def getVehicleClass(vehID):
+        return _sim().vehicle_var(vehID, tc.VAR_VEHICLECLASS)
+
+    @staticmethod
+    @_counted("vehicle")
+    def getLaneID(vehID):
+        return _sim().vehicle_var(vehID, tc.VAR_LANE_ID)
+
+    @staticmethod
+    @_counted("vehicle")
+    def getAngle(vehID):
+        return _sim().vehicle_var(vehID, tc.VAR_ANGLE)
+
+    @staticmethod
+    @_counted("vehicle")
+    def subscribe(objectID, varIDs, begin=None, end=None):
+        if objectID not in _sim().vehicles:
+            raise TraCIException(f"Veículo '{objectID}' não existe")
+        _subscriptions["vehicle"][objectID] = list(varIDs)
+
+    @staticmethod
+    @_counted("vehicle")
+    def unsubscribe(objectID):
+        _subscriptions["vehicle"].pop(objectID, None)
+
+    @staticmethod
+    @_counted("vehicle")
+    def getAllSubscriptionResults():
+        sim = _sim()
+        subs = _subscriptions["vehicle"]
+        for vid in [v for v in subs if v not in sim.vehicles]:
+            del subs[vid]  # como no SUMO, a assinatura some quando o veículo sai da rede
+        return {vid: {var: sim.vehicle_var(vid, var) for var in vars_} for vid, vars_ in subs.items()}
+
+
+class lane:
+
+    @staticmethod
+    @_counted("lane")
+    def getLength(laneID):
+        if laneID not in _sim().lane_info:
+            raise TraCIException(f"Faixa '{laneID}' não existe")
+        return LANE_LENGTH
+
+    @staticmethod
+    @_counted("lane")
+    def getLastStepVehicleNumber(laneID):
+        return _sim().lane_var(laneID, tc.LAST_STEP_VEHICLE_NUMBER)
+
+    @staticmethod
+    @_counted("lane")
+    def getLastStepHaltingNumber(laneID):
+        return _sim().lane_var(laneID, tc.LAST_STEP_VEHICLE_HALTING_NUMBER)
+
+    @staticmethod
+    @_counted("lane")
+    def subscribe(objectID, varIDs, begin=None, end=None):
+        if objectID not in _sim().lane_info:
+            raise TraCIException(f"Faixa '{objectID}' não existe")
+        _subscriptions["lane"][objectID] = list(varIDs)
+
+    @staticmethod
+    @_counted("lane")
+    def getAllSubscriptionResults():
+        sim = _sim()
+        # Contagens por faixa calculadas de uma vez (equivale ao que o SUMO entrega com o passo)
+        counts, halting = Counter(), Counter()
+        for v in sim.vehicles.values():
+            l = v[1][v[2]]
+            counts[l] += 1
+            halting[l] += v[4] < 0.1
+        values = {tc.LAST_STEP_VEHICLE_NUMBER: counts, tc.LAST_STEP_VEHICLE_HALTING_NUMBER: halting}
+        return {l: {var: values[var][l] if var in values else sim.lane_var(l, var) for var in vars_}
+                for l, vars_ in _subscriptions["lane"].items()}
+
+
+class trafficlight:
+
+    class Phase:
+
+        def __init__(self, duration, state, minDur=-1, maxDur=-1, next=(), name=""):
+            self.duration = duration
+            self.state = state
+
+    class Logic:
+
+        def __init__(self, programID, type, currentPhaseIndex, phases=None, subParameter=None):
+            self.programID = programID
+            self.currentPhaseIndex = currentPhaseIndex
+            self.phases = list(phases or [])
+
+    @staticmethod
+    @_counted("trafficlight")
+    def getIDList():
+        return tuple(_sim().tl_ids)
+
+    @staticmethod
+    @_counted("trafficlight")
+    def getControlledLanes(tlsID):
+        return list(_sim().controlled[tlsID])
+
+    @staticmethod
+    @_counted("trafficlight")
+    def getRedYellowGreenState(tlsID):
+        return _sim().tl_state[tlsID]
+
+    @staticmethod
+    @_counted("trafficlight")
+    def setRedYellowGreenState(tlsID, state):
+        sim = _sim()
+        if len(state) != len(sim.tl_state[tlsID]):
+            raise TraCIException(f"Estado de '{tlsID}' deve ter {len(sim.tl_state[tlsID])} sinais")
+        sim.tl_state[tlsID] = state
+        sim.tl_program.pop(tlsID, None)  # como no SUMO, o estado fixado substitui o programa
+
+    @staticmethod
+    @_counted("trafficlight")
+    def setProgramLogic(tlsID, tls):
+        sim = _sim()
+        phase = tls.phases[tls.currentPhaseIndex]
+        sim.tl_program[tlsID] = [tls.phases, tls.currentPhaseIndex, phase.duration]
+        sim.tl_state[tlsID] = phase.state
+
+    @staticmethod
+    @_counted("trafficlight")
+    def setProgram(tlsID, programID):
+        if tlsID not in _sim().tl_program:
+            raise TraCIException(f"Semáforo '{tlsID}' não tem o programa '{programID}'")
+
+    @staticmethod
+    @_counted("trafficlight")
+    def getPhase(tlsID):
+        return _sim().tl_program[tlsID][1]
+
+    @staticmethod
+    @_counted("trafficlight")
+    def setPhase(tlsID, index):
+        program = _sim().tl_program[tlsID]
+        program[1] = index
+        program[2] = program[0][index].duration
+        _sim().tl_state[tlsID] = program[0][index].state
+
+    @staticmethod
+    @_counted("trafficlight")
+    def setPhaseDuration(tlsID, phaseDuration):
+        _sim().tl_program[tlsID][2] = phaseDuration
+
+
+def total_calls():
+    return sum(calls.values())
+
+
+def reset_calls():
+    global step_seconds
+    calls.clear()
+    step_seconds = 0.0
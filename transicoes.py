@@ -0,0 +1,98 @@
+import glob
+import json
+import os
+import numpy as np
+from qtable import ACTIONS, STATE_RADICES
+
+# Registro em disco das transições do treinamento (--log-transitions), para treinar de novo sem simular.
+# Cada transição guarda (semáforo, estado, ação, estado seguinte) e os componentes brutos da recompensa
+# (não a recompensa ponderada): treino_offline.py recalcula a recompensa com outros pesos.
+# O diretório tem um manifesto JSON (semáforos, ações, faixas do estado, nomes e pesos dos componentes)
+# e partes .npz comprimidas, uma por bloco de transições, com um array por coluna.
+STORE_DIR = "transicoes"
+MANIFEST = "manifesto.json"
+CHUNK = 8192  # transições por parte gravada
+
+
+def write_manifest(directory, tl_ids, weights, radices=STATE_RADICES, actions=ACTIONS):
+    # Cria o manifesto, ou confere que o diretório já existente é do mesmo formato
+    os.makedirs(directory, exist_ok=True)
+    manifest = {"semaforos": list(tl_ids), "acoes": list(actions), "faixas_estado": list(radices),
+                "componentes": list(weights), "pesos": dict(weights)}
+    path = os.path.join(directory, MANIFEST)
+    if os.path.exists(path):
+        existing = read_manifest(directory)
+        if any(existing[k] != manifest[k] for k in ("semaforos", "acoes", "faixas_estado", "componentes")):
+            raise ValueError(f"'{directory}' já tem transições de outra configuração")
+        return existing
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST)) as f:
+        return json.load(f)
+
+
+class TransitionLog:
+
+    def __init__(self, directory=STORE_DIR, prefix="parte", chunk=CHUNK):
+        # O manifesto deve existir (write_manifest); prefix distingue os processos que gravam no mesmo diretório
+        self.directory = directory
+        self.prefix = prefix
+        self.chunk = chunk
+        self.n_components = len(read_manifest(directory)["componentes"])
+        self._part = len(glob.glob(os.path.join(directory, f"{prefix}_*.npz")))
+        self._rows = []
+        self._components = []
+        self.count = 0
+
+    def add(self, tl_index, state, action_index, next_state, components):
+        self._rows.append((tl_index, *state, action_index, *next_state))
+        self._components.append(components)
+        self.count += 1
+        if len(self._rows) >= self.chunk:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        rows = np.array(self._rows, dtype=np.int64)
+        n_state = (rows.shape[1] - 2) // 2
+        path = os.path.join(self.directory, f"{self.prefix}_{self._part:05d}.npz")
+        # grava em um temporário e renomeia: uma parte nunca fica pela metade no diretório
+        with open(path + ".tmp", "wb") as f:
+            np.savez_compressed(f,
+                                semaforo=rows[:, 0].astype(np.int32),
+                                estado=rows[:, 1:1 + n_state].astype(np.int8),
+                                acao=rows[:, 1 + n_state].astype(np.int8),
+                                estado2=rows[:, 2 + n_state:].astype(np.int8),
+                                componentes=np.array(self._components, dtype=np.float32).reshape(-1, self.n_components))
+        os.replace(path + ".tmp", path)
+        self._part += 1
+        self._rows = []
+        self._components = []
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_transitions(directory=STORE_DIR):
+    # Devolve (manifesto, {coluna: array}) com todas as partes do diretório concatenadas
+    manifest = read_manifest(directory)
+    parts = sorted(glob.glob(os.path.join(directory, "*.npz")))
+    columns = {}
+    for part in parts:
+        with np.load(part) as data:
+            for name in data.files:
+                columns.setdefault(name, []).append(data[name])
+    if not columns:
+        raise ValueError(f"nenhuma transição gravada em '{directory}'")
+    return manifest, {name: np.concatenate(arrays) for name, arrays in columns.items()}
@@ -1,12 +1,24 @@
-import traci
-import pickle
 import os
 import random
-from collections import defaultdict
+import sys
+import numpy as np
+import sumo_backend
+from sumo_backend import traci
+from snapshot_traci import TraciSnapshot
+from qtable import QTable
+from escalonador import DecisionScheduler
+from topologia import load_topology
+import aproximador
+import atualizacoes
+import checkpoints
+import transicoes
+import perfil
 
 # Configurações
 SUMO_CFG_FILE = "mapa_final_sumo.sumocfg"
-TRAFFIC_LIGHT_IDS = ["B2", "C2", "D2"]
+# Semáforos, faixas controladas e strings de fase vêm do índice da rede (topologia.py)
+TOPOLOGY = load_topology()
+TRAFFIC_LIGHT_IDS = TOPOLOGY.tl_ids
 GREEN_DURATION = 15  # Reduzido para ciclos mais rápidos
 YELLOW_DURATION = 2  # Reduzido para transições rápidas
 
@@ -15,45 +27,28 @@ MAX_STEPS = 5000  # limite de passos por episódio reduzido
 ALPHA = 0.05      # taxa de aprendizado
 GAMMA = 0.9       # desconto
 EPSILON = 0.9     # exploração inicial
+THRESHOLD_WINDOW = 5  # episódios na média móvel comparada ao limiar de recompensa (--threshold)
+EVAL_SEEDS = (1001, 1002)  # sementes dos episódios de avaliação gulosa (--eval-every, ajuste.py)
+EVAL_PATIENCE = 3     # avaliações sem melhora antes de parar (--eval-every)
 
-SIGNALS = {
-    "green_vertical": "rrrrGGGGrrrrGGGG",
-    "yellow_vertical": "rrrryyyyrrrryyyy",
-    "green_horizontal": "GGGGrrrrGGGGrrrr",
-    "yellow_horizontal": "yyyyrrrryyyyrrrr",
-}
+# {semáforo: {"green_vertical": ..., "yellow_vertical": ..., "green_horizontal": ..., "yellow_horizontal": ...}}
+SIGNALS = TOPOLOGY.signals()
+
+# Snapshot por passo: um único conjunto de assinaturas TraCI alimenta estado, prioridade e recompensa
+snapshot = TraciSnapshot(TOPOLOGY)
+# Temporizadores dos semáforos: a simulação salta direto para a próxima decisão
+scheduler = DecisionScheduler(TRAFFIC_LIGHT_IDS, SIGNALS, GREEN_DURATION, YELLOW_DURATION)
+# Atributos contínuos por semáforo para os agentes por aproximação (--agent linear/mlp)
+features = aproximador.FeatureExtractor(snapshot, TOPOLOGY)
+# Registro das transições (transicoes.TransitionLog), ativo com --log-transitions
+transition_log = None
+# Regra de atualização da Q-table (atualizacoes.py); None = Q-learning de um passo
+updater = None
 
 # ---------- FUNÇÕES AUXILIARES ----------
 
 def detect_priority_per_tl():
-    data = {}
-    for tl in TRAFFIC_LIGHT_IDS:
-        priority_score = {"horizontal": 0, "vertical": 0}
-        
-        for lane in traci.trafficlight.getControlledLanes(tl):
-            for vid in traci.lane.getLastStepVehicleIDs(lane):
-                try:
-                    cls = traci.vehicle.getVehicleClass(vid)
-                    if cls == "emergency":
-                        pr = 2
-                    elif cls == "authority":
-                        pr = 1
-                    else:
-                        continue
-                    ang = traci.vehicle.getAngle(vid)
-                    dirc = "vertical" if (45 < ang < 135 or 225 < ang < 315) else "horizontal"
-                    priority_score[dirc] = max(priority_score[dirc], pr)
-                except traci.TraCIException:
-                    continue
-        
-        if priority_score["horizontal"] > priority_score["vertical"]:
-            data[tl] = ("horizontal", priority_score["horizontal"])
-        elif priority_score["vertical"] > priority_score["horizontal"]:
-            data[tl] = ("vertical", priority_score["vertical"])
-        else:
-            data[tl] = (None, 0)
-
-    return data
+    return snapshot.refresh().priority_per_tl()
 
 def get_global_priority():
     # Comunicação entre semáforos: verifica se há prioridade em qualquer semáforo
@@ -62,148 +57,449 @@ def get_global_priority():
 
 
 def priority_remain():
-    for vid in traci.vehicle.getIDList():
-        try:
-            if traci.vehicle.getVehicleClass(vid) in ("emergency","authority"):
-                return True
-        except:
-            continue
-    return False
+    return snapshot.refresh().any_priority()
 
 def get_state(tl):
-    lanes = traci.trafficlight.getControlledLanes(tl)
-    vert = sum(1 for l in lanes if any(ns in l for ns in ("N","S"))
-               for v in traci.lane.getLastStepVehicleIDs(l) if traci.vehicle.getSpeed(v) < 0.1)
-    horz = sum(1 for l in lanes if any(ew in l for ew in ("E","W"))
-               for v in traci.lane.getLastStepVehicleIDs(l) if traci.vehicle.getSpeed(v) < 0.1)
+    snap = snapshot.refresh()
+    horz, vert = snap.stopped_by_axis(tl)
     # Velocidade média discretizada
-    speeds = [traci.vehicle.getSpeed(v) for v in traci.vehicle.getIDList() if traci.vehicle.getSpeed(v) > 0]
-    avg_speed = sum(speeds) / len(speeds) if speeds else 0
+    avg_speed = snap.mean_moving_speed()
     speed_discrete = min(int(avg_speed // 2), 5)  # Discretizar em intervalos de 2 m/s
 
     # Informações globais para comunicação
-    total_parados_global = sum(
-        sum(1 for l in traci.trafficlight.getControlledLanes(tl_other)
-            for v in traci.lane.getLastStepVehicleIDs(l) if traci.vehicle.getSpeed(v) < 0.1)
-        for tl_other in TRAFFIC_LIGHT_IDS
-    )
+    total_parados_global = snap.stopped_controlled()
     total_parados_global_discrete = min(total_parados_global // 10, 10)  # Discretizar
 
     # Prioridade global
-    global_priority = int(any(
-        any(traci.vehicle.getVehicleClass(v) in ("emergency", "authority")
-            for l in traci.trafficlight.getControlledLanes(tl_other)
-            for v in traci.lane.getLastStepVehicleIDs(l))
-        for tl_other in TRAFFIC_LIGHT_IDS
-    ))
+    global_priority = int(snap.priority_on_controlled())
 
     # discretiza em faixas de 5 veículos
     return (min(horz//5,5), min(vert//5,5), speed_discrete, total_parados_global_discrete, global_priority)
 
-def apply_phase(tl, dir_next, curr_dir):
-    steps = 0
-    if curr_dir and curr_dir != dir_next:
-        traci.trafficlight.setRedYellowGreenState(tl, SIGNALS[f"yellow_{curr_dir}"])
-        for _ in range(YELLOW_DURATION):
-            traci.simulationStep(); steps += 1
-    traci.trafficlight.setRedYellowGreenState(tl, SIGNALS[f"green_{dir_next}"])
-    for _ in range(GREEN_DURATION):
-        traci.simulationStep(); steps += 1
-    return dir_next, steps
+# Componentes da recompensa, na ordem de reward_components, e seus pesos: a recompensa é a soma
+# ponderada. Com --log-transitions os componentes brutos são gravados e podem ser reponderados offline.
+REWARD_WEIGHTS = {
+    "parados": -10,             # Penalizar muito parados globais
+    "espera_media": -5,         # Penalizar espera global
+    "velocidade_media": 20,     # Recompensar velocidade global
+    "prioridade_global": -50,   # Penalização alta para emergências globais
+    "espera_prioridade": -100,  # Penalização alta para espera de prioridade
+    "espera_longa": -1000,      # Penalização extrema para prevenir teleport
+}
+
+def reward_components(st2):
+    snap = snapshot.refresh()
+    # Recompensa focada em fluidez global: parados globais, espera global, velocidade global,
+    # presença de emergência global (st2[4]), espera de veículos prioritários e
+    # veículos com espera muito longa (para prevenir teleport)
+    return (snap.stopped_controlled(), snap.mean_waiting(), snap.mean_moving_speed(),
+            st2[4], snap.priority_waiting(), snap.long_wait_count(250))
+
+def weighted_reward(components, weights=REWARD_WEIGHTS):
+    reward = 0
+    for weight, value in zip(weights.values(), components):
+        reward += weight * value
+    return reward
+
+def compute_reward(st2):
+    return weighted_reward(reward_components(st2))
+
+def apply_phase(tl, dir_next):
+    # Acende a direção escolhida (passando pelo amarelo se for troca); a simulação não avança aqui,
+    # o escalonador agenda a próxima decisão do semáforo. Devolve o tempo dessa decisão.
+    return scheduler.set_phase(tl, dir_next)
+
+def choose_action(Q, tl, state, epsilon_current):
+    # Sempre usar epsilon-greedy, sem forçar prioridade
+    if random.random()<epsilon_current:
+        return random.choice(["horizontal","vertical"])
+    # Escolhe a ação com maior valor Q para o estado atual
+    return Q.best_action(tl, state)
+
+def learn(Q, tl, state, action, visits=None):
+    # Fecha a transição do semáforo na sua decisão seguinte: a recompensa é a do estado nesse instante
+    # (um retrato de quando a transição fecha, não acumulada ao longo do verde e do amarelo)
+    st2 = get_state(tl)
+    components = reward_components(st2)
+    reward = weighted_reward(components)
+    if updater is None:
+        Q.update(tl, state, action, reward, st2, ALPHA, GAMMA)
+    else:
+        updater.update(Q, tl, state, action, reward, st2)
+    if visits is not None:
+        visits[Q.tl_index[tl], Q.encode(state), Q.action_index[action]] += 1
+    if transition_log is not None:
+        transition_log.add(Q.tl_index[tl], state, Q.action_index[action], st2, components)
+    return st2, reward
+
+def observe(tl):
+    # Como learn, mas sem atualizar Q: usado nos episódios de avaliação
+    st2 = get_state(tl)
+    return st2, compute_reward(st2)
 
 # ---------- TREINAMENTO ----------
 
-def train():
-    # Q-table única para todos os semáforos
-    Q = defaultdict(lambda: {"horizontal":0.0, "vertical":0.0})
+def new_q_table():
+    return QTable(TRAFFIC_LIGHT_IDS)
 
-    sumo_bin = os.path.join(os.environ.get("SUMO_HOME",""), "bin", "sumo")
-    
-    rewards = []
-    best_reward = float('-inf')
-    patience = 0
-    patience_limit = 100
-    
-    for ep in range(EPOCHS):
-        epsilon_current = EPSILON * (1 - ep / EPOCHS)  # Decaimento de epsilon
-        traci.start([sumo_bin, "-c", SUMO_CFG_FILE, "--step-length", "1.0"])
-        current = {tl: None for tl in TRAFFIC_LIGHT_IDS}
-        total_steps = 0
-        total_reward = 0
-
-        while traci.simulation.getMinExpectedNumber()>0 and total_steps<MAX_STEPS:
-            priority = detect_priority_per_tl()
-
-            for tl in TRAFFIC_LIGHT_IDS:
-                state = get_state(tl)
+def episode_args(seed=None, start_state=None, sumo_args=()):
+    args = ["-c", SUMO_CFG_FILE, "--step-length", "1.0", *sumo_args]
+    if seed is not None:
+        args += ["--seed", str(seed)]
+    if start_state is not None:
+        args += checkpoints.load_args(start_state)
+    return args
 
-                # Sempre usar epsilon-greedy, sem forçar prioridade
-                if random.random()<epsilon_current:
-                    action = random.choice(["horizontal","vertical"])
-                else:
-                    # Escolhe a ação com maior valor Q para o estado atual
-                    q_values = Q.get((tl, state), {"horizontal":0.0, "vertical":0.0})
-                    action = max(q_values, key=q_values.get)
-
-                new_phase, steps = apply_phase(tl, action, current[tl])
-                current[tl] = new_phase
-                total_steps += steps
-
-                                # calcula o novo estado e a recompensa
-                st2 = get_state(tl)
-                # Recompensa focada em fluidez global: penalizar parados globais, recompensar velocidade global, penalizar espera global
-                total_parados_global = sum(
-                    sum(1 for l in traci.trafficlight.getControlledLanes(tl_other)
-                        for v in traci.lane.getLastStepVehicleIDs(l) if traci.vehicle.getSpeed(v) < 0.1)
-                    for tl_other in TRAFFIC_LIGHT_IDS
-                )
-                global_wait_penalty = sum(traci.vehicle.getWaitingTime(v) for v in traci.vehicle.getIDList()) / max(1, len(traci.vehicle.getIDList()))
-                global_speeds = [traci.vehicle.getSpeed(v) for v in traci.vehicle.getIDList() if traci.vehicle.getSpeed(v) > 0]
-                global_avg_speed = sum(global_speeds) / len(global_speeds) if global_speeds else 0
-
-                reward = - total_parados_global * 10  # Penalizar muito parados globais
-                reward -= global_wait_penalty * 5  # Penalizar espera global
-                reward += global_avg_speed * 20  # Recompensar velocidade global
-                # Penalizar presença de emergência global
-                if st2[4]:  # global_priority
-                    reward -= 50  # Penalização alta para emergências globais
-                # Penalizar espera de veículos prioritários
-                priority_wait = sum(traci.vehicle.getWaitingTime(v) for v in traci.vehicle.getIDList() if traci.vehicle.getVehicleClass(v) in ("emergency", "authority"))
-                reward -= priority_wait * 100  # Penalização alta para espera de prioridade
-                # Penalizar veículos com espera muito longa para prevenir teleport
-                long_wait_count = sum(1 for v in traci.vehicle.getIDList() if traci.vehicle.getWaitingTime(v) > 250)
-                reward -= long_wait_count * 1000  # Penalização extrema para prevenir teleport
+def run_episode(Q, epsilon_current, visits=None, seed=None, label="default", backend=None, session=None, sumo_args=(), start_state=None,
+                learning=True):
+    # Executa um episódio completo atualizando Q; visits (opcional, mesmo formato de Q.values) conta as atualizações por (tl, estado, ação).
+    # Com session (SumoSession) o processo do SUMO é reaproveitado e o episódio começa com traci.load;
+    # sem ela o SUMO é iniciado e fechado a cada episódio. sumo_args acrescenta opções do episódio (p.ex. --route-files).
+    # start_state (entrada de CheckpointLibrary.sample) faz o episódio começar nesse estado salvo em vez de t=0.
+    # learning=False: episódio de avaliação, guloso e sem atualizar Q.
+    sumo_args = episode_args(seed, start_state, sumo_args)
+    if session is not None:
+        session.open(sumo_args)
+    else:
+        sumo_backend.start(sumo_args, backend, default="sumo", label=label)
+    snapshot.reset()
+    scheduler.reset()
+    if updater is not None:
+        updater.reset()
+    pending = {}  # tl -> (estado, ação) da decisão ainda sem recompensa
+    total_steps = 0
+    total_reward = 0
 
+    while traci.simulation.getMinExpectedNumber()>0 and total_steps<MAX_STEPS:
+        # Todos os semáforos que vencem neste instante decidem em lote, sobre o mesmo snapshot
+        for tl in scheduler.pop_due():
+            if tl in pending:
+                state, reward = learn(Q, tl, *pending.pop(tl), visits) if learning else observe(tl)
                 total_reward += reward
+            else:
+                state = get_state(tl)
+            if not learning:
+                action = Q.best_action(tl, state)
+            else:
+                action = choose_action(Q, tl, state, epsilon_current)
+            if learning and updater is not None:
+                updater.on_action(Q, tl, state, action)
+            apply_phase(tl, action)
+            pending[tl] = (state, action)
+
+        total_steps += scheduler.advance()
+
+    # Decisões em andamento no fim do episódio também atualizam Q
+    for tl, (state, action) in pending.items():
+        total_reward += (learn(Q, tl, state, action, visits) if learning else observe(tl))[1]
+
+    if session is None:
+        traci.close()
+    return total_reward, total_steps
+
+def choose_actions_approx(agent, X, epsilon_current):
+    # epsilon-greedy em lote: uma avaliação do modelo para todos os semáforos que decidem juntos
+    greedy = agent.greedy(X)
+    explore = np.array([random.random() < epsilon_current for _ in range(len(X))], dtype=bool)
+    for i in np.flatnonzero(explore):
+        greedy[i] = agent.action_index[random.choice(agent.actions)]
+    return greedy
+
+def run_episode_approx(agent, buffer, epsilon_current, seed=None, label="default", backend=None, session=None, sumo_args=(), start_state=None):
+    # Mesmo laço de run_episode, com o agente por aproximação: os atributos de todos os semáforos vêm
+    # de uma única extração por lote de decisões, as transições vão para o replay buffer e cada lote
+    # dispara uma atualização por minilote sorteado do buffer.
+    sumo_args = episode_args(seed, start_state, sumo_args)
+    if session is not None:
+        session.open(sumo_args)
+    else:
+        sumo_backend.start(sumo_args, backend, default="sumo", label=label)
+    snapshot.reset()
+    scheduler.reset()
+    pending = {}  # tl -> (atributos, índice da ação) da decisão ainda sem recompensa
+    total_steps = 0
+    total_reward = 0
+
+    def close_transitions(tls, X):
+        # A recompensa é global: uma única avaliação vale para todos os semáforos do lote
+        reward = compute_reward(get_state(tls[0]))
+        for tl in tls:
+            x, action = pending.pop(tl)
+            buffer.add(x, action, reward, X[features.tl_index[tl]])
+        return reward * len(tls)
 
-                # Atualizar Q-table
-                q_values_st = Q[(tl, state)]
-                q_values_st2 = Q[(tl, st2)]
-                q_values_st[action] += ALPHA * (reward + GAMMA * max(q_values_st2.values()) - q_values_st[action])
+    while traci.simulation.getMinExpectedNumber()>0 and total_steps<MAX_STEPS:
+        due = scheduler.pop_due()
+        if due:
+            X = features.extract(scheduler.current)
+            closing = [tl for tl in due if tl in pending]
+            if closing:
+                total_reward += close_transitions(closing, X)
+            if len(buffer) >= aproximador.BATCH_SIZE:
+                agent.train_batch(*buffer.sample(aproximador.BATCH_SIZE))
+            rows = [features.tl_index[tl] for tl in due]
+            for tl, row, action in zip(due, rows, choose_actions_approx(agent, X[rows], epsilon_current)):
+                apply_phase(tl, agent.actions[action])
+                pending[tl] = (X[row], action)
 
-            if total_steps < MAX_STEPS:
-                traci.simulationStep()
-                total_steps += 1
+        total_steps += scheduler.advance()
 
+    # Decisões em andamento no fim do episódio também entram no buffer
+    if pending:
+        total_reward += close_transitions(list(pending), features.extract(scheduler.current))
+
+    if session is None:
         traci.close()
-        
-        rewards.append(total_reward)
-        if total_reward > best_reward:
-            best_reward = total_reward
-            patience = 0
+    return total_reward, total_steps
+
+def branch_updates(Q, start_state, session, visits=None, seed=None):
+    # Ramificação: a partir do mesmo estado salvo, testa cada ação em cada semáforo
+    # (recarregando o estado antes de cada uma) e atualiza Q com todas as transições observadas.
+    # Devolve {tl: {ação: recompensa}}.
+    args = episode_args(seed, start_state)
+    outcomes = {}
+    for tl in TRAFFIC_LIGHT_IDS:
+        outcomes[tl] = {}
+        for action in Q.actions:
+            session.open(args)
+            snapshot.reset()
+            scheduler.reset([tl])
+            scheduler.pop_due()
+            state = get_state(tl)
+            apply_phase(tl, action)
+            while not scheduler.pop_due():
+                scheduler.advance()
+            if updater is not None:
+                updater.reset()  # cada ramo é uma transição isolada
+            _, reward = learn(Q, tl, state, action, visits)
+            outcomes[tl][action] = reward
+    return outcomes
+
+def pick_start_state(library, checkpoint_share):
+    # Parte dos episódios começa de um estado sorteado da biblioteca; o resto começa em t=0
+    if library is None or not len(library) or random.random() >= checkpoint_share:
+        return None
+    return library.sample()
+
+def run_training_episode(Q, epsilon_current, session, library=None, checkpoint_share=0.0, branch=False, visits=None, seed=None, buffer=None):
+    start_state = pick_start_state(library, checkpoint_share)
+    if buffer is not None:
+        # agente por aproximação (Q é um aproximador.ApproxAgent); a ramificação só existe para a Q-table
+        return run_episode_approx(Q, buffer, epsilon_current, seed=seed, session=session, start_state=start_state)
+    if start_state is not None and branch:
+        branch_updates(Q, start_state, session, visits, seed)
+    return run_episode(Q, epsilon_current, visits, seed=seed, session=session, start_state=start_state)
+
+def evaluate_policy(Q, session, seeds=EVAL_SEEDS):
+    # Recompensa média da política gulosa de Q em episódios de avaliação (sem exploração nem atualização),
+    # sempre com as mesmas sementes: uma medida comparável entre episódios e entre configurações
+    rewards = []
+    for seed in seeds:
+        rewards.append(run_episode(Q, 0.0, seed=seed, session=session, learning=False)[0])
+        # no perfil (--profile), os episódios de avaliação ficam à parte dos de treino
+        perfil.end_episode(f"avaliacao_{seed}", kind="avaliacao")
+    return float(np.mean(rewards))
+
+def save_q_table(Q, path="q_table.npz"):
+    Q.save(path)
+    print(f"✅ Q-table salva: {path}")
+
+def save_agent(agent):
+    path = f"agente_{agent.kind}.npz"
+    agent.save(path)
+    print(f"✅ Agente {agent.kind} salvo: {path} ({agent.n_parameters()} parâmetros)")
+
+def open_transition_log(directory, prefix="parte"):
+    # Passa a gravar as transições de learn() em directory (ver transicoes.py)
+    global transition_log
+    transicoes.write_manifest(directory, TRAFFIC_LIGHT_IDS, REWARD_WEIGHTS)
+    transition_log = transicoes.TransitionLog(directory, prefix)
+    return transition_log
+
+def close_transition_log():
+    global transition_log
+    if transition_log is not None:
+        transition_log.close()
+        print(f"📝 {transition_log.count} transições gravadas em '{transition_log.directory}'")
+        transition_log = None
+
+def train(backend=None, checkpoint_dir=None, checkpoint_share=0.5, branch=False, agent="tabela", seed=0, transitions_dir=None,
+          update="td", threshold=None, eval_every=None):
+    global updater
+    # Q-table única para todos os semáforos, ou um agente por aproximação com pesos compartilhados
+    # update escolhe a regra de atualização da Q-table (td, lambda ou sweeping; ver atualizacoes.py)
+    # eval_every: a cada N episódios avalia a política gulosa (evaluate_policy); para depois de EVAL_PATIENCE
+    # avaliações sem melhora e salva a melhor Q-table avaliada, não a do último episódio
+    updater = atualizacoes.new_updater(update, ALPHA, GAMMA)
+    if agent == "tabela":
+        Q, buffer = new_q_table(), None
+    else:
+        Q = aproximador.new_agent(agent, features.dim, seed=seed)
+        buffer = aproximador.ReplayBuffer(features.dim, seed=seed)
+
+    rewards = []
+    best_reward = float('-inf')
+    threshold_episode = None
+    best_eval, best_values, evals_without_gain = float('-inf'), None, 0
+    library = checkpoints.CheckpointLibrary(checkpoint_dir) if checkpoint_dir else None
+    if transitions_dir:
+        open_transition_log(transitions_dir)
+
+    # Um único processo SUMO para todos os episódios (reset com traci.load)
+    with sumo_backend.SumoSession(backend, default="sumo") as session:
+        for ep in range(EPOCHS):
+            epsilon_current = EPSILON * (1 - ep / EPOCHS)  # Decaimento de epsilon
+            total_reward, total_steps = run_training_episode(Q, epsilon_current, session, library, checkpoint_share, branch,
+                                                             buffer=buffer)
+            
+            rewards.append(total_reward)
+            best_reward = max(best_reward, total_reward)
+            
+            print(f"Episódio {ep+1}/{EPOCHS} — passos: {total_steps}, recompensa total: {total_reward:.2f}, melhor: {best_reward:.2f}")
+            perfil.end_episode(ep + 1, kind="treino")
+            # Episódios até o limiar: primeiro episódio em que a média móvel da recompensa alcança o limiar
+            if (threshold is not None and threshold_episode is None and len(rewards) >= THRESHOLD_WINDOW
+                    and np.mean(rewards[-THRESHOLD_WINDOW:]) >= threshold):
+                threshold_episode = ep + 1
+
+            if eval_every and (ep + 1) % eval_every == 0:
+                score = evaluate_policy(Q, session)
+                if score > best_eval:
+                    best_eval, best_values, evals_without_gain = score, Q.values.copy(), 0
+                else:
+                    evals_without_gain += 1
+                print(f"🧪 Avaliação gulosa após {ep+1} episódios: {score:.2f} (melhor: {best_eval:.2f})")
+                if evals_without_gain >= EVAL_PATIENCE:
+                    print(f"Early stopping at episode {ep+1}: {EVAL_PATIENCE} greedy evaluations without improvement.")
+                    break
+    close_transition_log()
+    if threshold is not None:
+        if threshold_episode is None:
+            print(f"🎯 Limiar {threshold:.2f} não alcançado em {len(rewards)} episódios ({update})")
         else:
-            patience += 1
-        
-        print(f"Episódio {ep+1}/{EPOCHS} — passos: {total_steps}, recompensa total: {total_reward:.2f}, melhor: {best_reward:.2f}")
-        
-        if patience >= patience_limit:
-            print(f"Early stopping at episode {ep+1} due to no improvement in {patience_limit} episodes.")
-            break
-
-    # salva Q-table única
-    with open("q_table.pkl","wb") as f:
-        pickle.dump(dict(Q), f)
-    print("✅ Q-table salva: q_table.pkl")
+            print(f"🎯 Limiar {threshold:.2f} alcançado no episódio {threshold_episode} "
+                  f"(média dos últimos {THRESHOLD_WINDOW}, {update})")
+    if isinstance(updater, atualizacoes.PrioritizedSweeping):
+        print(f"🧹 {updater.planning_updates} atualizações de planejamento")
+
+    if best_values is not None:
+        Q.values[...] = best_values
+
+    # salva Q-table única (ou os pesos do agente)
+    if buffer is None:
+        save_q_table(Q)
+    else:
+        save_agent(Q)
+
+# ---------- TREINAMENTO PARALELO ----------
+
+def _train_worker(args):
+    # Roda em um processo separado, com sua própria instância do SUMO (label distinto => porta distinta)
+    worker_id, q_master, episodes, seed, backend, checkpoint_dir, checkpoint_share, branch, transitions_dir = args
+    # semente do worker e da rodada (primeiro episódio do lote): cada sincronização explora uma sequência nova
+    random.seed(f"{seed}-{episodes[0][0]}")
+    library = checkpoints.CheckpointLibrary(checkpoint_dir) if checkpoint_dir else None
+    if transitions_dir:
+        open_transition_log(transitions_dir, prefix=f"worker{worker_id}")
+    Q = QTable(TRAFFIC_LIGHT_IDS, values=q_master)
+    visits = np.zeros(q_master.shape, dtype=np.int64)
+    results = []
+    with sumo_backend.SumoSession(backend, default="sumo", label=f"worker{worker_id}") as session:
+        for ep, epsilon_current in episodes:
+            total_reward, total_steps = run_training_episode(Q, epsilon_current, session, library, checkpoint_share,
+                                                             branch, visits, seed=seed + ep)
+            results.append((ep, total_reward, total_steps))
+    close_transition_log()
+    return Q.values, visits, results
+
+def merge_q_tables(Q, worker_tables):
+    # Média ponderada pelo número de visitas de cada worker; entradas não visitadas mantêm o valor do mestre
+    weighted = sum(visits * q_worker for q_worker, visits in worker_tables)
+    total = sum(visits for _, visits in worker_tables)
+    visited = total > 0
+    Q.values[visited] = weighted[visited] / total[visited]
+    return Q
+
+def train_parallel(workers, sync_every=2, seed=0, backend=None, checkpoint_dir=None, checkpoint_share=0.5, branch=False,
+                   transitions_dir=None):
+    import multiprocessing as mp
+
+    Q = new_q_table()
+    if transitions_dir:
+        # o manifesto é criado antes dos workers, que gravam suas partes no mesmo diretório
+        transicoes.write_manifest(transitions_dir, TRAFFIC_LIGHT_IDS, REWARD_WEIGHTS)
+    best_reward = float('-inf')
+    episodes_per_round = workers * sync_every
+
+    with mp.Pool(workers) as pool:
+        for start in range(0, EPOCHS, episodes_per_round):
+            # Episódios intercalados entre workers: cada um percorre um trecho diferente do decaimento de epsilon
+            tasks = []
+            for w in range(workers):
+                eps_list = [(ep, EPSILON * (1 - ep / EPOCHS))
+                            for ep in range(start + w, min(start + episodes_per_round, EPOCHS), workers)]
+                if eps_list:
+                    tasks.append((w, Q.values, eps_list, seed + 1000 * w, backend, checkpoint_dir, checkpoint_share, branch,
+                                  transitions_dir))
+            outputs = pool.map(_train_worker, tasks)
+
+            merge_q_tables(Q, [(q_worker, visits) for q_worker, visits, _ in outputs])
+            for _, _, results in outputs:
+                for ep, total_reward, total_steps in results:
+                    best_reward = max(best_reward, total_reward)
+                    print(f"Episódio {ep+1}/{EPOCHS} — passos: {total_steps}, recompensa total: {total_reward:.2f}, melhor: {best_reward:.2f}")
+            print(f"🔀 Q-tables mescladas após {min(start + episodes_per_round, EPOCHS)} episódios ({len(Q)} estados)")
+
+    save_q_table(Q)
+
+def profile_stages():
+    # Funções cronometradas por etapa com --profile (ver perfil.py)
+    module = sys.modules[__name__]
+    return [(sumo_backend.SumoSession, "open", "inicio", {"decision_start": True}),
+            (module, "get_state", "estado"), (module, "choose_action", "acao"),
+            (features, "extract", "atributos"), (module, "choose_actions_approx", "acao"),
+            (aproximador.ApproxAgent, "train_batch", "treino"),
+            (module, "reward_components", "recompensa"), (module, "apply_phase", "fase", {"decision_end": True})]
 
 if __name__=="__main__":
-    train()
+    import argparse
+    parser = argparse.ArgumentParser(description="Treinamento Q-learning dos semáforos")
+    parser.add_argument("--workers", type=int, default=1, help="processos SUMO em paralelo (1 = treinamento sequencial)")
+    parser.add_argument("--sync-every", type=int, default=2, help="episódios por worker entre cada mesclagem das Q-tables")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--checkpoints", default=None, help="diretório da biblioteca de estados salvos (ver checkpoints.py)")
+    parser.add_argument("--checkpoint-share", type=float, default=0.5, help="fração dos episódios que começa de um estado salvo")
+    parser.add_argument("--branch", action="store_true", help="ao partir de um estado salvo, testa antes todas as ações a partir dele")
+    parser.add_argument("--agent", choices=["tabela", "linear", "mlp"], default="tabela",
+                        help="Q-table, ou aproximação linear/MLP sobre atributos contínuos (ver aproximador.py)")
+    parser.add_argument("--update", choices=["td", "lambda", "sweeping"], default="td",
+                        help="regra de atualização da Q-table: um passo, Q(λ) de Watkins ou prioritized sweeping (ver atualizacoes.py)")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help=f"informa o episódio em que a média móvel ({THRESHOLD_WINDOW} episódios) da recompensa alcança este valor")
+    parser.add_argument("--eval-every", type=int, default=None, metavar="N",
+                        help=f"avalia a política gulosa a cada N episódios, para após {EVAL_PATIENCE} avaliações "
+                             "sem melhora e salva a melhor Q-table avaliada")
+    parser.add_argument("--log-transitions", nargs="?", const=transicoes.STORE_DIR, default=None, metavar="DIR",
+                        help="grava cada transição com os componentes da recompensa para treino_offline.py "
+                             f"(padrão: {transicoes.STORE_DIR})")
+    sumo_backend.add_backend_argument(parser, default="sumo")
+    perfil.add_profile_argument(parser, default="perfil/treinamento")
+    args = parser.parse_args()
+    if args.profile:
+        if args.workers > 1:
+            parser.error("--profile mede o treinamento sequencial; use --workers 1")
+        perfil.enable(args.profile, profile_stages())
+    if args.agent != "tabela" and args.workers > 1:
+        parser.error("--agent linear/mlp treina em um único processo; use --workers 1")
+    if args.update != "td" and (args.workers > 1 or args.agent != "tabela"):
+        parser.error("--update lambda/sweeping atualiza a Q-table no treinamento sequencial; use --workers 1 e --agent tabela")
+    if args.eval_every and (args.workers > 1 or args.agent != "tabela"):
+        parser.error("--eval-every avalia a Q-table no treinamento sequencial; use --workers 1 e --agent tabela")
+    if args.agent != "tabela" and args.log_transitions:
+        parser.error("--log-transitions grava as transições da Q-table; use --agent tabela")
+    if args.workers > 1:
+        train_parallel(args.workers, args.sync_every, args.seed, args.backend, args.checkpoints, args.checkpoint_share, args.branch,
+                       args.log_transitions)
+    else:
+        train(args.backend, args.checkpoints, args.checkpoint_share, args.branch, args.agent, args.seed, args.log_transitions,
+              args.update, args.threshold, args.eval_every)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+import numpy as np
+from qtable import QTable
+from transicoes import STORE_DIR, load_transitions
+
+# Treino da Q-table sem simular, sobre as transições gravadas pelo treinamento (--log-transitions).
+# A recompensa de cada transição é recalculada a partir dos componentes brutos gravados, com os pesos
+# do manifesto ou outros dados na linha de comando; uma campanha de simulação alimenta vários treinos.
+#   fitted: iteração de Q ajustada; a cada iteração toda célula (semáforo, estado, ação) visitada recebe
+#           a média dos alvos r + γ·max Q(s') das suas transições, até convergir (ponto fixo do modelo empírico);
+#   td:     épocas de atualizações TD em minilotes embaralhados (QTable.update_many, que faz a média das
+#           transições repetidas da mesma célula em um minilote), como o treino online.
+MODES = ("fitted", "td")
+ITERATIONS = 500     # limite de iterações (fitted) ou épocas (td)
+TOLERANCE = 1e-2     # maior variação de Q que encerra o fitted
+BATCH_SIZE = 4096
+
+
+def weight_vector(manifest, weights=None):
+    # Pesos do manifesto (os do treinamento que gravou as transições), com os de weights substituídos
+    merged = dict(manifest["pesos"], **(weights or {}))
+    unknown = set(merged) - set(manifest["componentes"])
+    if unknown:
+        raise ValueError(f"componentes desconhecidos: {', '.join(sorted(unknown))} (há {', '.join(manifest['componentes'])})")
+    return np.array([merged[c] for c in manifest["componentes"]], dtype=np.float64)
+
+
+def fitted_q(Q, tl, codes, actions, rewards, next_codes, gamma, iterations=ITERATIONS, tolerance=TOLERANCE):
+    cells = np.ravel_multi_index((tl, codes, actions), Q.values.shape)
+    counts = np.bincount(cells, minlength=Q.values.size)
+    visited = counts > 0
+    flat = Q.values.reshape(-1)
+    change = 0.0
+    for i in range(iterations):
+        target = rewards + gamma * Q.values[tl, next_codes].max(axis=-1)
+        mean = np.bincount(cells, weights=target, minlength=flat.size)[visited] / counts[visited]
+        change = float(np.abs(mean - flat[visited]).max())
+        flat[visited] = mean
+        if change < tolerance:
+            break
+    return i + 1, change
+
+
+def batch_td(Q, tl, codes, actions, rewards, next_codes, alpha, gamma, epochs=ITERATIONS, batch_size=BATCH_SIZE, seed=0):
+    rng = np.random.default_rng(seed)
+    for _ in range(epochs):
+        order = rng.permutation(len(tl))
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            Q.update_many(tl[idx], codes[idx], actions[idx], rewards[idx], next_codes[idx], alpha, gamma)
+    return epochs
+
+
+def train_offline(directory=STORE_DIR, mode="fitted", weights=None, gamma=0.9, alpha=0.05,
+                  iterations=ITERATIONS, batch_size=BATCH_SIZE, seed=0):
+    manifest, data = load_transitions(directory)
+    Q = QTable(manifest["semaforos"], tuple(manifest["faixas_estado"]), tuple(manifest["acoes"]))
+    tl = data["semaforo"].astype(np.int64)
+    actions = data["acao"].astype(np.int64)
+    codes = Q.encode_many(data["estado"])
+    next_codes = Q.encode_many(data["estado2"])
+    rewards = data["componentes"].astype(np.float64) @ weight_vector(manifest, weights)
+    print(f"📥 {len(tl)} transições de '{directory}', recompensa média {rewards.mean():.2f}")
+    if mode == "fitted":
+        done, change = fitted_q(Q, tl, codes, actions, rewards, next_codes, gamma, iterations)
+        print(f"🔁 fitted Q: {done} iterações, variação final {change:.4f}")
+    elif mode == "td":
+        batch_td(Q, tl, codes, actions, rewards, next_codes, alpha, gamma, iterations, batch_size, seed)
+        print(f"🔁 TD em lote: {iterations} épocas, minilotes de {batch_size}")
+    else:
+        raise ValueError(f"Modo desconhecido: {mode!r} (use {' ou '.join(MODES)})")
+    return Q
+
+
+def parse_weight(text):
+    name, _, value = text.partition("=")
+    return name, float(value)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Treina a Q-table a partir das transições gravadas, sem simular")
+    parser.add_argument("diretorio", nargs="?", default=STORE_DIR)
+    parser.add_argument("--modo", choices=MODES, default="fitted")
+    parser.add_argument("--gamma", type=float, default=0.9)
+    parser.add_argument("--alpha", type=float, default=0.05, help="taxa de aprendizado (modo td)")
+    parser.add_argument("--iteracoes", type=int, default=ITERATIONS, help="iterações (fitted) ou épocas (td)")
+    parser.add_argument("--lote", type=int, default=BATCH_SIZE, help="tamanho do minilote (modo td)")
+    parser.add_argument("--peso", nargs="+", type=parse_weight, default=[], metavar="COMPONENTE=PESO",
+                        help="substitui pesos da recompensa, p.ex. espera_longa=-500 velocidade_media=40")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--saida", default="q_table_offline.npz")
+    args = parser.parse_args()
+    Q = train_offline(args.diretorio, args.modo, dict(args.peso), args.gamma, args.alpha, args.iteracoes, args.lote, args.seed)
+    Q.save(args.saida)
+    print(f"✅ Q-table salva: {args.saida} ({len(Q)} estados)")
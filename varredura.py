@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+import argparse
+import itertools
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+
+NET_FILE = "mapa_final_sumo.net.xml"
+ROUTE_FILE = "mapa_final_sumo.rou.xml"
+OUTPUT_DIR = "varredura"
+# Controlador de referência das diferenças pareadas
+REFERENCE = "tempo_fixo"
+
+# Métricas resumidas (média ao longo da execução) gravadas para cada execução
+SUMMARY_COLUMNS = [
+    "carros_parados",
+    "tempo_espera",
+    "velocidade_media",
+    "densidade_media",
+    "media_espera_emergency",
+    "media_espera_authority",
+    "tempo_espera_prioritarios",
+]
+
+# Métricas por viagem lidas do tripinfo.xml de cada execução (analise_saidas.py), por classe de veículo
+TRIP_GROUPS = ["todos", "emergency", "authority"]
+TRIP_METRICS = ["duracao_media", "tempo_espera_media", "perda_tempo_media"]
+TRIP_COLUMNS = [f"viagem_{metric}_{group}" for group in TRIP_GROUPS for metric in TRIP_METRICS]
+
+# Valores críticos da distribuição t de Student (bicaudal, 95%) por graus de liberdade
+T_CRITICAL_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+                 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+                 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+# ---------- CONTROLADORES ----------
+# Cada controlador roda um episódio completo e devolve o DataFrame largo de métricas.
+# Novos controladores só precisam ser registrados em CONTROLLERS.
+
+def run_tempo_fixo(backend, sumo_args, output_dir, options):
+    from tempo_fixo import run_fixed_time_simulation
+    return run_fixed_time_simulation(backend, sumo_args, output_dir)
+
+def run_qlearning(backend, sumo_args, output_dir, options):
+    from simulacao_Qlearning import run_simulation
+    return run_simulation(options.get("max_steps", 5000), backend, sumo_args, output_dir, options.get("q_table"))
+
+CONTROLLERS = {
+    "tempo_fixo": run_tempo_fixo,
+    "qlearning": run_qlearning,
+}
+
+
+# ---------- DEMANDA ----------
+
+def sumo_tools_dir():
+    if "SUMO_HOME" in os.environ:
+        return os.path.join(os.environ["SUMO_HOME"], "tools")
+    import sumo  # pacote eclipse-sumo do pip
+    return os.path.join(sumo.SUMO_HOME, "tools")
+
+def random_trips(seed, output_dir, end=3600, period=2.0):
+    # Gera um arquivo de rotas reprodutível com o randomTrips.py do SUMO
+    route_file = os.path.abspath(os.path.join(output_dir, f"random_{seed}.rou.xml"))
+    if not os.path.exists(route_file):
+        subprocess.run([
+            sys.executable, os.path.join(sumo_tools_dir(), "randomTrips.py"),
+            "-n", NET_FILE, "-r", route_file, "-o", route_file.replace(".rou.xml", ".trips.xml"),
+            "--seed", str(seed), "-e", str(end), "-p", str(period), "--validate",
+        ], check=True, stdout=subprocess.DEVNULL)
+    return route_file
+
+
+# ---------- EXECUÇÃO ----------
+
+def _run_job(job):
+    run_dir = os.path.join(OUTPUT_DIR, "execucoes", job["id"])
+    os.makedirs(run_dir, exist_ok=True)
+    # Cada execução grava suas próprias saídas do SUMO para não colidir com as demais
+    sumo_args = [
+        "--route-files", job["rotas"],
+        "--scale", str(job["escala"]),
+        "--seed", str(job["semente"]),
+        "--tripinfo-output", os.path.join(run_dir, "tripinfo.xml"),
+        "--edgedata-output", os.path.join(run_dir, "edgeData.xml"),
+        "--no-step-log", "true",
+        "--no-warnings", "true",
+    ]
+    df = CONTROLLERS[job["controlador"]](job["backend"], sumo_args, run_dir, job["options"])
+    row = {key: job[key] for key in ("id", "controlador", "rotas", "escala", "semente")}
+    row["duracao"] = int(df["tempo"].max()) if not df.empty else 0
+    for column in SUMMARY_COLUMNS:
+        row[column] = float(df[column].mean()) if not df.empty else 0.0
+    row.update(trip_metrics(os.path.join(run_dir, "tripinfo.xml"), job["rotas"]))
+    return row
+
+def trip_metrics(tripinfo, route_file):
+    # Classes ausentes na demanda (p.ex. rotas do randomTrips) ficam como NaN
+    from analise_saidas import trip_summary, vtype_classes
+    summary = trip_summary(tripinfo, vtype_classes([route_file])).set_index("classe")
+    return {f"viagem_{metric}_{group}": float(summary.at[group, metric]) if group in summary.index else float("nan")
+            for group in TRIP_GROUPS for metric in TRIP_METRICS}
+
+def t_critical(dof):
+    return T_CRITICAL_95[dof - 1] if dof <= len(T_CRITICAL_95) else 1.96
+
+def confidence_intervals(runs, by=("controlador", "rotas", "escala")):
+    # Média, desvio padrão e intervalo de confiança de 95% (t de Student) de cada métrica por grupo.
+    # Cada grupo é um cenário (rotas e escala): a variação é só entre sementes do SUMO, não entre demandas
+    rows = []
+    for key, group in runs.groupby(list(by)):
+        row = dict(zip(by, key))
+        n = len(group)
+        row["n"] = n
+        for column in ["duracao"] + SUMMARY_COLUMNS + TRIP_COLUMNS:
+            values = group[column].dropna().to_numpy(dtype=float)
+            n = len(values)
+            if not n:
+                continue
+            mean = values.mean()
+            std = values.std(ddof=1) if n > 1 else 0.0
+            half = t_critical(n - 1) * std / np.sqrt(n) if n > 1 else 0.0
+            row[f"{column}_media"] = mean
+            row[f"{column}_desvio"] = std
+            row[f"{column}_ic95_inf"] = mean - half
+            row[f"{column}_ic95_sup"] = mean + half
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def paired_differences(runs, reference=REFERENCE, keys=("rotas", "escala", "semente")):
+    # Diferença de cada controlador para a referência na mesma rota, escala e semente; os intervalos
+    # das diferenças (por rota e escala) descontam a variação que as duas execuções do par compartilham
+    columns = ["duracao"] + SUMMARY_COLUMNS + TRIP_COLUMNS
+    base = runs[runs["controlador"] == reference].set_index(list(keys))[columns]
+    diffs = []
+    for controller, group in runs[runs["controlador"] != reference].groupby("controlador"):
+        paired = (group.set_index(list(keys))[columns] - base).dropna(how="all").reset_index()
+        paired.insert(0, "controlador", f"{controller}-{reference}")
+        diffs.append(paired)
+    if not diffs or base.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    diffs = pd.concat(diffs, ignore_index=True)
+    return diffs, confidence_intervals(diffs)
+
+def build_grid(route_files, random_seeds, scales, seeds, controllers, backend, options):
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    routes = [os.path.abspath(r) for r in route_files]
+    routes += [random_trips(s, OUTPUT_DIR) for s in random_seeds]
+    jobs = []
+    for route, scale, seed, controller in itertools.product(routes, scales, seeds, controllers):
+        name = os.path.basename(route).replace(".rou.xml", "")
+        jobs.append({
+            "id": f"{controller}_{name}_x{scale}_s{seed}",
+            "controlador": controller,
+            "rotas": route,
+            "escala": scale,
+            "semente": seed,
+            "backend": backend,
+            "options": options,
+        })
+    return jobs
+
+def run_sweep(jobs, processes=None):
+    processes = processes or os.cpu_count()
+    print(f"🧮 Varredura: {len(jobs)} execuções em {processes} processos")
+    runs = []
+    # maxtasksperchild=1: cada execução começa em um processo limpo (estado do libsumo/snapshot isolado)
+    with mp.Pool(processes, maxtasksperchild=1) as pool:
+        for i, row in enumerate(pool.imap_unordered(_run_job, jobs), 1):
+            runs.append(row)
+            print(f"[{i}/{len(jobs)}] {row['id']}: espera média {row['tempo_espera']:.2f}, duração {row['duracao']}s")
+    runs = pd.DataFrame(runs).sort_values("id").reset_index(drop=True)
+    summary = confidence_intervals(runs)
+    diffs, diff_summary = paired_differences(runs)
+    runs.to_csv(os.path.join(OUTPUT_DIR, "execucoes.csv"), index=False)
+    summary.to_csv(os.path.join(OUTPUT_DIR, "resumo.csv"), index=False)
+    print(f"📁 Resultados salvos em '{OUTPUT_DIR}/execucoes.csv' e '{OUTPUT_DIR}/resumo.csv'")
+    if not diffs.empty:
+        diffs.to_csv(os.path.join(OUTPUT_DIR, "diferencas.csv"), index=False)
+        diff_summary.to_csv(os.path.join(OUTPUT_DIR, "diferencas_resumo.csv"), index=False)
+        print(f"📁 Diferenças pareadas contra {REFERENCE} em '{OUTPUT_DIR}/diferencas.csv' e '{OUTPUT_DIR}/diferencas_resumo.csv'")
+    return runs, summary, diff_summary
+
+if __name__ == "__main__":
+    import sumo_backend
+    parser = argparse.ArgumentParser(description="Varredura de cenários: controladores x rotas x escalas de demanda x sementes")
+    parser.add_argument("--routes", nargs="*", default=[ROUTE_FILE], help="arquivos de rotas")
+    parser.add_argument("--random-seeds", nargs="*", type=int, default=[], help="sementes do randomTrips.py (uma rota gerada por semente)")
+    parser.add_argument("--scales", nargs="+", type=float, default=[1.0], help="fatores de escala da demanda (--scale do SUMO)")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0, 1, 2, 3, 4], help="sementes do SUMO")
+    parser.add_argument("--controllers", nargs="+", choices=sorted(CONTROLLERS), default=sorted(CONTROLLERS))
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--q-table", default=None, help="Q-table (.npz) usada pelo controlador qlearning")
+    parser.add_argument("--max-steps", type=int, default=5000)
+    sumo_backend.add_backend_argument(parser, default="sumo")
+    args = parser.parse_args()
+    backend = args.backend or os.environ.get(sumo_backend.ENV_VAR) or "sumo"
+    if backend == "sumo-gui":
+        parser.error("a varredura roda sem interface gráfica: use --backend sumo ou libsumo")
+    jobs = build_grid(args.routes, args.random_seeds, args.scales, args.seeds, args.controllers,
+                      backend, {"q_table": args.q_table, "max_steps": args.max_steps})
+    _, summary, diff_summary = run_sweep(jobs, args.processes)
+    columns = ["controlador", "rotas", "escala", "n", "tempo_espera_media", "tempo_espera_ic95_inf", "tempo_espera_ic95_sup"]
+    for table in (summary, diff_summary):
+        if not table.empty:
+            print(table[columns].assign(rotas=table["rotas"].map(os.path.basename)).to_string(index=False))